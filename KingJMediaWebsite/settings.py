@@ -82,9 +82,62 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    # counts culled entries for the cache stats endpoint, see core.cache.ResponseCache
+    'api': {
+        'BACKEND': 'core.cache.CountingLocMemCache',
+        'LOCATION': 'api-responses',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    #for production, any Redis compatible server shared by all workers
+    #'api': {
+        #'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        #'LOCATION': 'redis://127.0.0.1:6379/1',
+        #'TIMEOUT': 300,
+    #},
+}
+API_CACHE_ALIAS = 'api'
+
+# Download and view counters, see core.counters. With COUNTER_WRITE_BEHIND increments are batched in
+# memory and written at most every COUNTER_FLUSH_INTERVAL seconds or once COUNTER_MAX_PENDING rows wait.
+COUNTER_WRITE_BEHIND = False
+COUNTER_FLUSH_INTERVAL = 5
+COUNTER_MAX_PENDING = 1000
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
+# Password hashing. The first hasher hashes new passwords, the others still verify existing hashes, which
+# are upgraded on the next login (also when PASSWORD_HASHER_PARAMS change). Argon2 needs `pip install
+# argon2-cffi` and bcrypt `pip install bcrypt`, move the chosen one to the top once installed.
+# `python manage.py benchmark_password_hashers` reports the logins/sec per core of each configuration.
+PASSWORD_HASHERS = [
+    'users.hashers.PBKDF2PasswordHasher',
+    'users.hashers.Argon2PasswordHasher',
+    'users.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASHER_PARAMS = {
+    # 'pbkdf2_sha256': {'iterations': 1000000},
+    # 'argon2': {'time_cost': 2, 'memory_cost': 102400, 'parallelism': 8},
+    # 'bcrypt_sha256': {'rounds': 12},
+}
+# threads hashing passwords for async views, one per core when None
+PASSWORD_HASHING_THREADS = None
+# processes hashing passwords in the provision_users and run_provisioning_jobs commands, one per core when
+# None. The upload endpoint only queues the CSV for run_provisioning_jobs
+PROVISIONING_HASH_WORKERS = None
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -116,16 +169,33 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-    ]
+    ],
+    # proxies in front of the app that append to X-Forwarded-For. 0 keys throttles on REMOTE_ADDR, set it
+    # to the number of trusted proxies when deployed behind any, or clients pick their own address
+    'NUM_PROXIES': 0,
+    # password reset throttles, counted per email address and per client address in the default cache
+    'DEFAULT_THROTTLE_RATES': {
+        'reset_request_email': '5/hour',
+        'reset_request_ip': '20/hour',
+        'reset_attempt_email': '10/hour',
+        'reset_attempt_ip': '50/hour',
+    },
 }
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=5),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=8),
     'ROTATE_REFRESH_TOKENS': True, # Recommended for security
     'BLACKLIST_AFTER_ROTATION': True, # Recommended for security
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.RoleTokenObtainPairSerializer',
+    'CHECK_REVOKE_TOKEN': True, # tokens stop working once the password changes
 }
+# Users resolved from access tokens are cached for JWT_USER_CACHE_TTL seconds, see users.authentication.
+# Set JWT_USER_CACHE_ALIAS to a shared cache (e.g. redis) to share the entries between processes.
+JWT_USER_CACHE_TTL = 30
+JWT_USER_CACHE_SIZE = 1024
+JWT_USER_CACHE_ALIAS = None
 
 RESET_CODE_VALID_MINUTES = 15
 RESET_CODE_LENGTH = 4
@@ -155,6 +225,14 @@ EMAIL_HOST_USER = ''
 EMAIL_HOST_PASSWORD = ''
 EMAIL_USE_SSL = False
 DEFAULT_FROM_EMAIL = 'noreply@kingjmedia.com'
+# Emails are queued in the outbox and sent by `python manage.py send_queued_emails`, failed sends are
+# retried after EMAIL_OUTBOX_BACKOFF_SECONDS, doubling on every attempt.
+# For local debugging, `python -m aiosmtpd -n -l localhost:8888` prints whatever the worker sends.
+# Sent and failed emails are deleted by the purge_sent_emails sweep after EMAIL_OUTBOX_RETENTION_DAYS.
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_BACKOFF_SECONDS = 60
+EMAIL_OUTBOX_LEASE_SECONDS = 300
+EMAIL_OUTBOX_RETENTION_DAYS = 7
 
 LOGIN_URL = ''
 LOGIN_REDIRECT_URL = ''
@@ -185,6 +263,27 @@ STATICFILES_DIR = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Resized copies of uploaded images, see core.images. Sizes are the longest edge in pixels, every size is
+# stored as WebP plus a JPEG (PNG when transparent) fallback under MEDIA_ROOT/renditions/ with content
+# hashed names, so the web server can serve that directory with a far future Cache-Control.
+# They are generated by IMAGE_RENDITION_WORKERS background threads, 0 generates them inline.
+IMAGE_RENDITION_SIZES = {'thumbnail': 160, 'medium': 640, 'large': 1280}
+IMAGE_RENDITION_QUALITY = {'webp': 80, 'jpeg': 82}
+IMAGE_RENDITION_WORKERS = 2
+
+# Job to talent matching, see marketplace.matching. The best MATCHING_TOP_K talents are stored when a job
+# is published. The score is a weighted sum of skill overlap (each skill weighted by its category name in
+# MATCHING_CATEGORY_WEIGHTS, 1 when missing), experience, hourly rate against an hourly budget and availability.
+MATCHING_TOP_K = 50
+MATCHING_WEIGHTS = {'skills': 0.6, 'experience': 0.15, 'rate': 0.15, 'availability': 0.1}
+MATCHING_CATEGORY_WEIGHTS = {}
+
+# Periodic sweeps (run_sweeps command, see core.sweeps): expired jobs are closed, expired invitations marked,
+# stale reset codes and old outbox emails deleted, SWEEP_BATCH_SIZE rows per statement. Every run is recorded as a SweepRun,
+# kept SWEEP_RUN_RETENTION_DAYS days.
+SWEEP_BATCH_SIZE = 1000
+SWEEP_RUN_RETENTION_DAYS = 30
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
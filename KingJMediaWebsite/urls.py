@@ -9,6 +9,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('courses/', include('courses.urls')),
     path('users/', include('users.urls')),
+    path('marketplace/', include('marketplace.urls')),
     
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
@@ -1,7 +1,9 @@
 from django.db import models
+from django.db.models import Count, Q
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from users.models import User
+from core.counters import increment_counter
 from skills.models import Skill
 
 # Create your models here.
@@ -184,12 +186,17 @@ class ProjectMember(models.Model):
 
     @property
     def completion_rate(self):
-        assigned_tasks = self.tasks.filter(assigned_to=self) # pyright: ignore[reportAttributeAccessIssue]
-        if assigned_tasks.count() > 0: # type: ignore
-            completed_tasks = self.tasks.filter(assigned_to=self, status=Task.COMPLETED)
-            return (completed_tasks.count() / assigned_tasks.count()) * 100  # type: ignore
+        # both counts in one query, the user's rate across projects is precomputed on UserProfile
+        counts = self.assigned_tasks.aggregate(assigned=Count('pk'), completed=Count('pk', filter=Q(status=Task.COMPLETED))) # pyright: ignore[reportAttributeAccessIssue]
+        if counts['assigned'] > 0:
+            return (counts['completed'] / counts['assigned']) * 100
         return 0
     
+class ProjectInvitationQuerySet(models.QuerySet):
+    def expired(self):
+        """ Pending invitations past expires_at, marked EXPIRED by the expire_invitations sweep """
+        return self.filter(status=ProjectInvitation.PENDING, expires_at__lte=timezone.now())
+
 class ProjectInvitation(models.Model):
     PENDING = 0
     ACCEPTED = 1
@@ -216,8 +223,13 @@ class ProjectInvitation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProjectInvitationQuerySet.as_manager()
+
     class Meta:
         unique_together = ['project', 'invited_user']
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='invitation_status_expires_idx'),
+        ]
 
     def accept(self):
         if (not self.expires_at) or (self.expires_at and (self.expires_at > timezone.now() and self.status == ProjectInvitation.PENDING)):
@@ -372,8 +384,7 @@ class ProjectFile(models.Model):
             return self.file.size
         return 0
     def increment_download_count(self):
-        self.download_count += 1
-        self.save()
+        increment_counter(self, 'download_count')
 
     def create_new_version(self, new_file, description=None):
         self.is_current = False
@@ -1,10 +1,40 @@
-from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Project
+from .models import Project, ProjectMember, Task
 from users.models import User
+from users.reputation import reputation_change
 
 @receiver(pre_delete, sender=User)
-def save_user_profile(sender, instance, created, **kwargs):
+def save_user_profile(sender, instance, **kwargs):
     projects = Project.objects.filter(created_by=instance, visibility__in=[Project.PRIVATE, Project.INVITE_ONLY])
     if projects:
-        projects.delete()
\ No newline at end of file
+        projects.delete()
+
+# Reputation events, a task counts towards its assignee's tasks_assigned unless cancelled (see users.reputation)
+
+def task_reputation(user_id, status):
+    if user_id is None or status == Task.CANCELLED:
+        return {}
+    return {user_id: {'tasks_assigned': 1, 'tasks_completed': int(status == Task.COMPLETED)}}
+
+@receiver(pre_save, sender=Task)
+def remember_task_reputation(sender, instance, **kwargs):
+    instance._previous_reputation = {}
+    if instance.pk:
+        row = sender.objects.filter(pk=instance.pk).values('status', 'assigned_to__user').first()
+        if row:
+            instance._previous_reputation = task_reputation(row['assigned_to__user'], row['status'])
+
+@receiver(post_save, sender=Task)
+def update_task_reputation(sender, instance, **kwargs):
+    user_id = None
+    if instance.assigned_to_id:
+        user_id = ProjectMember.objects.filter(pk=instance.assigned_to_id).values_list('user', flat=True).first()
+    reputation_change(getattr(instance, '_previous_reputation', {}), task_reputation(user_id, instance.status))
+
+@receiver(post_delete, sender=Task)
+def remove_task_reputation(sender, instance, **kwargs):
+    user_id = None
+    if instance.assigned_to_id:
+        user_id = ProjectMember.objects.filter(pk=instance.assigned_to_id).values_list('user', flat=True).first()
+    reputation_change(task_reputation(user_id, instance.status), {})
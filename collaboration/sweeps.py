@@ -0,0 +1,8 @@
+from django.utils import timezone
+from core.sweeps import sweep, update_in_batches
+from .models import ProjectInvitation
+
+
+@sweep('expire_invitations')
+def expire_invitations(batch_size):
+    return update_in_batches(ProjectInvitation.objects.expired(), batch_size, status=ProjectInvitation.EXPIRED, updated_at=timezone.now())
@@ -1,3 +1,16 @@
 from django.contrib import admin
+from .models import OutboundEmail, SweepRun
 
 # Register your models here.
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'to_email', 'status', 'attempts', 'send_after', 'sent_at']
+    list_filter = ['status', 'template_name']
+    search_fields = ['to_email']
+    readonly_fields = ['attempts', 'last_error', 'created_at', 'sent_at']
+
+@admin.register(SweepRun)
+class SweepRunAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'rows', 'duration_ms', 'started_at']
+    list_filter = ['name', 'status']
+    readonly_fields = ['name', 'status', 'rows', 'duration_ms', 'error', 'started_at', 'finished_at']
@@ -1,7 +1,12 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
-    verbose_name = 'Core'
\ No newline at end of file
+    verbose_name = 'Core'
+
+    def ready(self):
+        from core.counters import counter_buffer
+        request_finished.connect(counter_buffer.flush_if_due, dispatch_uid='core.counters.flush')
@@ -0,0 +1,160 @@
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+# entries culled per LocMemCache location, shared by the per-thread instances like the entries are
+_culled = defaultdict(int)
+
+
+class CountingLocMemCache(LocMemCache):
+    """ LocMemCache that counts the entries it culls to stay under MAX_ENTRIES """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._name = name
+
+    def _cull(self):
+        # called with the location's lock held
+        before = len(self._cache)
+        super()._cull()
+        _culled[self._name] += before - len(self._cache)
+
+    @property
+    def evictions(self):
+        return _culled[self._name]
+
+
+class ResponseCache:
+    """
+    Stores rendered API responses in the cache selected by settings.API_CACHE_ALIAS.
+    Entries are keyed on the current version of every namespace they depend on, so invalidating a
+    namespace makes all of its entries unreachable at once and the backend expires them later.
+    Hit, miss and invalidation counters are kept per process. Evictions, entries the backend dropped
+    for lack of room, come from the backend itself: entries culled by CountingLocMemCache in this
+    process, or the server wide evicted_keys of Redis. Other backends report None.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions(),
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def evictions(self):
+        cache = self.cache
+        if isinstance(cache, CountingLocMemCache):
+            return cache.evictions
+        if isinstance(cache, RedisCache):
+            return cache._cache.get_client().info('stats').get('evicted_keys')
+        return None
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def versions(self, namespaces):
+        keys = [f'version:{namespace}' for namespace in namespaces]
+        versions = self.cache.get_many(keys)
+        missing = {key: time.time_ns() for key in keys if key not in versions}
+        if missing:
+            # a fresh version never matches entries stored under a version that was culled
+            self.cache.set_many(missing, timeout=None)
+            versions.update(missing)
+        return [str(versions[key]) for key in keys]
+
+    def make_key(self, request, namespaces):
+        versions = '.'.join(self.versions(namespaces))
+        path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+        return f'response:{request.accepted_renderer.format}:{path}:{versions}'
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        self._count('hits' if entry is not None else 'misses')
+        return entry
+
+    def set(self, key, entry, timeout=None):
+        if timeout is None:
+            self.cache.set(key, entry)
+        else:
+            self.cache.set(key, entry, timeout)
+
+    def invalidate(self, *namespaces):
+        self.cache.set_many({f'version:{namespace}': time.time_ns() for namespace in namespaces}, timeout=None)
+        self._count('invalidations', len(namespaces))
+
+
+response_cache = ResponseCache()
+
+
+class CachedResponseMixin:
+    """
+    Caches the rendered JSON of anonymous GET requests. Views list the namespaces a response depends on
+    in get_cache_namespaces(). Cached responses keep the ETag and Last-Modified headers of the original
+    response (see ConditionalGetMixin), falling back to a hash of the content, and are answered with 304
+    when the client already has them.
+    """
+    cache_timeout = None
+
+    def get_cache_namespaces(self):
+        raise NotImplementedError('CachedResponseMixin views must define get_cache_namespaces()')
+
+    def is_cacheable(self, request):
+        return not request.user.is_authenticated and request.accepted_renderer.format == 'json'
+
+    def get(self, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return super().get(request, *args, **kwargs)
+
+        key = response_cache.make_key(request, self.get_cache_namespaces())
+        entry = response_cache.get(key)
+        if entry is not None:
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+            response['ETag'] = entry['etag']
+            if entry['last_modified']:
+                response['Last-Modified'] = http_date(entry['last_modified'])
+            return get_conditional_response(request, etag=entry['etag'], last_modified=entry['last_modified'], response=response)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200 and hasattr(response, 'add_post_render_callback'):
+            response.add_post_render_callback(lambda rendered: self._store(key, rendered))
+        return response
+
+    def _store(self, key, response):
+        etag = response.get('ETag')
+        if not etag:
+            etag = quote_etag(hashlib.md5(response.content).hexdigest())
+            response['ETag'] = etag
+        response_cache.set(key, {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'etag': etag,
+            'last_modified': parse_http_date_safe(response.get('Last-Modified')),
+        }, self.cache_timeout)
@@ -0,0 +1,112 @@
+import atexit
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+def add_to_counters(model, pk, amounts, using='default'):
+    """
+    Adds {field: amount} to the counters of one row with a single UPDATE ... SET f = f + n.
+    auto_now fields are bumped too, so conditional GETs validating on updated_at see the new counts.
+    """
+    amounts = {field: amount for field, amount in amounts.items() if amount}
+    if not amounts:
+        return 0
+    now = timezone.now()
+    touched = {field.name: now for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)}
+    return model._default_manager.using(using).filter(pk=pk).update(
+        **touched, **{field: F(field) + amount for field, amount in amounts.items()}
+    )
+
+
+class CounterBuffer:
+    """
+    Write-behind buffer for hot counters such as download and view counts.
+    Increments are summed in memory per row and written with one UPDATE per row when the buffer is
+    flushed: once COUNTER_FLUSH_INTERVAL seconds have passed or COUNTER_MAX_PENDING rows are waiting,
+    checked on every increment and at the end of every request, and when the process exits.
+    Increments still in memory are lost if the process is killed, so only use it for counters that
+    can tolerate that.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(lambda: defaultdict(int))
+        self._last_flush = time.monotonic()
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'COUNTER_FLUSH_INTERVAL', 5)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, 'COUNTER_MAX_PENDING', 1000)
+
+    def add(self, model, pk, field, amount=1):
+        with self._lock:
+            self._pending[(model, pk)][field] += amount
+        if self.is_due():
+            self.flush()
+
+    def pending(self, model, pk, field):
+        with self._lock:
+            return self._pending.get((model, pk), {}).get(field, 0)
+
+    def is_due(self):
+        with self._lock:
+            if not self._pending:
+                return False
+            return len(self._pending) >= self.max_pending or time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self):
+        """
+        Writes every pending increment, returns the number of rows updated. When the write fails the
+        increments go back into the buffer, added to the ones made meanwhile, for the next flush.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        updated = 0
+        try:
+            with transaction.atomic():
+                for (model, pk), amounts in pending.items():
+                    updated += add_to_counters(model, pk, amounts)
+        except Exception:
+            with self._lock:
+                for key, amounts in pending.items():
+                    for field, amount in amounts.items():
+                        self._pending[key][field] += amount
+            raise
+        return updated
+
+    def flush_if_due(self, **kwargs):
+        if self.is_due():
+            self.flush()
+
+
+counter_buffer = CounterBuffer()
+atexit.register(counter_buffer.flush)
+
+
+def increment_counter(instance, field, amount=1, buffered=None):
+    """
+    Atomically adds `amount` to a counter column of `instance` without saving the rest of the row.
+    The in-memory value is bumped as well so callers can keep using the instance.
+    `buffered` defaults to settings.COUNTER_WRITE_BEHIND, see CounterBuffer.
+    """
+    if buffered is None:
+        buffered = getattr(settings, 'COUNTER_WRITE_BEHIND', False)
+    model = type(instance)._meta.concrete_model
+    if buffered:
+        counter_buffer.add(model, instance.pk, field, amount)
+    else:
+        add_to_counters(model, instance.pk, {field: amount}, using=instance._state.db or 'default')
+    setattr(instance, field, getattr(instance, field) + amount)
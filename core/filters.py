@@ -0,0 +1,51 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework import fields
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class FieldFilterBackend(BaseFilterBackend):
+    """
+    Exact match filtering on the query parameters declared by the view in `filter_fields`.
+    `filter_fields` is either a list of model field names or a dict mapping query parameters to lookups,
+    e.g. {'course': 'module__course'}. Values are converted with the model field so bad input is a 400.
+    """
+
+    def get_filter_fields(self, view):
+        filter_fields = getattr(view, 'filter_fields', None) or {}
+        if isinstance(filter_fields, dict):
+            return filter_fields
+        return {name: name for name in filter_fields}
+
+    def get_model_field(self, model, lookup):
+        field = None
+        for name in lookup.split(LOOKUP_SEP):
+            field = model._meta.get_field(name)
+            if field.is_relation:
+                model = field.related_model
+        return field
+
+    def filter_queryset(self, request, queryset, view):
+        filters = {}
+        errors = {}
+        for param, lookup in self.get_filter_fields(view).items():
+            value = request.query_params.get(param)
+            if value in (None, ''):
+                continue
+            field = self.get_model_field(queryset.model, lookup)
+            try:
+                if isinstance(field, models.BooleanField):
+                    # accept the same spellings as the API's boolean inputs (true/false/1/0/yes/no)
+                    filters[lookup] = fields.BooleanField().to_internal_value(value)
+                else:
+                    filters[lookup] = field.to_python(value)
+            except DjangoValidationError as e:
+                errors[param] = e.messages
+            except ValidationError as e:
+                errors[param] = e.detail
+
+        if errors:
+            raise ValidationError(errors)
+        return queryset.filter(**filters)
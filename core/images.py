@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save, pre_save
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = {'thumbnail': 160, 'medium': 640, 'large': 1280}
+DEFAULT_QUALITY = {'webp': 80, 'jpeg': 82}
+
+# (model, image field name) pairs registered with track_renditions()
+tracked_images = []
+
+
+def renditions_field_name(field_name):
+    return f'{field_name}_renditions'
+
+
+def _encode(image, format, **params):
+    buffer = BytesIO()
+    image.save(buffer, format=format, **params)
+    return buffer.getvalue()
+
+
+def render_renditions(file, sizes=None):
+    """
+    Yields (size name, width, height, {format: (extension, bytes)}) for every rendition of an image
+    file: resized to fit the size's longest edge (never enlarged), EXIF orientation applied and
+    metadata dropped, encoded as WebP and as a JPEG fallback, PNG for images with transparency.
+    """
+    sizes = sizes or getattr(settings, 'IMAGE_RENDITION_SIZES', DEFAULT_SIZES)
+    quality = {**DEFAULT_QUALITY, **getattr(settings, 'IMAGE_RENDITION_QUALITY', {})}
+    with Image.open(file) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    for name, edge in sizes.items():
+        rendition = image.copy()
+        rendition.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        encoded = {'webp': ('webp', _encode(rendition, 'WEBP', quality=quality['webp'], method=6))}
+        if has_alpha:
+            encoded['fallback'] = ('png', _encode(rendition, 'PNG', optimize=True))
+        else:
+            encoded['fallback'] = ('jpg', _encode(rendition, 'JPEG', quality=quality['jpeg'], optimize=True, progressive=True))
+        yield name, rendition.width, rendition.height, encoded
+
+
+def store_renditions(field_file):
+    """
+    Renders the renditions of a stored image into its storage and returns what the model keeps:
+    {size name: {'webp': name, 'fallback': name, 'width': w, 'height': h}, 'source': original name}.
+    Files are named after a hash of their content, so they never change once written, can be served
+    with a far future expiry, and identical renditions are stored once.
+    """
+    storage = field_file.storage
+    renditions = {'source': field_file.name}
+    with field_file.open('rb') as file:
+        for name, width, height, encoded in render_renditions(file):
+            rendition = {'width': width, 'height': height}
+            for format, (extension, content) in encoded.items():
+                digest = hashlib.sha256(content).hexdigest()
+                path = f'renditions/{digest[:2]}/{digest[2:34]}.{extension}'
+                if not storage.exists(path):
+                    path = storage.save(path, ContentFile(content))
+                rendition[format] = path
+            renditions[name] = rendition
+    return renditions
+
+
+def generate_renditions(model, pk, field_name):
+    """
+    Stores the renditions of one row's image. Nothing is written when the row is gone or its image
+    was replaced meanwhile, the newer upload has its own job.
+    """
+    instance = model._default_manager.filter(pk=pk).first()
+    field_file = getattr(instance, field_name, None)
+    if not field_file:
+        return None
+    renditions = store_renditions(field_file)
+    if model._default_manager.filter(pk=pk).values_list(field_name, flat=True).first() != field_file.name:
+        return None
+    setattr(instance, renditions_field_name(field_name), renditions)
+    auto_now = [field.name for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+    instance.save(update_fields=[renditions_field_name(field_name), *auto_now])
+    return renditions
+
+
+class ImageWorker:
+    """
+    Generates renditions off the request thread in a small local thread pool (Pillow releases the GIL
+    while it resizes and encodes). IMAGE_RENDITION_WORKERS sets the pool size, 0 generates inline.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                workers = getattr(settings, 'IMAGE_RENDITION_WORKERS', 2)
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-renditions')
+        return self._executor
+
+    def run(self, model, pk, field_name):
+        try:
+            return generate_renditions(model, pk, field_name)
+        except Exception:
+            logger.exception("Rendering %s.%s of %s failed", model._meta.label, field_name, pk)
+        finally:
+            close_old_connections()
+
+    def submit(self, model, pk, field_name):
+        if not getattr(settings, 'IMAGE_RENDITION_WORKERS', 2):
+            return self.run(model, pk, field_name)
+        return self.executor().submit(self.run, model, pk, field_name)
+
+
+image_worker = ImageWorker()
+
+
+def track_renditions(model, field_name):
+    """
+    Generates renditions of model.<field_name> into model.<field_name>_renditions (a JSONField) when
+    a new file is uploaded. A file that is not committed yet at pre_save is a new upload: its stale
+    renditions are cleared with the same save, and a job is queued once the transaction commits.
+    """
+    renditions = renditions_field_name(field_name)
+    uid = f'{model._meta.label}.{field_name}.renditions'
+
+    def remember_upload(sender, instance, **kwargs):
+        instance.__dict__.setdefault('_uploaded_images', set())
+        if field_name not in instance.__dict__:
+            # deferred, so not assigned either
+            return
+        field_file = getattr(instance, field_name)
+        uploaded = bool(field_file) and not field_file._committed
+        if uploaded or (not field_file and instance.__dict__.get(renditions)):
+            setattr(instance, renditions, {})
+        if uploaded:
+            instance._uploaded_images.add(field_name)
+
+    def queue_renditions(sender, instance, **kwargs):
+        uploaded = instance.__dict__.get('_uploaded_images', set())
+        if field_name in uploaded:
+            uploaded.discard(field_name)
+            pk = instance.pk
+            transaction.on_commit(lambda: image_worker.submit(model, pk, field_name))
+
+    pre_save.connect(remember_upload, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(queue_renditions, sender=model, weak=False, dispatch_uid=uid)
+    tracked_images.append((model, field_name))
@@ -0,0 +1,142 @@
+import functools
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(to_email, subject, template_name, context=None, from_email=None, send_after=None):
+    """
+    Queues a templated email and returns right away, the worker renders and sends it.
+    `context` is stored as JSON, so it may only hold plain values.
+    """
+    return OutboundEmail.objects.create(
+        to_email=to_email,
+        subject=subject,
+        template_name=template_name,
+        context=context or {},
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        send_after=send_after or timezone.now(),
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def _compiled_template(template_name):
+    # a long running worker compiles each email template once
+    return get_template(f'emails/{template_name}.html')
+
+
+class OutboxWorker:
+    """
+    Drains the outbox in batches. Every batch is claimed by pushing its send_after past a lease, so
+    several workers never pick the same rows, and is sent over one SMTP connection.
+    Failed messages are retried with exponential backoff until EMAIL_OUTBOX_MAX_ATTEMPTS is reached.
+    """
+
+    def __init__(self, batch_size=50, connection=None):
+        self.batch_size = batch_size
+        self.connection = connection
+        self.max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+        self.backoff = getattr(settings, 'EMAIL_OUTBOX_BACKOFF_SECONDS', 60)
+        self.lease = getattr(settings, 'EMAIL_OUTBOX_LEASE_SECONDS', 300)
+
+    def claim(self):
+        now = timezone.now()
+        with transaction.atomic():
+            batch = list(
+                OutboundEmail.objects.select_for_update(skip_locked=True)
+                .filter(status=OutboundEmail.PENDING, send_after__lte=now)
+                .order_by('send_after', 'id')[:self.batch_size]
+            )
+            if batch:
+                OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                    send_after=now + timedelta(seconds=self.lease)
+                )
+        return batch
+
+    def build_message(self, email, connection):
+        html_content = _compiled_template(email.template_name).render(email.context)
+        message = EmailMultiAlternatives(
+            subject=email.subject,
+            body=html_content,
+            from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+            to=[email.to_email],
+            connection=connection,
+        )
+        message.attach_alternative(html_content, "text/html")
+        return message
+
+    def send_batch(self, batch):
+        """ Sends the claimed emails over a single connection, returns (sent, failed) """
+        connection = self.connection or get_connection()
+        sent = []
+        failed = []
+        try:
+            connection.open()
+        except Exception as e:
+            for email in batch:
+                self.retry_later(email, e, timezone.now())
+            return 0, len(batch)
+        pending = list(batch)
+        try:
+            while pending:
+                email = pending.pop(0)
+                try:
+                    message = self.build_message(email, connection)
+                    if not connection.send_messages([message]):
+                        raise smtplib.SMTPException('The message was not accepted')
+                except smtplib.SMTPServerDisconnected as e:
+                    failed.append((email, e))
+                    # the server dropped us, reconnect for the rest of the batch
+                    connection.close()
+                    try:
+                        connection.open()
+                    except Exception as e:
+                        failed.extend((email, e) for email in pending)
+                        pending = []
+                except Exception as e:
+                    failed.append((email, e))
+                else:
+                    sent.append(email.pk)
+        finally:
+            connection.close()
+
+        now = timezone.now()
+        if sent:
+            OutboundEmail.objects.filter(pk__in=sent).update(
+                status=OutboundEmail.SENT, sent_at=now, attempts=F('attempts') + 1, last_error=''
+            )
+        for email, error in failed:
+            self.retry_later(email, error, now)
+        return len(sent), len(failed)
+
+    def retry_later(self, email, error, now):
+        attempts = email.attempts + 1
+        logger.warning('Sending email %s failed (attempt %s): %s', email.pk, attempts, error)
+        changes = {'attempts': attempts, 'last_error': str(error)}
+        if attempts >= self.max_attempts:
+            changes['status'] = OutboundEmail.FAILED
+        else:
+            changes['send_after'] = now + timedelta(seconds=self.backoff * 2 ** (attempts - 1))
+        OutboundEmail.objects.filter(pk=email.pk).update(**changes)
+
+    def run_once(self):
+        """ Sends every batch that is due, returns the (sent, failed) totals """
+        totals = [0, 0]
+        while True:
+            batch = self.claim()
+            if not batch:
+                return tuple(totals)
+            sent, failed = self.send_batch(batch)
+            totals[0] += sent
+            totals[1] += failed
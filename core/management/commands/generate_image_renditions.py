@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from core.images import generate_renditions, renditions_field_name, tracked_images
+
+
+class Command(BaseCommand):
+    help = "Generates missing image renditions, e.g. for images uploaded before renditions existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Regenerate every image, e.g. after IMAGE_RENDITION_SIZES changed")
+
+    def handle(self, *args, **options):
+        for model, field_name in tracked_images:
+            rows = model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            if not options['all']:
+                rows = rows.filter(**{renditions_field_name(field_name): {}})
+            generated = failed = 0
+            for pk in rows.values_list('pk', flat=True).iterator():
+                try:
+                    generate_renditions(model, pk, field_name)
+                    generated += 1
+                except Exception as e:
+                    # one unreadable or oversized upload must not stop the backfill
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"{model._meta.label} {pk}: {type(e).__name__}: {e}"))
+            self.stdout.write(self.style.SUCCESS(f"{model._meta.label}.{field_name}: generated {generated}, {failed} failed"))
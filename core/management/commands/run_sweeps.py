@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils.module_loading import autodiscover_modules
+from core.sweeps import run_sweeps, sweeps
+
+
+class Command(BaseCommand):
+    help = "Runs the periodic sweeps (expired jobs, invitations, reset codes...), repeating every --interval seconds unless --once is given"
+
+    def add_arguments(self, parser):
+        parser.add_argument('sweeps', nargs='*', help="Sweeps to run, all registered ones by default")
+        parser.add_argument('--batch-size', type=int, default=None, help="Rows per statement, SWEEP_BATCH_SIZE by default")
+        parser.add_argument('--interval', type=float, default=300, help="Seconds between runs")
+        parser.add_argument('--once', action='store_true', help="Run the sweeps once and exit")
+
+    def handle(self, *args, **options):
+        autodiscover_modules('sweeps')
+        unknown = set(options['sweeps']) - set(sweeps)
+        if unknown:
+            raise CommandError(f"Unknown sweep(s) {', '.join(sorted(unknown))}, registered: {', '.join(sorted(sweeps))}")
+
+        while True:
+            # outside a request nothing else drops a connection the server closed meanwhile
+            close_old_connections()
+            for run in run_sweeps(options['sweeps'], batch_size=options['batch_size']):
+                if run.error:
+                    self.stdout.write(self.style.ERROR(f"{run.name}: failed after {run.duration_ms} ms, {run.error}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"{run.name}: {run.rows} row(s) in {run.duration_ms} ms"))
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+from core.mail import OutboxWorker
+
+
+class Command(BaseCommand):
+    help = "Sends the emails waiting in the outbox, polling for new ones unless --once is given"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help="Emails sent per SMTP connection")
+        parser.add_argument('--interval', type=float, default=5, help="Seconds to wait when the outbox is empty")
+        parser.add_argument('--once', action='store_true', help="Drain the outbox once and exit")
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(batch_size=options['batch_size'])
+        while True:
+            sent, failed = worker.run_once()
+            if sent or failed or options['once']:
+                self.stdout.write(self.style.SUCCESS(f"Sent {sent} email(s), {failed} failed"))
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,111 @@
+import copy
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """
+    Generic view mixin that answers If-None-Match/If-Modified-Since with 304 before anything is serialized.
+    The validators come from one aggregate over the view's filtered queryset: the row count and the latest
+    value of each field in `etag_fields` (a detail view looks at its single object). Views whose output
+    depends on related rows can list lookups such as 'enrollment__updated_at'. Every write to a serialized
+    column has to move one of these fields, bare update() calls included.
+    """
+    etag_fields = ('updated_at',)
+
+    def get_validators(self):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        detail = lookup_url_kwarg in self.kwargs
+        if detail:
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+
+        latest = {f'latest_{i}': Max(field) for i, field in enumerate(self.etag_fields)}
+        values = queryset.aggregate(count=Count('pk'), **latest)
+        if detail and not values['count']:
+            return None, None
+
+        timestamps = [values[name] for name in latest if values[name] is not None]
+        last_modified = max(timestamps) if timestamps else None
+
+        request = self.request
+        parts = [
+            request.get_full_path(),
+            request.accepted_renderer.media_type,
+            str(request.user.pk) if request.user.is_authenticated else '',
+            str(values['count']),
+        ] + [str(values[name]) for name in latest]
+        etag = 'W/"%s"' % hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+        return etag, last_modified
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        if etag is None:
+            return super().get(request, *args, **kwargs)
+
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+class DirtyFieldsMixin:
+    """
+    Model mixin that remembers the values a row was loaded with. get_dirty_fields() returns the fields
+    changed since then, and save() on a loaded row writes only those (plus auto_now fields) and skips
+    the query entirely when nothing changed. Rows built in Python rather than loaded save as usual.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def _snapshot(self, attnames=None):
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and (attnames is None or field.attname in attnames):
+                # copies, so in place changes to dicts and lists count as changes
+                loaded[field.attname] = copy.deepcopy(self.__dict__[field.attname])
+
+    def get_dirty_fields(self):
+        """ {field name: loaded value} of the fields changed since the row was loaded or saved """
+        loaded = self.__dict__.get('_loaded_values')
+        if loaded is None:
+            return {field.name: None for field in self._meta.concrete_fields}
+        dirty = {}
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__:
+                continue
+            if field.attname not in loaded or loaded[field.attname] != self.__dict__[field.attname]:
+                dirty[field.name] = loaded.get(field.attname)
+        return dirty
+
+    def is_dirty(self):
+        return bool(self.get_dirty_fields())
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and '_loaded_values' in self.__dict__ and kwargs.get('update_fields') is None:
+            dirty = self.get_dirty_fields()
+            if not dirty:
+                return
+            auto_now = [field.name for field in self._meta.concrete_fields if getattr(field, 'auto_now', False)]
+            kwargs['update_fields'] = [*dirty, *auto_now]
+        super().save(*args, **kwargs)
+        self._snapshot()
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._snapshot(attnames=None if fields is None else {self._meta.get_field(name).attname for name in fields})
@@ -1,3 +1,69 @@
 from django.db import models
+from django.utils import timezone
+
 
 # Create your models here.
+class OutboundEmail(models.Model):
+    """ Email waiting in the outbox, rendered and sent by the send_queued_emails worker """
+    PENDING = 0
+    SENT = 1
+    FAILED = 2
+
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=255)
+    template_name = models.CharField(max_length=100)
+    context = models.JSONField(default=dict, blank=True)
+
+    status = models.IntegerField(choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    send_after = models.DateTimeField(default=timezone.now)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the worker's queue scan
+            models.Index(fields=['status', 'send_after', 'id'], name='outbox_status_send_after_idx'),
+            # the retention sweep
+            models.Index(fields=['status', 'created_at'], name='outbox_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to_email} ({self.get_status_display()})"
+
+
+class SweepRun(models.Model):
+    """ One run of a periodic sweep, see core.sweeps """
+    OK = 0
+    FAILED = 1
+
+    STATUS_CHOICES = (
+        (OK, 'OK'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=100)
+    status = models.IntegerField(choices=STATUS_CHOICES, default=OK)
+    rows = models.PositiveIntegerField(default=0, help_text="Rows updated or deleted")
+    duration_ms = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', '-started_at'], name='sweeprun_name_started_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} at {self.started_at:%Y-%m-%d %H:%M} ({self.rows} rows)"
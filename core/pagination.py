@@ -0,0 +1,121 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks past the last row of the previous page instead of using an offset.
+    Every field in the ordering takes part in the cursor, so the ordering must end on a unique
+    column (usually id) and the fields must not be null.
+    The ordering can be overridden per view with a `pagination_ordering` attribute.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'pagination_ordering', self.ordering))
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = self.decode_cursor(request, queryset.model)
+        if cursor is not None:
+            queryset = queryset.filter(self.seek_filter(cursor))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def seek_filter(self, values):
+        """ Builds (a < x) OR (a = x AND b < y) ... for the row after the cursor position """
+        condition = Q()
+        equal = Q()
+        for field_name, value in zip(self.ordering, values):
+            name = field_name.lstrip('-')
+            lookup = 'lt' if field_name.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            # encode_cursor() only writes scalars, None would reach filter() and fail there
+            if not all(isinstance(value, (bool, int, float, str)) for value in values):
+                raise ValueError
+            return [self.to_python(model, field_name.lstrip('-'), value) for field_name, value in zip(self.ordering, values)]
+        except (TypeError, ValueError, ValidationError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def to_python(self, model, name, value):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # annotations carry plain json values
+            return value
+        return field.to_python(value)
+
+    def encode_cursor(self, instance):
+        values = []
+        for field_name in self.ordering:
+            value = getattr(instance, field_name.lstrip('-'))
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            elif not isinstance(value, (bool, int, float, str)):
+                value = str(value)
+            values.append(value)
+        encoded = base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
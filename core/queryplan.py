@@ -0,0 +1,131 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def _has_is_active(model):
+    try:
+        model._meta.get_field('is_active')
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+def _related_queryset(model, serializer=None, required=()):
+    """ Queryset used for a Prefetch, limited to active rows when the model supports it """
+    queryset = model._default_manager.all()
+    if _has_is_active(model):
+        queryset = queryset.filter(is_active=True)
+    if serializer is not None:
+        queryset = plan_queryset(queryset, serializer, required=required)
+    return queryset
+
+
+def _plan(model, serializer, prefix=''):
+    """
+    Walks the fields of a serializer and returns the (select_related, prefetch_related, only)
+    lookups needed to render it without issuing queries per row.
+    `only` is None when a field reads something that cannot be traced back to a column; serializers
+    can declare the columns behind computed fields in Meta.source_fields to keep it.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    select_related = []
+    prefetch_related = []
+    only = {model._meta.pk.name}
+    source_fields = getattr(getattr(serializer, 'Meta', None), 'source_fields', {})
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in source_fields:
+            if only is not None:
+                only.update(source_fields[name])
+            continue
+        if field.source == '*':
+            only = None
+            continue
+
+        current_model = model
+        path = []
+        relation = None
+        column = None
+        for attr in field.source_attrs:
+            try:
+                model_field = current_model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break
+            if not model_field.is_relation:
+                column = model_field.name if not path else None
+                break
+            path.append(attr)
+            relation = model_field
+            if relation.many_to_many or relation.one_to_many:
+                break
+            current_model = relation.related_model
+
+        if relation is None:
+            if only is not None:
+                if column is not None:
+                    only.add(column)
+                else:
+                    # a property or method we know nothing about, load every column
+                    only = None
+            continue
+
+        lookup = prefix + '__'.join(path)
+        related_model = relation.related_model
+
+        if relation.many_to_many or relation.one_to_many:
+            if isinstance(field, serializers.ListSerializer):
+                required = [relation.field.name] if relation.one_to_many else []
+                prefetch_related.append(Prefetch(lookup, queryset=_related_queryset(related_model, field.child, required)))
+            elif isinstance(field, serializers.ManyRelatedField):
+                prefetch_related.append(Prefetch(lookup, queryset=_related_queryset(related_model)))
+            continue
+
+        if only is not None and not relation.auto_created:
+            only.add(path[0])
+        elif only is not None:
+            # reverse one to one, the related row carries the key
+            only = None
+
+        # single valued relation: primary key fields read the local column and need no join
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and len(path) == 1 and len(field.source_attrs) == 1:
+            continue
+
+        select_related.append(lookup)
+        if isinstance(field, serializers.BaseSerializer):
+            nested_select, nested_prefetch, _ = _plan(related_model, field, prefix=lookup + '__')
+            select_related.extend(nested_select)
+            prefetch_related.extend(nested_prefetch)
+
+    return select_related, prefetch_related, only
+
+
+def plan_queryset(queryset, serializer, required=()):
+    """
+    Applies select_related/prefetch_related derived from the serializer tree, and only() the
+    columns the serializer reads, so that serializing the queryset costs a fixed number of queries.
+    `required` lists extra columns to load, e.g. the ordering used for pagination.
+    """
+    select_related, prefetch_related, only = _plan(queryset.model, serializer)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    if only is not None:
+        queryset = queryset.only(*only, *required)
+    return queryset
+
+
+class QueryPlanMixin:
+    """ Generic view mixin that plans the queryset from the view's serializer """
+
+    def get_queryset(self):
+        required = []
+        paginator = self.paginator
+        if paginator is not None and hasattr(paginator, 'get_ordering'):
+            required = [name.lstrip('-') for name in paginator.get_ordering(self)]
+        return plan_queryset(super().get_queryset(), self.get_serializer(), required=required)
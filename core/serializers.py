@@ -0,0 +1,79 @@
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+
+class DynamicFieldsMixin:
+    """
+    ModelSerializer mixin for sparse fieldsets, driven by the request's query parameters.
+
+    ?fields=id,title,modules.title  keeps only the listed fields, nested serializers use dotted paths
+    ?expand=modules                 adds fields declared in Meta.expandable_fields, which maps a field
+                                    name to a (serializer_class, kwargs) pair
+    """
+
+    def _field_path(self):
+        """ Dotted path of this serializer from the root serializer and the root itself """
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        names.reverse()
+        return names, node
+
+    def _requested(self, param):
+        path, root = self._field_path()
+        request = root.context.get('request')
+        if request is None or not request.query_params.get(param):
+            return None
+
+        prefix = '.'.join(path) + '.' if path else ''
+        requested = set()
+        for entry in request.query_params.get(param).split(','):
+            entry = entry.strip()
+            if entry.startswith(prefix) and len(entry) > len(prefix):
+                requested.add(entry[len(prefix):].split('.')[0])
+        return requested or None
+
+    def get_fields(self):
+        fields = super().get_fields()
+
+        expand = self._requested('expand') or set()
+        for name, (serializer_class, kwargs) in getattr(self.Meta, 'expandable_fields', {}).items():
+            if name in expand:
+                fields[name] = serializer_class(**kwargs)
+
+        only = self._requested('fields')
+        if only is not None:
+            fields = {name: field for name, field in fields.items() if name in only}
+        return fields
+
+
+class ImageRenditionsField(serializers.ReadOnlyField):
+    """
+    Renders the renditions JSON of an image (see core.images) as URLs, e.g.
+    ImageRenditionsField(source='thumbnail_renditions') gives
+    {'thumbnail': {'webp': url, 'fallback': url, 'width': 160, 'height': 90}, 'medium': {...}, ...,
+     'srcset': {'webp': 'url 160w, url 640w, ...', 'fallback': '...'}}
+    and {} until the renditions exist, clients then use the original image.
+    """
+
+    def url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def to_representation(self, value):
+        sizes = {name: rendition for name, rendition in (value or {}).items() if isinstance(rendition, dict)}
+        if not sizes:
+            return {}
+        data = {}
+        srcset = {'webp': [], 'fallback': []}
+        for name, rendition in sorted(sizes.items(), key=lambda item: item[1]['width']):
+            data[name] = {'width': rendition['width'], 'height': rendition['height']}
+            for format in srcset:
+                data[name][format] = self.url(rendition[format])
+                srcset[format].append(f"{data[name][format]} {rendition['width']}w")
+        data['srcset'] = {format: ', '.join(entries) for format, entries in srcset.items()}
+        return data
@@ -0,0 +1,85 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import OutboundEmail, SweepRun
+
+# name -> function(batch_size) returning the number of rows it changed, see sweep()
+sweeps = {}
+
+
+def sweep(name):
+    """
+    Registers a periodic sweep. Apps declare theirs in a sweeps.py module, which run_sweeps() imports for
+    every installed app, so sweeps of apps that are not installed never run.
+    """
+    def decorator(func):
+        sweeps[name] = func
+        return func
+    return decorator
+
+
+def update_in_batches(queryset, batch_size, **updates):
+    """
+    Applies update(**updates) to the rows of queryset in batches of batch_size primary keys, each its own
+    short UPDATE. The updates must take the rows out of queryset (e.g. change the status it filters on),
+    which is what ends the loop. Returns the number of rows updated.
+    """
+    updated = 0
+    while True:
+        batch = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return updated
+        # the filter is applied again, rows changed since they were selected are left alone
+        updated += queryset.filter(pk__in=batch).update(**updates)
+
+
+def delete_in_batches(queryset, batch_size):
+    """ Deletes the rows of queryset batch_size primary keys at a time, returns the number of rows deleted """
+    deleted = 0
+    while True:
+        batch = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += queryset.model._default_manager.filter(pk__in=batch).delete()[0]
+
+
+def run_sweep(name, batch_size=None):
+    """ Runs one sweep and records a SweepRun with its row count, duration and error if any """
+    batch_size = batch_size or getattr(settings, 'SWEEP_BATCH_SIZE', 1000)
+    run = SweepRun(name=name)
+    started = time.perf_counter()
+    try:
+        run.rows = sweeps[name](batch_size)
+    except Exception as e:
+        run.status = SweepRun.FAILED
+        run.error = f'{type(e).__name__}: {e}'
+    run.duration_ms = int((time.perf_counter() - started) * 1000)
+    run.finished_at = timezone.now()
+    run.save()
+    return run
+
+
+def run_sweeps(names=None, batch_size=None):
+    """ Runs the registered sweeps, or the named ones, and returns their SweepRuns """
+    autodiscover_modules('sweeps')
+    return [run_sweep(name, batch_size) for name in (names or list(sweeps))]
+
+
+@sweep('purge_sweep_runs')
+def purge_sweep_runs(batch_size):
+    """ Drops run records older than SWEEP_RUN_RETENTION_DAYS """
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'SWEEP_RUN_RETENTION_DAYS', 30))
+    return delete_in_batches(SweepRun.objects.filter(started_at__lt=cutoff), batch_size)
+
+
+@sweep('purge_sent_emails')
+def purge_sent_emails(batch_size):
+    """ Drops sent and failed emails older than EMAIL_OUTBOX_RETENTION_DAYS, their contexts hold reset codes in plaintext """
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'EMAIL_OUTBOX_RETENTION_DAYS', 7))
+    return delete_in_batches(
+        OutboundEmail.objects.filter(status__in=[OutboundEmail.SENT, OutboundEmail.FAILED], created_at__lt=cutoff), batch_size
+    )
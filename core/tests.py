@@ -1,3 +1,246 @@
-from django.test import TestCase
+from io import BytesIO, StringIO
+from datetime import timedelta
+import os
+import smtplib
+import tempfile
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from marketplace.models import JobMatch, JobPosting
+from users.models import PasswordResetCode, User
+from . import images
+from .images import image_worker
+from .mail import OutboxWorker, enqueue_email
+from .models import OutboundEmail, SweepRun
+from .serializers import ImageRenditionsField
+from .sweeps import run_sweeps, sweep, sweeps, update_in_batches
 
 # Create your tests here.
+class RecordingBackend(LocmemBackend):
+    """ locmem backend that counts connections and rejects the addresses in `reject` """
+    opened = 0
+    reject = set()
+
+    def open(self):
+        RecordingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        if any(address in self.reject for message in messages for address in message.to):
+            raise smtplib.SMTPRecipientsRefused({})
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='core.tests.RecordingBackend')
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        RecordingBackend.opened = 0
+        RecordingBackend.reject = set()
+
+    def test_password_reset_only_enqueues(self):
+        User.objects.create_user('member@example.com', 'password')
+        response = self.client.post(reverse('password_reset'), {'email': 'member@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.template_name, 'password_reset')
+
+        out = StringIO()
+        call_command('send_queued_emails', '--once', stdout=out)
+        self.assertIn('Sent 1 email(s), 0 failed', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(email.context['code'], mail.outbox[0].alternatives[0][0])
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.SENT)
+
+    def test_batches_share_a_connection(self):
+        for i in range(5):
+            enqueue_email(f'user{i}@example.com', 'Hello', 'password_reset', {'email': 'x', 'code': '1234'})
+        self.assertEqual(OutboxWorker(batch_size=3).run_once(), (5, 0))
+        self.assertEqual(RecordingBackend.opened, 2)
+        self.assertEqual(len(mail.outbox), 5)
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_BACKOFF_SECONDS=60)
+    def test_failures_back_off_then_give_up(self):
+        RecordingBackend.reject = {'bounce@example.com'}
+        bounce = enqueue_email('bounce@example.com', 'Hello', 'password_reset', {'email': 'x', 'code': '1234'})
+        enqueue_email('ok@example.com', 'Hello', 'password_reset', {'email': 'x', 'code': '1234'})
+
+        with self.assertLogs('core.mail', 'WARNING'):
+            self.assertEqual(OutboxWorker().run_once(), (1, 1))
+        bounce.refresh_from_db()
+        self.assertEqual((bounce.status, bounce.attempts), (OutboundEmail.PENDING, 1))
+        self.assertGreater(bounce.send_after, timezone.now() + timedelta(seconds=50))
+        # not due yet
+        self.assertEqual(OutboxWorker().run_once(), (0, 0))
+
+        OutboundEmail.objects.filter(pk=bounce.pk).update(send_after=timezone.now())
+        with self.assertLogs('core.mail', 'WARNING'):
+            self.assertEqual(OutboxWorker().run_once(), (0, 1))
+        bounce.refresh_from_db()
+        self.assertEqual((bounce.status, bounce.attempts), (OutboundEmail.FAILED, 2))
+        self.assertTrue(bounce.last_error)
+
+    @override_settings(EMAIL_OUTBOX_RETENTION_DAYS=7)
+    def test_old_sent_and_failed_emails_are_purged(self):
+        emails = [enqueue_email(f'user{i}@example.com', 'Hello', 'password_reset', {'email': 'x', 'code': '1234'}) for i in range(4)]
+        old = timezone.now() - timedelta(days=8)
+        OutboundEmail.objects.filter(pk=emails[0].pk).update(status=OutboundEmail.SENT, created_at=old)
+        OutboundEmail.objects.filter(pk=emails[1].pk).update(status=OutboundEmail.FAILED, created_at=old)
+        # still waiting to be sent, and sent recently
+        OutboundEmail.objects.filter(pk=emails[2].pk).update(created_at=old)
+        OutboundEmail.objects.filter(pk=emails[3].pk).update(status=OutboundEmail.SENT)
+
+        run, = run_sweeps(['purge_sent_emails'])
+        self.assertEqual((run.status, run.rows), (SweepRun.OK, 2))
+        self.assertCountEqual(OutboundEmail.objects.values_list('pk', flat=True), [emails[2].pk, emails[3].pk])
+
+
+@override_settings(IMAGE_RENDITION_WORKERS=0, IMAGE_RENDITION_SIZES={'thumbnail': 50, 'medium': 200, 'large': 400})
+class ImageRenditionTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, size=(300, 150), mode='RGB', format='JPEG', name='photo.jpg'):
+        buffer = BytesIO()
+        Image.new(mode, size, 'red').save(buffer, format=format)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{format.lower()}')
+
+    def test_upload_generates_renditions_after_commit(self):
+        user = User.objects.create_user('member@example.com', 'password')
+        user.profile_picture = self.upload()
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+        renditions = User.objects.get(pk=user.pk).profile_picture_renditions
+        self.assertEqual(renditions['source'], user.profile_picture.name)
+        self.assertEqual((renditions['thumbnail']['width'], renditions['thumbnail']['height']), (50, 25))
+        # never enlarged
+        self.assertEqual(renditions['large']['width'], 300)
+        self.assertTrue(renditions['medium']['webp'].endswith('.webp'))
+        self.assertTrue(renditions['medium']['fallback'].endswith('.jpg'))
+        for rendition in (renditions['thumbnail'], renditions['medium']):
+            with default_storage.open(rendition['webp']) as file:
+                self.assertEqual(Image.open(file).format, 'WEBP')
+
+        # saving again without a new upload queues nothing
+        with mock.patch.object(image_worker, 'submit') as submit, self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(pk=user.pk).save()
+        submit.assert_not_called()
+
+    def test_same_content_is_stored_once(self):
+        users = [User.objects.create_user(f'member{i}@example.com', 'password') for i in range(2)]
+        for user in users:
+            user.profile_picture = self.upload(mode='RGBA', format='PNG', name='logo.png')
+            with self.captureOnCommitCallbacks(execute=True):
+                user.save()
+        first, second = (User.objects.get(pk=user.pk).profile_picture_renditions for user in users)
+        self.assertNotEqual(first['source'], second['source'])
+        self.assertEqual(first['thumbnail'], second['thumbnail'])
+        self.assertTrue(first['thumbnail']['fallback'].endswith('.png'))
+
+    def test_replaced_image_is_not_overwritten(self):
+        user = User.objects.create_user('member@example.com', 'password')
+        user.profile_picture = self.upload()
+        user.save()
+        store_renditions = images.store_renditions
+
+        def replaced_meanwhile(field_file):
+            renditions = store_renditions(field_file)
+            User.objects.filter(pk=user.pk).update(profile_picture='profile_pictures/newer.jpg')
+            return renditions
+
+        with mock.patch.object(images, 'store_renditions', replaced_meanwhile):
+            self.assertIsNone(image_worker.submit(User, user.pk, 'profile_picture'))
+        self.assertEqual(User.objects.get(pk=user.pk).profile_picture_renditions, {})
+
+    def test_backfill_goes_on_after_a_bad_image(self):
+        for i in range(2):
+            user = User.objects.create_user(f'member{i}@example.com', 'password')
+            user.profile_picture = self.upload()
+            user.save()
+        out = StringIO()
+        with mock.patch(
+            'core.management.commands.generate_image_renditions.generate_renditions',
+            side_effect=[Image.DecompressionBombError('too many pixels'), None],
+        ):
+            call_command('generate_image_renditions', stdout=out)
+        self.assertIn('DecompressionBombError: too many pixels', out.getvalue())
+        self.assertIn('users.User.profile_picture: generated 1, 1 failed', out.getvalue())
+
+    def test_serializer_field(self):
+        renditions = {
+            'source': 'profile_pictures/photo.jpg',
+            'medium': {'webp': 'renditions/ab/cd.webp', 'fallback': 'renditions/ab/cd.jpg', 'width': 200, 'height': 100},
+            'thumbnail': {'webp': 'renditions/ef/gh.webp', 'fallback': 'renditions/ef/gh.jpg', 'width': 50, 'height': 25},
+        }
+        field = ImageRenditionsField()
+        field._context = {'request': RequestFactory().get('/')}
+        data = field.to_representation(renditions)
+        self.assertEqual(data['thumbnail']['webp'], 'http://testserver/media/renditions/ef/gh.webp')
+        self.assertEqual(data['srcset']['fallback'], 'http://testserver/media/renditions/ef/gh.jpg 50w, http://testserver/media/renditions/ab/cd.jpg 200w')
+        self.assertEqual(field.to_representation({}), {})
+
+
+class SweepTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('client@example.com', 'password', role=User.CLIENT)
+        now = timezone.now()
+        self.expired = [self.job(now - timedelta(days=i + 1)) for i in range(5)]
+        self.open = self.job(now + timedelta(days=1))
+        self.undated = self.job(None)
+
+    def job(self, deadline):
+        return JobPosting.objects.create(client=self.owner, title='Job', description='Work', status=JobPosting.PUBLISHED, application_deadline=deadline)
+
+    def test_expired_jobs_are_closed_in_batches(self):
+        JobMatch.objects.create(job=self.expired[0], talent=self.owner, score=1, skill_score=1)
+        with self.assertNumQueries(2 * 3 + 1 + 1 + 1):
+            # three batches of two, the empty batch ending the loop, the matches of closed jobs, the run record
+            run, = run_sweeps(['close_expired_jobs'], batch_size=2)
+        self.assertEqual((run.status, run.rows), (SweepRun.OK, 5))
+        self.assertEqual(JobPosting.objects.filter(status=JobPosting.CLOSED).count(), 5)
+        self.assertCountEqual(JobPosting.objects.active(), [self.open, self.undated])
+        self.assertFalse(JobMatch.objects.exists())
+
+    def test_all_sweeps_run_and_are_recorded(self):
+        user = User.objects.create_user('member@example.com', 'password')
+        PasswordResetCode.objects.create(user=user, expires_at=timezone.now() - timedelta(minutes=1))
+        PasswordResetCode.objects.create(user=user)
+        out = StringIO()
+        with mock.patch('core.management.commands.run_sweeps.close_old_connections') as close_old_connections:
+            call_command('run_sweeps', once=True, stdout=out)
+        close_old_connections.assert_called_once_with()
+
+        runs = {run.name: run for run in SweepRun.objects.all()}
+        self.assertEqual(runs['close_expired_jobs'].rows, 5)
+        self.assertEqual(runs['purge_reset_codes'].rows, 1)
+        self.assertNotIn('expire_invitations', runs)
+        self.assertIn('close_expired_jobs: 5 row(s)', out.getvalue())
+
+    def test_failures_are_recorded(self):
+        @sweep('broken')
+        def broken(batch_size):
+            raise ValueError('boom')
+        self.addCleanup(sweeps.pop, 'broken')
+
+        run, = run_sweeps(['broken'])
+        self.assertEqual((run.status, run.error), (SweepRun.FAILED, 'ValueError: boom'))
+
+    def test_update_in_batches_skips_rows_changed_meanwhile(self):
+        self.assertEqual(update_in_batches(JobPosting.objects.expired(), 100, status=JobPosting.CLOSED), 5)
+        self.assertEqual(update_in_batches(JobPosting.objects.expired(), 100, status=JobPosting.CLOSED), 0)
@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.db.models import Q
 from .models import Course, Module, Lesson, Enrollment, CourseReview, Resource
+from .search import course_search
 
 # Register your models here.
 @admin.register(Course)
@@ -7,10 +9,18 @@ class CourseAdmin(admin.ModelAdmin):
     list_display = ['title', 'mentor', 'level', 'price', 'status', 'students_count', 'average_rating', 'created_at']
     list_filter = ['status', 'level', 'is_free', 'is_featured', 'category', 'created_at']
     search_fields = ['title', 'description', 'mentor__email', 'mentor__first_name', 'mentor__last_name']
-    readonly_fields = ['students_count', 'average_rating', 'review_count', 'created_at', 'updated_at']
+    readonly_fields = ['students_count', 'average_rating', 'review_count', 'rating_total', 'created_at', 'updated_at']
     prepopulated_fields = {'title': ['title']}
     filter_horizontal = ['skills_covered']
 
+    def get_search_results(self, request, queryset, search_term):
+        # the full-text index replaces icontains scans over the text columns, drafts included,
+        # keeping the best 1000 matches
+        if not search_term or not course_search.is_supported():
+            return super().get_search_results(request, queryset, search_term)
+        course_ids = course_search.search(search_term, published=False, limit=1000)
+        return queryset.filter(Q(pk__in=course_ids) | Q(mentor__email__iexact=search_term.strip())), False
+
 @admin.register(Module)
 class ModuleAdmin(admin.ModelAdmin):
     list_display = ['title', 'course', 'is_active', 'created_at']
@@ -29,7 +39,7 @@ class EnrollmentAdmin(admin.ModelAdmin):
     list_display = ['student', 'course', 'payment_status', 'progress', 'enrolled_at']
     list_filter = ['payment_status', 'is_active', 'enrolled_at']
     search_fields = ['student__email', 'course__title']
-    readonly_fields = ['enrolled_at', 'last_accessed']
+    readonly_fields = ['enrolled_at', 'last_accessed', 'updated_at']
 
 @admin.register(CourseReview)
 class CourseReviewAdmin(admin.ModelAdmin):
@@ -0,0 +1,32 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from courses.progress import bulk_complete_lessons
+
+
+class Command(BaseCommand):
+    help = "Imports lesson completions from a CSV with enrollment, lesson and optional time_spent_minutes/notes columns"
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help="Path to the CSV file")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def rows(self, reader):
+        for line, row in enumerate(reader, start=2):
+            try:
+                yield {
+                    'enrollment': int(row['enrollment']),
+                    'lesson': int(row['lesson']),
+                    'time_spent_minutes': int(row.get('time_spent_minutes') or 0),
+                    'notes': row.get('notes') or '',
+                }
+            except (KeyError, TypeError, ValueError):
+                self.stderr.write(f"Line {line}: invalid row {row}")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_file'], newline='') as f:
+                imported, skipped = bulk_complete_lessons(self.rows(csv.DictReader(f)), batch_size=options['batch_size'])
+        except OSError as e:
+            raise CommandError(e)
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} completion(s), skipped {skipped} invalid or already imported row(s)"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from courses.models import Course
+from courses.signals import invalidate_course_responses
+
+
+class Command(BaseCommand):
+    help = "Rebuilds average_rating, review_count and rating_total of courses from their approved reviews"
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int, help="Only rebuild these courses")
+
+    def handle(self, *args, **options):
+        courses = Course.objects.all()
+        if options['course_ids']:
+            courses = courses.filter(pk__in=options['course_ids'])
+        started = timezone.now()
+        updated = courses.rebuild_ratings()
+        # rebuild_ratings() moves updated_at of the courses it changed, their cached responses go too
+        changed = list(Course.objects.filter(updated_at__gte=started).values_list('pk', flat=True))
+        if changed:
+            invalidate_course_responses(*changed, touch=False)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt ratings for {updated} course(s)"))
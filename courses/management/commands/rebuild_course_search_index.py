@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from courses.search import course_search
+
+
+class Command(BaseCommand):
+    help = "Drops and rebuilds the full-text search index of the course catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help="Database alias to rebuild the index on")
+
+    def handle(self, *args, **options):
+        count = course_search.rebuild(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} course(s)"))
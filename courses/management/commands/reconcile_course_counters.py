@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from courses.models import Course, Module
+from courses.signals import invalidate_course_responses
+
+
+class Command(BaseCommand):
+    help = "Recomputes the stored lesson and duration counters of every module and course"
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        with transaction.atomic():
+            modules = Module.objects.refresh_lesson_counters()
+            courses = Course.objects.refresh_lesson_counters()
+            # the refreshes move updated_at of the rows they changed, a course also renders its modules' counters
+            changed_modules = set(Course.objects.filter(modules__updated_at__gte=started).values_list('pk', flat=True))
+            if changed_modules:
+                invalidate_course_responses(*changed_modules)
+            changed = set(Course.objects.filter(updated_at__gte=started).values_list('pk', flat=True)) - changed_modules
+            if changed:
+                invalidate_course_responses(*changed, touch=False)
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {modules} module(s) and {courses} course(s)"))
@@ -1,11 +1,74 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Avg, Case, Count, Exists, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Least, NullIf
+from django.db.models.lookups import GreaterThanOrEqual
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from users.models import User
+from users.reputation import add_reputation
+from core.counters import increment_counter
 from skills.models import Skill, Category
 from decimal import Decimal
 
 # Create your models here.
+def touched_if_changed(**values):
+    """
+    updated_at for an UPDATE that sets `values`: now on the rows where one of them changes, so bulk
+    recomputations move the conditional GET validators only of the rows they actually changed
+    """
+    changed = Q()
+    for name, value in values.items():
+        changed |= ~Q(**{name: value})
+    return Case(When(changed, then=Value(timezone.now())), default=F('updated_at'))
+
+class CourseQuerySet(models.QuerySet):
+    def apply_rating_change(self, count_delta, total_delta):
+        """ Shifts the stored rating aggregates in a single atomic UPDATE, without reading the reviews """
+        new_count = F('review_count') + count_delta
+        new_total = F('rating_total') + total_delta
+        return self.update(
+            review_count=new_count,
+            rating_total=new_total,
+            average_rating=Case(
+                When(review_count__gt=-count_delta, then=Cast(new_total, FloatField()) / new_count),
+                default=Value(0.0),
+                output_field=FloatField(),
+            ),
+        )
+
+    def rebuild_ratings(self):
+        """ Recomputes the rating aggregates of every course in the queryset from the approved reviews """
+        reviews = CourseReview.objects.filter(
+            enrollment__course=OuterRef('pk'), is_approved=True
+        ).order_by().values('enrollment__course')
+        values = {
+            'review_count': Coalesce(Subquery(reviews.annotate(count=Count('pk')).values('count')), 0),
+            'rating_total': Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+            'average_rating': Coalesce(Subquery(reviews.annotate(average=Avg('rating')).values('average')), 0.0),
+        }
+        return self.update(**values, updated_at=touched_if_changed(**values))
+
+    def refresh_lesson_counters(self):
+        """ Recomputes total_lessons/total_duration_minutes from the active lessons of active modules """
+        lessons = Lesson.objects.filter(
+            module__course=OuterRef('pk'), module__is_active=True, is_active=True
+        ).order_by().values('module__course')
+        values = {
+            'total_lessons': Coalesce(Subquery(lessons.annotate(count=Count('pk')).values('count')), 0),
+            'total_duration_minutes': Coalesce(Subquery(lessons.annotate(total=Sum('duration_minutes')).values('total')), 0),
+        }
+        return self.update(**values, updated_at=touched_if_changed(**values))
+
+class ModuleQuerySet(models.QuerySet):
+    def refresh_lesson_counters(self):
+        """ Recomputes total_lessons/total_duration_minutes from the active lessons of each module """
+        lessons = Lesson.objects.filter(module=OuterRef('pk'), is_active=True).order_by().values('module')
+        values = {
+            'total_lessons': Coalesce(Subquery(lessons.annotate(count=Count('pk')).values('count')), 0),
+            'total_duration_minutes': Coalesce(Subquery(lessons.annotate(total=Sum('duration_minutes')).values('total')), 0),
+        }
+        return self.update(**values, updated_at=touched_if_changed(**values))
+
 class Course(models.Model):
     """ Main course model for the learning portal """
     BEGINNER = 0
@@ -36,6 +99,7 @@ class Course(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='courses')
     skills_covered = models.ManyToManyField(Skill, related_name='courses')
     thumbnail = models.ImageField(upload_to='courses_thumbnails/', null=True, blank=True, help_text='Recommended pixel dimension ...')
+    thumbnail_renditions = models.JSONField(default=dict, blank=True, editable=False)
     preview_video = models.URLField(null=True, blank=True, help_text="YouTube URL for course preview")
     level = models.IntegerField(choices=LEVEL_CHOICES, default=BEGINNER)
     duration_hours = models.FloatField(default=0.0, help_text="Total course duration in hours")
@@ -46,14 +110,29 @@ class Course(models.Model):
     students_count = models.PositiveIntegerField(default=0)
     average_rating = models.FloatField(default=0.0, validators=[MinValueValidator(0), MaxValueValidator(5)])
     review_count = models.PositiveIntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0, help_text="Sum of approved review ratings")
     is_featured = models.BooleanField(default=False)
     is_certified = models.BooleanField(default=False, help_text="Course offers certification")
+    total_lessons = models.PositiveIntegerField(default=0, editable=False, help_text="Active lessons in active modules, kept up to date by signals")
+    total_duration_minutes = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     published_at = models.DateTimeField(null=True, blank=True)
 
+    objects = CourseQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # back the catalog filters, each one followed by the keyset pagination ordering
+            models.Index(fields=['-created_at', '-id'], name='course_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='course_status_created_idx'),
+            models.Index(fields=['level', '-created_at', '-id'], name='course_level_created_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='course_category_created_idx'),
+            models.Index(fields=['is_free', '-created_at', '-id'], name='course_free_created_idx'),
+            models.Index(fields=['is_featured', '-created_at', '-id'], name='course_featured_created_idx'),
+            models.Index(fields=['mentor', '-created_at', '-id'], name='course_mentor_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if self.status == Course.PUBLISHED and not self.published_at:
@@ -83,21 +162,17 @@ class Course(models.Model):
     
     #@property
     def update_rating(self):
-        #reviews = self.enrollments.review.filter(is_approved=True) # pyright: ignore[reportAttributeAccessIssue] #flag might need to get all enrollments and iterate through each review for the rating to sum up
-        reviews = CourseReview.objects.filter(enrollment__course=self, is_approved=True)
-        if reviews.exists():
-            self.average_rating = sum([review.rating for review in reviews]) / reviews.count()
-            self.review_count = reviews.count()
-            self.save()
+        """ Rebuilds the rating from the approved reviews in one statement """
+        Course.objects.filter(pk=self.pk).rebuild_ratings()
+        self.refresh_from_db(fields=['average_rating', 'review_count', 'rating_total'])
     
     #property
     def get_total_lessons(self):
-        return sum([module.lessons.count() for module in self.modules.all()])
+        return self.total_lessons
     
     #property
     def get_total_duration(self):
-        total_minutes = sum([sum([lesson.duration_minutes for lesson in module.lessons.all()]) for module in self.modules.all()])
-        return total_minutes
+        return self.total_duration_minutes
     
 class Module(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='modules')
@@ -105,19 +180,26 @@ class Module(models.Model):
     description = models.TextField(blank=True, null=True)
     #order = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
+    total_lessons = models.PositiveIntegerField(default=0, editable=False)
+    total_duration_minutes = models.PositiveIntegerField(default=0, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ModuleQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['course', '-created_at', '-id'], name='module_course_created_idx'),
+        ]
         #unique_together = ['course', 'order']
 
     def __str__(self):
         return f"{self.course.title} - {self.title}"
     
     def get_lessons_count(self):
-        return self.lessons.count() # pyright: ignore[reportAttributeAccessIssue]
+        return self.total_lessons
     
 class Lesson(models.Model):
     VIDEO = 0
@@ -151,6 +233,10 @@ class Lesson(models.Model):
 
     class Meta:
         ordering = ['-created_at'] 
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='lesson_created_idx'),
+            models.Index(fields=['module', '-created_at', '-id'], name='lesson_module_created_idx'),
+        ]
         #unique_together = ['module', 'order']
 
     def __str__(self):
@@ -160,6 +246,37 @@ class Lesson(models.Model):
     def course(self):
         return self.module.course
     
+class EnrollmentQuerySet(models.QuerySet):
+    def recompute_progress(self):
+        """
+        Recomputes progress, completed_at and the certificate flags of every enrollment in the
+        queryset in a single UPDATE, counting completions of active lessons in active modules.
+        Certificates issued by it are added to the students' reputation.
+        """
+        completed = Coalesce(Subquery(
+            LessonCompletion.objects.filter(
+                enrollment=OuterRef('pk'), lesson__is_active=True, lesson__module__is_active=True
+            ).order_by().values('enrollment').annotate(count=Count('pk')).values('count')
+        ), 0)
+        total = Subquery(Course.objects.filter(pk=OuterRef('course_id')).order_by().values('total_lessons'))
+        progress = Least(Cast(completed, FloatField()) * 100.0 / NullIf(total, 0), Value(100.0))
+        finished = Q(GreaterThanOrEqual(progress, 100.0), completed_at__isnull=True)
+        certified = Exists(Course.objects.filter(pk=OuterRef('course_id'), is_certified=True).order_by())
+        now = timezone.now()
+
+        updated = self.update(
+            progress=Case(When(GreaterThanOrEqual(total, 1), then=progress), default=F('progress')),
+            completed_at=Case(When(finished, then=Value(now)), default=F('completed_at')),
+            certificate_issued=Case(When(finished & Q(certified), then=Value(True)), default=F('certificate_issued')),
+            certificate_issued_at=Case(When(finished & Q(certified), then=Value(now)), default=F('certificate_issued_at')),
+            # update() skips auto_now, conditional GETs validate on updated_at
+            updated_at=now,
+        )
+        # the rows certified just now are the ones stamped with this call's timestamp
+        issued = self.filter(certificate_issued_at=now).order_by().values('student').annotate(count=Count('pk'))
+        add_reputation({row['student']: {'certificates_earned': row['count']} for row in issued})
+        return updated
+
 class Enrollment(models.Model):
     PENDING = 0
     COMPLETED = 1
@@ -190,6 +307,9 @@ class Enrollment(models.Model):
 
     enrolled_at = models.DateTimeField(auto_now_add=True)
     last_accessed = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = EnrollmentQuerySet.as_manager()
 
     class Meta:
         unique_together = ('student', 'course')
@@ -199,17 +319,8 @@ class Enrollment(models.Model):
         return f"{self.student.email} - {self.course.title}"
     
     def update_progress(self):
-        total_lessons = self.course.get_total_lessons()
-        if total_lessons > 0:
-            completed_lessons = self.lesson_completions.count()
-            self.progress = (completed_lessons / total_lessons) * 100
-
-            if self.progress >= 100 and not self.completed_at: #if course is completed by the student
-                self.completed_at = timezone.now()
-                if self.course.is_certified:#if the course offers certification
-                    self.certificate_issued = True
-                    self.certificate_issued_at = timezone.now
-            self.save()
+        Enrollment.objects.filter(pk=self.pk).recompute_progress()
+        self.refresh_from_db(fields=['progress', 'completed_at', 'certificate_issued', 'certificate_issued_at', 'updated_at'])
 
     @property
     def is_completed(self):
@@ -227,6 +338,7 @@ class LessonCompletion(models.Model):
     completed_at = models.DateTimeField(auto_now_add=True)
     time_spent_minutes = models.PositiveIntegerField(default=0, help_text="Time Spent on lesson in minutes")
     notes = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('enrollment', 'lesson')
@@ -235,8 +347,10 @@ class LessonCompletion(models.Model):
         return f"{self.enrollment.student.email} completed {self.lesson.title}"
     
     def save(self, *args, **kwargs):
+        from .progress import defer_enrollment_update
         super().save(*args, **kwargs)
-        self.enrollment.update_progress()
+        if not defer_enrollment_update(self.enrollment_id):
+            self.enrollment.update_progress()
 
 class CourseReview(models.Model):
     """Student review and rating for courses"""
@@ -257,10 +371,17 @@ class CourseReview(models.Model):
         return f"Review for {self.enrollment.course.title} by {self.enrollment.student.email}"
     
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-
-        if self.is_approved:
-            self.enrollment.course.update_rating()
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = CourseReview.objects.select_for_update().filter(pk=self.pk).values('is_approved', 'rating').first()
+            super().save(*args, **kwargs)
+
+            was_approved = bool(previous and previous['is_approved'])
+            count_delta = int(self.is_approved) - int(was_approved)
+            total_delta = (self.rating if self.is_approved else 0) - (previous['rating'] if was_approved else 0)
+            if count_delta or total_delta:
+                Course.objects.filter(enrollments=self.enrollment_id).apply_rating_change(count_delta, total_delta)
 
 class Resource(models.Model):
     TEMPLATE = 0
@@ -297,7 +418,8 @@ class Resource(models.Model):
         ordering = ['-created_at']
 
     def save(self, *args, **kwargs):
-        if self.file:
+        # only ask the storage for the size of a newly assigned file
+        if self.file and (self.file_size is None or not self.file._committed):
             self.file_size = self.file.size
         super().save(*args, **kwargs)
 
@@ -305,5 +427,4 @@ class Resource(models.Model):
         return self.title
     
     def increment_download_count(self):
-        self.download_count += 1
-        self.save()
\ No newline at end of file
+        increment_counter(self, 'download_count')
\ No newline at end of file
@@ -0,0 +1,101 @@
+import threading
+from contextlib import contextmanager
+from itertools import islice
+
+from django.db import transaction
+
+from .models import Enrollment, Lesson, LessonCompletion
+
+_state = threading.local()
+
+
+def defer_enrollment_update(enrollment_id):
+    """
+    Called by LessonCompletion.save(). Inside defer_progress_updates() the enrollment is only
+    recorded and True is returned, otherwise the caller recomputes progress straight away
+    """
+    pending = getattr(_state, 'pending', None)
+    if pending is None:
+        return False
+    pending.add(enrollment_id)
+    return True
+
+
+@contextmanager
+def defer_progress_updates():
+    """
+    Defers the per-row progress recomputation of LessonCompletion.save() and recomputes every
+    touched enrollment together when the block exits. The block runs in one transaction, so when it
+    raises the completions saved so far are rolled back with it instead of outliving their progress
+    """
+    if getattr(_state, 'pending', None) is not None:
+        # nested, the outermost block does the work
+        yield _state.pending
+        return
+
+    _state.pending = set()
+    try:
+        with transaction.atomic():
+            yield _state.pending
+            recompute_progress(_state.pending)
+    finally:
+        _state.pending = None
+
+
+def recompute_progress(enrollment_ids, batch_size=1000):
+    """ Recomputes progress of the given enrollments with one grouped UPDATE per batch """
+    enrollment_ids = list(enrollment_ids)
+    updated = 0
+    for start in range(0, len(enrollment_ids), batch_size):
+        updated += Enrollment.objects.filter(pk__in=enrollment_ids[start:start + batch_size]).recompute_progress()
+    return updated
+
+
+def _insert_completions(batch, touched):
+    """ Inserts the valid rows of a batch, returns how many completions were new """
+    enrollments = dict(Enrollment.objects.filter(pk__in={row['enrollment'] for row in batch}).values_list('pk', 'course_id'))
+    lessons = dict(Lesson.objects.filter(pk__in={row['lesson'] for row in batch}).order_by().values_list('pk', 'module__course_id'))
+
+    completions = []
+    for row in batch:
+        course_id = enrollments.get(row['enrollment'])
+        if course_id is None or lessons.get(row['lesson']) != course_id:
+            continue
+        completions.append(LessonCompletion(
+            enrollment_id=row['enrollment'],
+            lesson_id=row['lesson'],
+            time_spent_minutes=row.get('time_spent_minutes') or 0,
+            notes=row.get('notes') or '',
+        ))
+        touched.add(row['enrollment'])
+    if not completions:
+        return 0
+
+    # ignore_conflicts gives no way to tell inserted rows from existing ones, count them instead
+    existing = LessonCompletion.objects.filter(enrollment__in={c.enrollment_id for c in completions})
+    before = existing.count()
+    LessonCompletion.objects.bulk_create(completions, ignore_conflicts=True)
+    return existing.count() - before
+
+
+def bulk_complete_lessons(rows, batch_size=1000):
+    """
+    Inserts lesson completions from an iterable of dicts with enrollment, lesson and optionally
+    time_spent_minutes/notes keys. Completions that already exist are left alone, rows pointing at
+    unknown enrollments or at lessons outside the enrolled course are skipped.
+    Progress is recomputed once per affected enrollment at the end.
+    Returns (imported, skipped) row counts, skipped counting invalid rows and existing completions.
+    """
+    imported = skipped = 0
+    touched = set()
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        inserted = _insert_completions(batch, touched)
+        imported += inserted
+        skipped += len(batch) - inserted
+
+    recompute_progress(touched, batch_size=batch_size)
+    return imported, skipped
@@ -0,0 +1,212 @@
+import re
+from collections import defaultdict
+
+from django.db import connections, transaction
+
+from .models import Course, Module, Lesson
+
+
+# document columns, from the most to the least significant
+COLUMNS = ('title', 'summary', 'outline', 'mentor', 'description')
+WEIGHTS = {'title': 10.0, 'summary': 5.0, 'outline': 2.0, 'mentor': 1.0, 'description': 1.0}
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())[:16]
+
+
+def build_documents(course_ids, using='default'):
+    """
+    Returns {course_id: (published, {column: text})} for the given courses in a fixed number of queries.
+    The summary column carries the short description and the skill names, the outline the titles of the
+    active modules and lessons.
+    """
+    documents = {}
+    courses = Course.objects.using(using).filter(pk__in=course_ids).values_list(
+        'pk', 'status', 'title', 'short_description', 'description', 'mentor__first_name', 'mentor__last_name'
+    )
+    for pk, status, title, short_description, description, first_name, last_name in courses:
+        documents[pk] = (status == Course.PUBLISHED, {
+            'title': title or '',
+            'summary': [short_description or ''],
+            'outline': [],
+            'mentor': f'{first_name or ""} {last_name or ""}'.strip(),
+            'description': description or '',
+        })
+    if not documents:
+        return documents
+
+    outline = defaultdict(list)
+    modules = Module.objects.using(using).filter(course__in=documents, is_active=True).order_by().values_list('course_id', 'title')
+    for course_id, title in modules:
+        outline[course_id].append(title)
+    lessons = Lesson.objects.using(using).filter(
+        module__course__in=documents, module__is_active=True, is_active=True
+    ).order_by().values_list('module__course_id', 'title')
+    for course_id, title in lessons:
+        outline[course_id].append(title)
+
+    skills = Course.skills_covered.through.objects.using(using).filter(course__in=documents).values_list('course_id', 'skill__name')
+    for course_id, name in skills:
+        documents[course_id][1]['summary'].append(name)
+
+    for pk, (published, columns) in documents.items():
+        columns['summary'] = ' '.join(columns['summary'])
+        columns['outline'] = ' '.join(outline[pk])
+    return documents
+
+
+class SQLiteSearchBackend:
+    """ FTS5 table keyed on the course id, ranked with bm25 """
+    table = 'courses_course_fts'
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                f"{', '.join(COLUMNS)}, published UNINDEXED, tokenize='porter unicode61 remove_diacritics 2')"
+            )
+
+    def drop(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def replace(self, course_ids, documents):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in course_ids])
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, {', '.join(COLUMNS)}, published) VALUES (%s{', %s' * len(COLUMNS)}, %s)",
+                [(pk, *(columns[name] for name in COLUMNS), int(published)) for pk, (published, columns) in documents.items()],
+            )
+
+    def search(self, terms, published, limit, offset):
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(WEIGHTS[name]) for name in COLUMNS)
+        sql = f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s'
+        params = [match]
+        if published:
+            sql += ' AND published = 1'
+        sql += f' ORDER BY bm25({self.table}, {weights}), rowid'
+        if limit is not None:
+            sql += ' LIMIT %s OFFSET %s'
+            params += [limit, offset]
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgreSQLSearchBackend:
+    """ Weighted tsvector per course behind a GIN index, ranked with ts_rank_cd """
+    table = 'courses_course_search'
+    config = 'english'
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} ('
+                f'course_id bigint PRIMARY KEY, published boolean NOT NULL, document tsvector NOT NULL)'
+            )
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_document_idx ON {self.table} USING gin (document)')
+
+    def drop(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def replace(self, course_ids, documents):
+        # tsvector weights only go from A to D, the mentor shares D with the description
+        labels = {'title': 'A', 'summary': 'B', 'outline': 'C', 'mentor': 'D', 'description': 'D'}
+        vector = ' || '.join(f"setweight(to_tsvector('{self.config}', %s), '{labels[name]}')" for name in COLUMNS)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE course_id = ANY(%s)', [list(course_ids)])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (course_id, published, document) VALUES (%s, %s, {vector})',
+                [(pk, published, *(columns[name] for name in COLUMNS)) for pk, (published, columns) in documents.items()],
+            )
+
+    def search(self, terms, published, limit, offset):
+        sql = (
+            f"SELECT course_id FROM {self.table}, to_tsquery('{self.config}', %s) query "
+            f"WHERE document @@ query"
+        )
+        params = [' & '.join(f'{term}:*' for term in terms)]
+        if published:
+            sql += ' AND published'
+        sql += ' ORDER BY ts_rank_cd(document, query) DESC, course_id'
+        if limit is not None:
+            sql += ' LIMIT %s OFFSET %s'
+            params += [limit, offset]
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+
+class CourseSearchIndex:
+    """
+    Inverted index over the course catalog, stored next to the course tables of the database in use.
+    Rows are replaced per course whenever the course, its modules, lessons or skills change (see signals).
+    """
+    batch_size = 500
+
+    def backend(self, using='default'):
+        connection = connections[using]
+        try:
+            return BACKENDS[connection.vendor](connection)
+        except KeyError:
+            raise NotImplementedError(f'Course search is not available on {connection.vendor}')
+
+    def is_supported(self, using='default'):
+        return connections[using].vendor in BACKENDS
+
+    def create(self, using='default'):
+        self.backend(using).create()
+
+    def update(self, course_ids, using='default'):
+        """ Rewrites the documents of the given courses, removing the ones that no longer exist """
+        course_ids = list(dict.fromkeys(course_ids))
+        backend = self.backend(using)
+        for start in range(0, len(course_ids), self.batch_size):
+            batch = course_ids[start:start + self.batch_size]
+            with transaction.atomic(using=using):
+                backend.replace(batch, build_documents(batch, using))
+
+    def rebuild(self, using='default'):
+        backend = self.backend(using)
+        backend.drop()
+        backend.create()
+        course_ids = list(Course.objects.using(using).order_by('pk').values_list('pk', flat=True))
+        self.update(course_ids, using=using)
+        return len(course_ids)
+
+    def search(self, query, published=True, limit=20, offset=0, using='default'):
+        """ Course ids matching every word of the query (as prefixes), best match first """
+        terms = _terms(query)
+        if not terms:
+            return []
+        return self.backend(using).search(terms, published, limit, offset)
+
+    def schedule_update(self, *course_ids):
+        """ Reindexes the courses once the current transaction commits """
+        course_ids = [pk for pk in course_ids if pk is not None]
+        if course_ids and self.is_supported():
+            transaction.on_commit(lambda: self.update(course_ids))
+
+
+course_search = CourseSearchIndex()
+
+
+def create_search_index(using='default', **kwargs):
+    """ post_migrate handler, the index table is not a model and has no migration of its own """
+    if course_search.is_supported(using):
+        course_search.create(using)
@@ -4,52 +4,86 @@
 # serializers.py for courses app
 # ModelSerializers for all models in courses/models.py
 from rest_framework import serializers
+from core.serializers import DynamicFieldsMixin, ImageRenditionsField
 from .models import Course, Module, Lesson, Enrollment, LessonCompletion, CourseReview, Resource
 
 # Serializes Lesson model
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Lesson
         fields = ['id', 'module', 'title', 'description', 'lesson_type', 'article_content', 'video_url', 'attachment', 'is_preview', 'is_active', 'created_at', 'updated_at']
         read_only_fields = ['id', 'module', 'created_at', 'updated_at']
 
+# Serializes Lesson model for listings, leaving out the article body
+class LessonListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Lesson
+        fields = ['id', 'module', 'title', 'description', 'lesson_type', 'video_url', 'attachment', 'duration_minutes', 'is_preview', 'is_active', 'created_at', 'updated_at']
+        read_only_fields = fields
+        expandable_fields = {
+            'article_content': (serializers.CharField, {'read_only': True}),
+        }
+
 # Serializes Module model
-class ModuleSerializer(serializers.ModelSerializer):
+class ModuleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     lessons = LessonSerializer(many=True)
     class Meta:
         model = Module
-        fields = ['id', 'course', 'title', 'description', 'is_active', 'created_at', 'updated_at', 'lessons']
-        read_only_fields = ['id', 'course', 'created_at', 'updated_at']
+        fields = ['id', 'course', 'title', 'description', 'is_active', 'total_lessons', 'total_duration_minutes', 'created_at', 'updated_at', 'lessons']
+        read_only_fields = ['id', 'course', 'total_lessons', 'total_duration_minutes', 'created_at', 'updated_at']
 
 # Serializes Course model
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     # Example: expose computed property as read-only
     # progress = serializers.ReadOnlyField()
     modules = ModuleSerializer(many=True)
+    thumbnail_renditions = ImageRenditionsField()
 
     class Meta:
         model = Course
         fields = ['id', 'title', 'description', 'mentor', 
-                  'level', 'status', 'thumbnail', 'skills_covered', 
+                  'level', 'status', 'thumbnail', 'thumbnail_renditions', 'skills_covered', 
                   'price', 'students_count', 'is_free',
-                  'published_at', 'duration_hours', 'created_at', 'updated_at', 'modules']
-        read_only_fields = ['id', 'status', 'published_at', 'updated_at', 'created_at']
+                  'published_at', 'duration_hours', 'total_lessons', 'total_duration_minutes', 'created_at', 'updated_at', 'modules']
+        read_only_fields = ['id', 'status', 'published_at', 'total_lessons', 'total_duration_minutes', 'updated_at', 'created_at']
 
+# Serializes Course model for catalog cards, without loading modules
+class CourseSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    current_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    discount_percentage = serializers.IntegerField(read_only=True)
+    thumbnail_renditions = ImageRenditionsField()
+
+    class Meta:
+        model = Course
+        fields = ['id', 'title', 'short_description', 'mentor', 'category', 'level', 'status', 'thumbnail', 'thumbnail_renditions',
+                  'price', 'current_price', 'discount_percentage', 'is_free', 'is_featured', 'is_certified',
+                  'average_rating', 'review_count', 'students_count', 'total_lessons', 'total_duration_minutes', 'published_at', 'created_at', 'updated_at']
+        read_only_fields = fields
+        # columns read by computed fields, so the queryset can defer everything else
+        source_fields = {
+            'current_price': ['price', 'discount_price'],
+            'discount_percentage': ['price', 'discount_price'],
+        }
+        expandable_fields = {
+            'modules': (ModuleSerializer, {'many': True, 'read_only': True}),
+            'skills_covered': (serializers.PrimaryKeyRelatedField, {'many': True, 'read_only': True}),
+            'description': (serializers.CharField, {'read_only': True}),
+        }
 
 
 # Serializes Enrollment model
 class EnrollmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Enrollment
-        fields = ['id', 'student', 'course', 'date_enrolled', 'is_active', 'payment_status', 'payment_date', 'certificate_issued', 'certificate_issued_at', 'enrolled_at', 'last_accessed']
-        read_only_fields = ['id', 'date_enrolled', 'student', 'course', 'is_active', 'payment_status', 'payment_date', 'certificate_issued', 'certificate_issued_at', 'enrolled_at', 'last_accessed']
+        fields = ['id', 'student', 'course', 'is_active', 'payment_status', 'payment_date', 'certificate_issued', 'certificate_issued_at', 'enrolled_at', 'last_accessed', 'updated_at']
+        read_only_fields = ['id', 'student', 'course', 'is_active', 'payment_status', 'payment_date', 'certificate_issued', 'certificate_issued_at', 'enrolled_at', 'last_accessed', 'updated_at']
 
 # Serializes LessonCompletion model
 class LessonCompletionSerializer(serializers.ModelSerializer):
     class Meta:
         model = LessonCompletion
         fields = '__all__'
-        read_only_fields = ['enrollment', 'lesson', 'completed_at', 'time_spent_minutes']
+        read_only_fields = ['enrollment', 'lesson', 'completed_at', 'time_spent_minutes', 'updated_at']
 
 # Serializes CourseReview model
 class CourseReviewSerializer(serializers.ModelSerializer):
@@ -0,0 +1,112 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from core.cache import response_cache
+from core.images import track_renditions
+from skills.models import Skill
+from users.models import User
+from .search import course_search
+from .models import Course, Module, Lesson, Enrollment, CourseReview
+
+track_renditions(Course, 'thumbnail')
+
+@receiver(post_delete, sender=CourseReview)
+def remove_review_rating(sender, instance, **kwargs):
+    if instance.is_approved:
+        Course.objects.filter(enrollments=instance.enrollment_id).apply_rating_change(-1, -instance.rating)
+
+@receiver(pre_save, sender=Lesson)
+def remember_lesson_module(sender, instance, **kwargs):
+    # a lesson moved to another module has to be taken off the old module's counters
+    instance._previous_module_id = None
+    if instance.pk:
+        instance._previous_module_id = sender.objects.filter(pk=instance.pk).values_list('module_id', flat=True).first()
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def update_lesson_counters(sender, instance, **kwargs):
+    module_ids = {instance.module_id, getattr(instance, '_previous_module_id', None)} - {None}
+    Module.objects.filter(pk__in=module_ids).refresh_lesson_counters()
+    Course.objects.filter(modules__in=module_ids).refresh_lesson_counters()
+
+@receiver(pre_save, sender=Module)
+def remember_module_course(sender, instance, **kwargs):
+    # a module moved to another course has to be taken off the old course's counters
+    instance._previous_course_id = None
+    if instance.pk:
+        instance._previous_course_id = sender.objects.filter(pk=instance.pk).values_list('course_id', flat=True).first()
+
+def module_course_ids(instance):
+    return {instance.course_id, getattr(instance, '_previous_course_id', None)} - {None}
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def update_module_counters(sender, instance, **kwargs):
+    Course.objects.filter(pk__in=module_course_ids(instance)).refresh_lesson_counters()
+
+def invalidate_course_responses(*course_ids, touch=True):
+    """ Drops cached catalog responses of the given courses, bumping updated_at when a child row changed """
+    course_ids = [pk for pk in course_ids if pk is not None]
+    if touch and course_ids:
+        Course.objects.filter(pk__in=course_ids).update(updated_at=timezone.now())
+    namespaces = ['course-list'] + [f'course:{pk}' for pk in course_ids]
+    transaction.on_commit(lambda: response_cache.invalidate(*namespaces))
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course(sender, instance, **kwargs):
+    invalidate_course_responses(instance.pk, touch=False)
+    course_search.schedule_update(instance.pk)
+
+@receiver(m2m_changed, sender=Course.skills_covered.through)
+def invalidate_course_skills(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        course_ids = (pk_set or []) if reverse else [instance.pk]
+        invalidate_course_responses(*course_ids)
+        course_search.schedule_update(*course_ids)
+
+def indexed_name(user):
+    # __dict__, reading a deferred name would load it
+    return user.__dict__.get('first_name'), user.__dict__.get('last_name')
+
+@receiver(post_init, sender=User)
+def remember_mentor_name(sender, instance, **kwargs):
+    instance._indexed_name = indexed_name(instance)
+
+@receiver(post_save, sender=User)
+def reindex_mentor_courses(sender, instance, created=False, **kwargs):
+    # mentor names are indexed, saves that keep the names (last_login...) leave the index alone
+    name = indexed_name(instance)
+    if created or name == getattr(instance, '_indexed_name', name):
+        return
+    instance._indexed_name = name
+    course_search.schedule_update(*Course.objects.filter(mentor=instance).values_list('pk', flat=True))
+
+@receiver(post_save, sender=Skill)
+def reindex_skill_courses(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'name' not in update_fields):
+        return
+    course_search.schedule_update(*Course.objects.filter(skills_covered=instance).values_list('pk', flat=True))
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def invalidate_module_course(sender, instance, **kwargs):
+    course_ids = module_course_ids(instance)
+    invalidate_course_responses(*course_ids)
+    course_search.schedule_update(*course_ids)
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_lesson_course(sender, instance, **kwargs):
+    module_ids = {instance.module_id, getattr(instance, '_previous_module_id', None)} - {None}
+    # nested module listings validate on the module's updated_at
+    Module.objects.filter(pk__in=module_ids).update(updated_at=timezone.now())
+    course_ids = list(Module.objects.filter(pk__in=module_ids).values_list('course_id', flat=True))
+    invalidate_course_responses(*course_ids)
+    course_search.schedule_update(*course_ids)
+
+@receiver(post_save, sender=CourseReview)
+@receiver(post_delete, sender=CourseReview)
+def invalidate_review_course(sender, instance, **kwargs):
+    invalidate_course_responses(*Enrollment.objects.filter(pk=instance.enrollment_id).values_list('course_id', flat=True))
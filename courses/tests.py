@@ -1,3 +1,533 @@
-from django.test import TestCase
+import base64
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.cache import response_cache
+from core.counters import counter_buffer
+from skills.models import Skill, SkillCategory, Category
+from users.models import User
+from .models import Course, Module, Lesson, Enrollment, LessonCompletion, CourseReview, Resource
+from .progress import bulk_complete_lessons, defer_progress_updates
+from .search import course_search
 
 # Create your tests here.
+NO_RESPONSE_CACHE = {**settings.CACHES, 'api': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+@override_settings(CACHES=NO_RESPONSE_CACHE)
+class CourseCatalogQueryTests(TestCase):
+    """ The catalog endpoints must cost the same number of queries whatever the size of the course tree """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mentor = User.objects.create_user('mentor@example.com', 'password', role=User.MENTOR)
+        cls.category = Category.objects.create(name='Development')
+        skill_category = SkillCategory.objects.create(name='Programming')
+        cls.skills = [Skill.objects.create(name=name, category=skill_category) for name in ('Python', 'Django', 'SQL')]
+
+    def create_course(self, modules=2, lessons=3):
+        course = Course.objects.create(title='Course', short_description='Short', mentor=self.mentor, category=self.category)
+        course.skills_covered.set(self.skills)
+        for m in range(modules):
+            module = Module.objects.create(course=course, title=f'Module {m}')
+            Module.objects.create(course=course, title='Hidden module', is_active=False)
+            for l in range(lessons):
+                Lesson.objects.create(module=module, title=f'Lesson {l}', article_content='content')
+            Lesson.objects.create(module=module, title='Hidden lesson', is_active=False)
+        return course
+
+    def test_course_list_query_count_is_constant(self):
+        self.create_course()
+        # courses, skills, modules, lessons and the ETag aggregate
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('api_course_list'), {'expand': 'modules,skills_covered'})
+        self.assertEqual(response.status_code, 200)
+
+        for _ in range(5):
+            self.create_course(modules=3, lessons=4)
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('api_course_list'), {'expand': 'modules,skills_covered'})
+        self.assertEqual(len(response.json()['results']), 6)
+        self.assertTrue(all(len(course['modules']) == 3 for course in response.json()['results'][:5]))
+
+    def test_course_list_summary_skips_modules_and_heavy_columns(self):
+        self.create_course(modules=2, lessons=3)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('api_course_list'))
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertFalse(any('"description"' in query['sql'] for query in context.captured_queries))
+
+        course = response.json()['results'][0]
+        self.assertNotIn('modules', course)
+        self.assertEqual(course['total_lessons'], 6)
+        self.assertEqual(course['current_price'], '0.00')
+
+    def test_sparse_fieldsets(self):
+        course = self.create_course(modules=1, lessons=2)
+        response = self.client.get(reverse('api_course_list'), {'fields': 'id,title,modules.title', 'expand': 'modules'})
+        self.assertEqual(response.json()['results'], [{'id': course.pk, 'title': 'Course', 'modules': [{'title': 'Module 0'}]}])
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('api_course_detail', args=[course.pk]), {'fields': 'title,modules.lessons.title'})
+        data = response.json()
+        self.assertEqual(set(data), {'title', 'modules'})
+        self.assertEqual(set(data['modules'][0]), {'lessons'})
+        self.assertCountEqual(data['modules'][0]['lessons'], [{'title': 'Lesson 0'}, {'title': 'Lesson 1'}])
+        self.assertFalse(any('article_content' in query['sql'] for query in context.captured_queries))
+
+    def test_course_list_cursor_walks_every_course_once(self):
+        created = [self.create_course(modules=1, lessons=1) for _ in range(5)]
+        # identical timestamps leave the id as the only tiebreaker
+        Course.objects.update(created_at=created[0].created_at)
+
+        seen = []
+        url = reverse('api_course_list') + '?page_size=2'
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(course['id'] for course in data['results'])
+            url = data['next']
+        self.assertEqual(seen, sorted((course.pk for course in created), reverse=True))
+
+    def test_malformed_cursors_are_not_found(self):
+        self.create_course()
+        url = reverse('api_course_list')
+        for values in ([None, None], [None, 1], ['2024-01-01T00:00:00', {'id': 1}], [1]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+            self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 404, values)
+        self.assertEqual(self.client.get(url, {'cursor': 'not base64!'}).status_code, 404)
+
+    def test_course_list_filters(self):
+        self.create_course()
+        featured = self.create_course()
+        Course.objects.filter(pk=featured.pk).update(is_featured=True)
+        response = self.client.get(reverse('api_course_list'), {'is_featured': 'true'})
+        self.assertEqual([course['id'] for course in response.json()['results']], [featured.pk])
+        response = self.client.get(reverse('api_course_list'), {'level': 'hard'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_course_detail_only_renders_active_modules_and_lessons(self):
+        course = self.create_course(modules=2, lessons=3)
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('api_course_detail', args=[course.pk]))
+        data = response.json()
+        self.assertEqual(len(data['modules']), 2)
+        self.assertTrue(all(len(module['lessons']) == 3 for module in data['modules']))
+        self.assertEqual(sorted(data['skills_covered']), sorted(skill.pk for skill in self.skills))
+
+
+class CourseResponseCacheTests(TestCase):
+    """ Anonymous catalog responses are served from the cache until a course row changes """
+
+    def setUp(self):
+        caches['api'].clear()
+        response_cache.reset_stats()
+        mentor = User.objects.create_user('mentor@example.com', 'password', role=User.MENTOR)
+        self.course = Course.objects.create(title='Course', short_description='Short', mentor=mentor)
+        self.module = Module.objects.create(course=self.course, title='Module')
+
+    def test_cache_hit_and_conditional_get(self):
+        url = reverse('api_course_detail', args=[self.course.pk])
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(response_cache.stats()['hits'], 2)
+        self.assertEqual(response_cache.stats()['misses'], 1)
+
+    def test_child_changes_invalidate_cached_responses(self):
+        detail_url = reverse('api_course_detail', args=[self.course.pk])
+        list_url = reverse('api_course_list')
+        etag = self.client.get(detail_url)['ETag']
+        self.client.get(list_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(module=self.module, title='Lesson')
+
+        detail = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(len(detail.json()['modules'][0]['lessons']), 1)
+        self.assertEqual(self.client.get(list_url).json()['results'][0]['total_lessons'], 1)
+        self.assertEqual(response_cache.stats()['hits'], 0)
+        self.assertGreater(response_cache.stats()['invalidations'], 0)
+
+    def test_list_conditional_get_skips_serialization(self):
+        Lesson.objects.create(module=self.module, title='Lesson')
+        url = reverse('api_lesson_list')
+        first = self.client.get(url, {'module': self.module.pk})
+        self.assertIn('ETag', first)
+
+        # only the validator aggregate runs
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(url, {'module': self.module.pk}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        Lesson.objects.create(module=self.module, title='Another lesson')
+        changed = self.client.get(url, {'module': self.module.pk}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_etags_follow_progress_notes_and_counters(self):
+        lesson = Lesson.objects.create(module=self.module, title='Lesson')
+        Course.objects.filter(pk=self.course.pk).update(is_certified=True)
+        student = User.objects.create_user('student@example.com', 'password')
+        enrollment = Enrollment.objects.create(student=student, course=self.course)
+        resource = Resource.objects.create(title='Sheet', file='course_resources/sheet.pdf', file_size=10, course=self.course)
+        self.client.force_login(student)
+
+        def etags():
+            return {name: self.client.get(reverse(name))['ETag'] for name in ('api_enrollment_list', 'api_lesson_completion_list', 'api_resource_list')}
+
+        before = etags()
+        # issues the certificate through recompute_progress()
+        completion = LessonCompletion.objects.create(enrollment=enrollment, lesson=lesson)
+        after_completion = etags()
+        self.assertNotEqual(after_completion['api_enrollment_list'], before['api_enrollment_list'])
+        response = self.client.get(reverse('api_enrollment_list'), HTTP_IF_NONE_MATCH=before['api_enrollment_list'])
+        self.assertTrue(response.json()['results'][0]['certificate_issued'])
+
+        completion.notes = 'Done'
+        completion.save()
+        resource.increment_download_count()
+        after_edits = etags()
+        self.assertNotEqual(after_edits['api_lesson_completion_list'], after_completion['api_lesson_completion_list'])
+        self.assertNotEqual(after_edits['api_resource_list'], after_completion['api_resource_list'])
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.client.force_login(User.objects.get(email='mentor@example.com'))
+        self.client.get(reverse('api_course_list'))
+        stats = response_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['invalidations']), (0, 0, 0))
+
+    @override_settings(CACHES={**settings.CACHES, 'api': {
+        'BACKEND': 'core.cache.CountingLocMemCache', 'LOCATION': 'api-cull-test',
+        'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3},
+    }})
+    def test_evictions_count_culled_entries(self):
+        caches['api'].clear()
+        before = response_cache.stats()['evictions']
+        for pk in range(5):
+            response_cache.set(f'response:{pk}', {'content': b''})
+        # the fourth and fifth set find the cache full and cull a third of it
+        self.assertEqual(response_cache.stats()['evictions'] - before, 2)
+
+
+@override_settings(CACHES=NO_RESPONSE_CACHE)
+class CourseSearchTests(TestCase):
+    """ The search index follows course, module, lesson and skill changes """
+
+    def setUp(self):
+        self.mentor = User.objects.create_user('mentor@example.com', 'password', role=User.MENTOR, first_name='Ada')
+        self.skill = Skill.objects.create(name='Kubernetes', category=SkillCategory.objects.create(name='Ops'))
+
+    def create_course(self, title, status=Course.PUBLISHED, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Course.objects.create(title=title, short_description='Short', mentor=self.mentor, status=status, **kwargs)
+
+    def search(self, q, **params):
+        response = self.client.get(reverse('api_course_search'), {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ranked_prefix_search(self):
+        in_title = self.create_course('Django for beginners')
+        in_description = self.create_course('Web APIs', description='Build REST services with Django')
+        self.create_course('Django drafts', status=Course.DRAFT)
+        self.create_course('Cooking')
+
+        results = self.search('djang')['results']
+        self.assertEqual([course['id'] for course in results], [in_title.pk, in_description.pk])
+        self.assertEqual(self.search('django rest')['results'][0]['id'], in_description.pk)
+        # mentor names are searchable, drafts never are
+        self.assertEqual(len(self.search('ada')['results']), 3)
+
+    def test_children_update_the_index(self):
+        course = self.create_course('Platform engineering')
+        with self.captureOnCommitCallbacks(execute=True):
+            module = Module.objects.create(course=course, title='Containers')
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = Lesson.objects.create(module=module, title='Helm charts')
+        with self.captureOnCommitCallbacks(execute=True):
+            course.skills_covered.add(self.skill)
+        for q in ('containers', 'helm', 'kubernetes'):
+            self.assertEqual(len(self.search(q)['results']), 1, q)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson.delete()
+        self.assertEqual(self.search('helm')['results'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            course.delete()
+        self.assertEqual(self.search('containers')['results'], [])
+
+    def test_mentor_and_skill_renames_update_the_index(self):
+        course = self.create_course('Platform engineering')
+        with self.captureOnCommitCallbacks(execute=True):
+            course.skills_covered.add(self.skill)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mentor.first_name = 'Grace'
+            self.mentor.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.skill.name = 'Nomad'
+            self.skill.save()
+        for q, expected in (('grace', [course.pk]), ('ada', []), ('nomad', [course.pk]), ('kubernetes', [])):
+            self.assertEqual([row['id'] for row in self.search(q)['results']], expected, q)
+
+    def test_pagination_and_bad_input(self):
+        for i in range(3):
+            self.create_course(f'Python {i}')
+        first = self.search('python', page_size=2)
+        self.assertEqual(len(first['results']), 2)
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+        self.assertEqual(self.client.get(reverse('api_course_search')).status_code, 400)
+        self.assertEqual(self.search('"*)(')['results'], [])
+
+    def test_rebuild_command(self):
+        course = self.create_course('Rust')
+        Course.objects.filter(pk=course.pk).update(title='Go')
+        out = StringIO()
+        call_command('rebuild_course_search_index', stdout=out)
+        self.assertIn('Indexed 1 course(s)', out.getvalue())
+        self.assertEqual(course_search.search('go'), [course.pk])
+        self.assertEqual(course_search.search('rust'), [])
+
+class CourseRatingTests(TestCase):
+    """ Rating aggregates follow approvals, edits and deletions of reviews """
+
+    def setUp(self):
+        mentor = User.objects.create_user('mentor@example.com', 'password', role=User.MENTOR)
+        self.course = Course.objects.create(title='Course', short_description='Short', mentor=mentor)
+
+    def review(self, rating, is_approved=True):
+        student = User.objects.create_user(f'student{User.objects.count()}@example.com', 'password')
+        enrollment = Enrollment.objects.create(student=student, course=self.course)
+        return CourseReview.objects.create(enrollment=enrollment, rating=rating, is_approved=is_approved)
+
+    def assertRating(self, average, count):
+        self.course.refresh_from_db()
+        self.assertAlmostEqual(self.course.average_rating, average)
+        self.assertEqual(self.course.review_count, count)
+
+    def test_rating_follows_review_lifecycle(self):
+        first = self.review(5)
+        second = self.review(2, is_approved=False)
+        self.assertRating(5.0, 1)
+
+        second.is_approved = True
+        second.save()
+        self.assertRating(3.5, 2)
+
+        first.rating = 3
+        first.save()
+        self.assertRating(2.5, 2)
+
+        second.is_approved = False
+        second.save()
+        self.assertRating(3.0, 1)
+
+        first.delete()
+        self.assertRating(0.0, 0)
+
+    def test_rebuild_matches_incremental_values(self):
+        self.review(4)
+        self.review(1)
+        self.review(3, is_approved=False)
+        Course.objects.update(average_rating=0, review_count=0, rating_total=0)
+
+        before = Course.objects.get(pk=self.course.pk).updated_at
+        with mock.patch.object(response_cache, 'invalidate') as invalidate, self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_course_ratings', stdout=StringIO())
+        self.assertRating(2.5, 2)
+        self.assertEqual(self.course.rating_total, 5)
+        self.assertGreater(self.course.updated_at, before)
+        invalidate.assert_called_once_with('course-list', f'course:{self.course.pk}')
+
+
+class LessonCounterTests(TestCase):
+    """ Stored lesson counters follow lesson and module changes """
+
+    def setUp(self):
+        mentor = User.objects.create_user('mentor@example.com', 'password', role=User.MENTOR)
+        self.course = Course.objects.create(title='Course', short_description='Short', mentor=mentor)
+        self.module = Module.objects.create(course=self.course, title='Module')
+        self.other = Module.objects.create(course=self.course, title='Other')
+
+    def assertCounters(self, obj, lessons, minutes):
+        obj.refresh_from_db()
+        self.assertEqual((obj.total_lessons, obj.total_duration_minutes), (lessons, minutes))
+
+    def test_counters_follow_lesson_changes(self):
+        first = Lesson.objects.create(module=self.module, title='First', duration_minutes=10)
+        second = Lesson.objects.create(module=self.module, title='Second', duration_minutes=5)
+        self.assertCounters(self.module, 2, 15)
+        self.assertCounters(self.course, 2, 15)
+
+        second.is_active = False
+        second.save()
+        self.assertCounters(self.course, 1, 10)
+
+        first.module = self.other
+        first.save()
+        self.assertCounters(self.module, 0, 0)
+        self.assertCounters(self.other, 1, 10)
+
+        self.other.is_active = False
+        self.other.save()
+        self.assertCounters(self.course, 0, 0)
+
+        self.other.is_active = True
+        self.other.save()
+        first.delete()
+        self.assertCounters(self.course, 0, 0)
+
+    def test_counters_follow_module_moves(self):
+        Lesson.objects.create(module=self.module, title='First', duration_minutes=10)
+        other_course = Course.objects.create(title='Other course', short_description='Short', mentor=self.course.mentor)
+        before = Course.objects.get(pk=self.course.pk).updated_at
+
+        self.module.course = other_course
+        self.module.save()
+        self.assertCounters(self.course, 0, 0)
+        self.assertCounters(other_course, 1, 10)
+        # the old course's cached responses are dropped as well
+        self.assertGreater(self.course.updated_at, before)
+
+    def test_reconcile_command(self):
+        Lesson.objects.create(module=self.module, title='First', duration_minutes=10)
+        Course.objects.update(total_lessons=0, total_duration_minutes=0)
+        Module.objects.update(total_lessons=7)
+
+        before = Course.objects.get(pk=self.course.pk).updated_at
+        with mock.patch.object(response_cache, 'invalidate') as invalidate, self.captureOnCommitCallbacks(execute=True):
+            call_command('reconcile_course_counters', stdout=StringIO())
+        self.assertCounters(self.course, 1, 10)
+        self.assertCounters(self.other, 0, 0)
+        self.assertGreater(self.course.updated_at, before)
+        invalidate.assert_called_once_with('course-list', f'course:{self.course.pk}')
+
+        # nothing changed, nothing moves
+        before = self.course.updated_at
+        with mock.patch.object(response_cache, 'invalidate') as invalidate, self.captureOnCommitCallbacks(execute=True):
+            call_command('reconcile_course_counters', stdout=StringIO())
+        self.assertCounters(self.course, 1, 10)
+        self.assertEqual(self.course.updated_at, before)
+        invalidate.assert_not_called()
+
+
+class BulkProgressTests(TestCase):
+    """ Progress recomputation for bulk completion imports """
+
+    def setUp(self):
+        mentor = User.objects.create_user('mentor@example.com', 'password', role=User.MENTOR)
+        self.course = Course.objects.create(title='Course', short_description='Short', mentor=mentor, is_certified=True)
+        module = Module.objects.create(course=self.course, title='Module')
+        self.lessons = [Lesson.objects.create(module=module, title=f'Lesson {i}') for i in range(4)]
+        self.enrollments = [
+            Enrollment.objects.create(student=User.objects.create_user(f'student{i}@example.com', 'password'), course=self.course)
+            for i in range(3)
+        ]
+
+    def test_bulk_complete_lessons(self):
+        rows = [{'enrollment': self.enrollments[0].pk, 'lesson': lesson.pk} for lesson in self.lessons]
+        rows += [{'enrollment': self.enrollments[1].pk, 'lesson': lesson.pk} for lesson in self.lessons[:2]]
+        rows += [{'enrollment': self.enrollments[1].pk, 'lesson': self.lessons[0].pk}, {'enrollment': 0, 'lesson': self.lessons[0].pk}]
+
+        self.enrollments[0].student.get_profile()
+        # five queries per batch, the progress UPDATE, then the certificates it issued and their reputation UPDATE
+        with self.assertNumQueries(3 * 5 + 3):
+            imported, skipped = bulk_complete_lessons(rows, batch_size=3)
+        # the duplicate row is already imported by the time its batch runs
+        self.assertEqual((imported, skipped), (6, 2))
+        self.assertEqual(LessonCompletion.objects.count(), 6)
+
+        finished, halfway, untouched = [Enrollment.objects.get(pk=e.pk) for e in self.enrollments]
+        self.assertEqual(finished.progress, 100)
+        self.assertIsNotNone(finished.completed_at)
+        self.assertTrue(finished.certificate_issued)
+        self.assertEqual(halfway.progress, 50)
+        self.assertIsNone(halfway.completed_at)
+        self.assertEqual(untouched.progress, 0)
+
+    def test_deferred_progress_updates(self):
+        enrollment = self.enrollments[2]
+        with defer_progress_updates():
+            for lesson in self.lessons[:3]:
+                LessonCompletion.objects.create(enrollment=enrollment, lesson=lesson)
+            enrollment.refresh_from_db()
+            self.assertEqual(enrollment.progress, 0)
+        enrollment.refresh_from_db()
+        self.assertEqual(enrollment.progress, 75)
+
+        LessonCompletion.objects.create(enrollment=enrollment, lesson=self.lessons[3])
+        enrollment.refresh_from_db()
+        self.assertEqual(enrollment.progress, 100)
+
+    def test_failed_deferred_block_rolls_back(self):
+        enrollment = self.enrollments[2]
+        with self.assertRaises(ValueError):
+            with defer_progress_updates():
+                LessonCompletion.objects.create(enrollment=enrollment, lesson=self.lessons[0])
+                raise ValueError
+        self.assertFalse(LessonCompletion.objects.filter(enrollment=enrollment).exists())
+        self.assertEqual(Enrollment.objects.get(pk=enrollment.pk).progress, 0)
+
+class DownloadCounterTests(TestCase):
+    """ Download counts are added in the database, never read, modified and saved back """
+
+    def setUp(self):
+        counter_buffer.flush()
+        self.resource = Resource.objects.create(title='Cheat sheet', file='course_resources/sheet.pdf', file_size=10)
+
+    def test_concurrent_increments_are_not_lost(self):
+        first = Resource.objects.get(pk=self.resource.pk)
+        second = Resource.objects.get(pk=self.resource.pk)
+        with self.assertNumQueries(1):
+            first.increment_download_count()
+        second.increment_download_count()
+        self.assertEqual(first.download_count, 1)
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.download_count, 2)
+
+    @override_settings(COUNTER_WRITE_BEHIND=True, COUNTER_FLUSH_INTERVAL=3600)
+    def test_write_behind_buffer(self):
+        other = Resource.objects.create(title='E-book', file='course_resources/book.pdf', file_size=10)
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                self.resource.increment_download_count()
+            other.increment_download_count()
+        self.assertEqual(counter_buffer.pending(Resource, self.resource.pk, 'download_count'), 3)
+
+        # one UPDATE per row
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(counter_buffer.flush(), 2)
+        self.assertEqual(len([q for q in context.captured_queries if q['sql'].startswith('UPDATE')]), 2)
+        self.assertEqual(Resource.objects.get(pk=self.resource.pk).download_count, 3)
+        self.assertEqual(Resource.objects.get(pk=other.pk).download_count, 1)
+
+    @override_settings(COUNTER_WRITE_BEHIND=True, COUNTER_FLUSH_INTERVAL=3600)
+    def test_failed_flush_keeps_increments(self):
+        self.resource.increment_download_count()
+        with mock.patch('core.counters.add_to_counters', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                counter_buffer.flush()
+        self.resource.increment_download_count()
+        self.assertEqual(counter_buffer.pending(Resource, self.resource.pk, 'download_count'), 2)
+        counter_buffer.flush()
+        self.assertEqual(Resource.objects.get(pk=self.resource.pk).download_count, 2)
@@ -7,12 +7,32 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import _positive_int
+from rest_framework.utils.urls import replace_query_param
+from core.queryplan import QueryPlanMixin
+from core.pagination import KeysetPagination
+from core.filters import FieldFilterBackend
+from core.cache import CachedResponseMixin, response_cache
+from core.mixins import ConditionalGetMixin
+from .search import course_search
 
 
 # Create your views here.
-class CourseListView(generics.ListCreateAPIView):
+class CourseListView(CachedResponseMixin, ConditionalGetMixin, QueryPlanMixin, generics.ListCreateAPIView):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [FieldFilterBackend]
+    filter_fields = ['status', 'level', 'category', 'is_free', 'is_featured', 'mentor']
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return CourseSummarySerializer
+        return CourseSerializer
+
+    def get_cache_namespaces(self):
+        return ['course-list']
     
     def get_permissions(self):
         self.permission_classes = [AllowAny]
@@ -20,9 +40,55 @@ class CourseListView(generics.ListCreateAPIView):
             self.permission_classes = [IsAdminUser | IsMentor]
         return super().get_permissions()
 
-class CourseDetailView(generics.RetrieveAPIView):
+class CourseDetailView(CachedResponseMixin, ConditionalGetMixin, QueryPlanMixin, generics.RetrieveAPIView):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+
+    def get_cache_namespaces(self):
+        return [f"course:{self.kwargs['pk']}"]
+
+class CourseSearchView(QueryPlanMixin, generics.GenericAPIView):
+    """
+    Ranked full-text search over published courses, ?q=<words>. Every word has to match, as a prefix,
+    one of the title, descriptions, module and lesson titles, skill names or mentor name.
+    """
+    queryset = Course.objects.all()
+    serializer_class = CourseSummarySerializer
+    permission_classes = [AllowAny]
+    page_size = 20
+    max_page_size = 100
+
+    def get_int_param(self, name, default, cutoff=None):
+        try:
+            return _positive_int(self.request.query_params[name], cutoff=cutoff)
+        except KeyError:
+            return default
+        except ValueError:
+            raise ValidationError({name: ['A positive integer is required.']})
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': ['This parameter is required.']})
+        offset = self.get_int_param('offset', 0)
+        page_size = self.get_int_param('page_size', self.page_size, cutoff=self.max_page_size) or self.page_size
+
+        course_ids = course_search.search(query, limit=page_size + 1, offset=offset)
+        page_ids = course_ids[:page_size]
+        courses = self.get_queryset().in_bulk(page_ids)
+        serializer = self.get_serializer([courses[pk] for pk in page_ids if pk in courses], many=True)
+
+        next_link = None
+        if len(course_ids) > page_size:
+            next_link = replace_query_param(request.build_absolute_uri(), 'offset', offset + page_size)
+        return Response({'next': next_link, 'results': serializer.data})
+
+class CacheStatsView(APIView):
+    """ Response cache counters of this process, for sizing the cache """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(response_cache.stats())
     
 @api_view(['GET'])
 def api_root(request):
@@ -31,6 +97,7 @@ def api_root(request):
             'message': 'Welcome to the API',
             'endpoints': {
                 'course': '/api/course/',
+                'search': '/api/search/?q=',
                 'module': '/api/module',
                 'lesson': '/api/lesson',
                 'enrollment': '/api/enrollment',
@@ -41,26 +108,50 @@ def api_root(request):
         }
     )
     
-class ModuleListView(generics.ListAPIView):
+class ModuleListView(ConditionalGetMixin, QueryPlanMixin, generics.ListAPIView):
     queryset  = Module.objects.all()
     serializer_class = ModuleSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [FieldFilterBackend]
+    filter_fields = ['course', 'is_active']
     
-class LessonListView(generics.ListAPIView):
+class LessonListView(ConditionalGetMixin, QueryPlanMixin, generics.ListAPIView):
     queryset = Lesson.objects.all()
-    serializer_class = LessonSerializer
+    serializer_class = LessonListSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [FieldFilterBackend]
+    filter_fields = {'module': 'module', 'course': 'module__course', 'lesson_type': 'lesson_type', 'is_preview': 'is_preview', 'is_active': 'is_active'}
     
-class EnrollmentListView(generics.ListAPIView):
+class EnrollmentListView(ConditionalGetMixin, generics.ListAPIView):
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
+    # students see their enrollments, mentors the enrollments of their courses
+    permission_classes = [role_permission('talent', 'client', 'mentor', 'admin', owner_fields=['student', 'course__mentor'])]
+    pagination_class = KeysetPagination
+    pagination_ordering = ('-enrolled_at', '-id')
+    filter_backends = [FieldFilterBackend, PermissionQuerysetFilter]
+    filter_fields = ['course', 'student', 'payment_status', 'is_active']
     
-class LessonCompletionListView(generics.ListAPIView):
-    queryset = Lesson.objects.all()
+class LessonCompletionListView(ConditionalGetMixin, generics.ListAPIView):
+    queryset = LessonCompletion.objects.all()
     serializer_class = LessonCompletionSerializer
+    permission_classes = [role_permission('talent', 'client', 'mentor', 'admin', owner_fields=['enrollment__student', 'enrollment__course__mentor'])]
+    pagination_class = KeysetPagination
+    pagination_ordering = ('-completed_at', '-id')
+    filter_backends = [FieldFilterBackend, PermissionQuerysetFilter]
+    filter_fields = ['enrollment', 'lesson']
     
-class CourseReviewListView(generics.ListAPIView):
+class CourseReviewListView(ConditionalGetMixin, QueryPlanMixin, generics.ListAPIView):
     queryset = CourseReview.objects.all()
     serializer_class = CourseReviewSerializer
+    etag_fields = ('updated_at', 'enrollment__updated_at')
+    pagination_class = KeysetPagination
+    filter_backends = [FieldFilterBackend]
+    filter_fields = {'course': 'enrollment__course', 'rating': 'rating', 'is_approved': 'is_approved'}
     
-class ResourceListView(generics.ListAPIView):
+class ResourceListView(ConditionalGetMixin, generics.ListAPIView):
     queryset = Resource.objects.all()
-    serializer_class = ResourceSerializer
\ No newline at end of file
+    serializer_class = ResourceSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [FieldFilterBackend]
+    filter_fields = ['course', 'resource_type', 'is_free', 'is_active']
\ No newline at end of file
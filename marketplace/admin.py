@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import JobPosting, Proposal, Contract, Milestone
+from .models import JobPosting, JobMatch, Proposal, Contract, Milestone
 
 # Register your models here.
 @admin.register(JobPosting)
@@ -9,6 +9,14 @@ class JobPostingAdmin(admin.ModelAdmin):
     search_fields = ['title', 'description', 'client__email', 'client__first_name', 'client__last_name']
     readonly_fields = ['proposals_count', 'created_at', 'updated_at']
     filter_horizontal = ['required_skills']
+    list_select_related = ['client']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_proposals_count()
+
+    @admin.display(ordering='proposals_count')
+    def proposals_count(self, obj):
+        return obj.proposals_count
 
 @admin.register(Proposal)
 class ProposalAdmin(admin.ModelAdmin):
@@ -16,6 +24,7 @@ class ProposalAdmin(admin.ModelAdmin):
     list_filter = ['status', 'submitted_at']
     search_fields = ['job__title', 'applier__email', 'cover_letter']
     readonly_fields = ['submitted_at', 'updated_at']
+    list_select_related = ['job__client', 'applier']
 
 @admin.register(Contract)
 class ContractAdmin(admin.ModelAdmin):
@@ -23,9 +32,18 @@ class ContractAdmin(admin.ModelAdmin):
     list_filter = ['status', 'payment_schedule', 'created_at']
     search_fields = ['title', 'description', 'job__title']
     readonly_fields = ['created_at', 'updated_at']
+    list_select_related = ['job__client']
 
 @admin.register(Milestone)
 class MilestoneAdmin(admin.ModelAdmin):
     list_display = ['title', 'contract', 'amount', 'due_date', 'status']
     list_filter = ['status', 'due_date']
-    search_fields = ['title', 'contract__title']
\ No newline at end of file
+    search_fields = ['title', 'contract__title']
+    list_select_related = ['contract']
+
+@admin.register(JobMatch)
+class JobMatchAdmin(admin.ModelAdmin):
+    list_display = ['job', 'talent', 'score', 'skill_score', 'matched_skills', 'created_at']
+    search_fields = ['job__title', 'talent__email']
+    list_select_related = ['job__client', 'talent']
+    raw_id_fields = ['job', 'talent']
@@ -0,0 +1,52 @@
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+from .models import JobPosting
+
+
+class JobFeedParamsSerializer(serializers.Serializer):
+    job_type = serializers.ChoiceField(choices=JobPosting.JOB_TYPE, required=False)
+    experience_level = serializers.ChoiceField(choices=JobPosting.EXPERIENCE_LEVELS, required=False)
+    budget_type = serializers.ChoiceField(choices=JobPosting.BUDGET_TYPE, required=False)
+    is_remote = serializers.BooleanField(required=False, allow_null=True)
+    min_budget = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_budget = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    skills = serializers.CharField(required=False)
+
+    def validate_skills(self, value):
+        try:
+            skill_ids = {int(pk) for pk in value.split(',') if pk.strip()}
+        except ValueError:
+            raise serializers.ValidationError("Give skill ids separated by commas.")
+        if len(skill_ids) > 20:
+            raise serializers.ValidationError("Search for 20 skills at most.")
+        return sorted(skill_ids)
+
+
+class JobFeedFilter(BaseFilterBackend):
+    """
+    Job feed filters from the query parameters:
+    ?job_type= ?experience_level= ?budget_type= ?is_remote=true  exact matches, choices by value
+    ?min_budget= ?max_budget=                                    budget range
+    ?skills=1,2,3                                                jobs requiring any of the skills
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = JobFeedParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
+
+        for name in ('job_type', 'experience_level', 'budget_type'):
+            if name in params:
+                queryset = queryset.filter(**{name: params[name]})
+        if params.get('is_remote') is not None:
+            queryset = queryset.filter(is_remote=params['is_remote'])
+        if 'min_budget' in params:
+            queryset = queryset.filter(budget__gte=params['min_budget'])
+        if 'max_budget' in params:
+            queryset = queryset.filter(budget__lte=params['max_budget'])
+        if params.get('skills'):
+            # a subquery rather than a join, so a job requiring several of the skills is listed once
+            links = JobPosting.required_skills.through.objects.filter(skill__in=params['skills'])
+            queryset = queryset.filter(pk__in=links.values('jobposting'))
+        return queryset
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from marketplace.matching import refresh_job_matches
+from marketplace.models import JobMatch, JobPosting
+
+
+class Command(BaseCommand):
+    help = "Recomputes the stored candidates of open jobs, so profile and skill changes reach them (run nightly)"
+
+    def handle(self, *args, **options):
+        jobs = JobPosting.objects.active().order_by('pk')
+        stored = 0
+        for job in jobs.iterator():
+            stored += len(refresh_job_matches(job))
+        closed = JobMatch.objects.exclude(job__in=jobs).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Stored {stored} match(es) for open jobs, removed {closed} of closed jobs"))
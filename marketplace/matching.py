@@ -0,0 +1,130 @@
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from users.models import User, UserProfile, UserSkill
+from skills.models import Skill
+from .models import JobPosting, JobMatch
+
+DEFAULT_WEIGHTS = {'skills': 0.6, 'experience': 0.15, 'rate': 0.15, 'availability': 0.1}
+
+# years of experience each level asks for
+LEVEL_YEARS = {
+    JobPosting.ENTRY: 0,
+    JobPosting.MID: 2,
+    JobPosting.SENIOR: 5,
+    JobPosting.EXPERT: 8,
+}
+
+
+class SkillIndex:
+    """
+    The required skills of one job as bit positions. A talent's skills become an int bitset over the
+    same positions and the skill score is a popcount of (talent & category mask) per skill category,
+    weighted by MATCHING_CATEGORY_WEIGHTS (category name -> weight, 1 by default).
+    """
+
+    def __init__(self, skills):
+        weights = getattr(settings, 'MATCHING_CATEGORY_WEIGHTS', {})
+        self.positions = {}
+        masks = defaultdict(int)
+        category_weights = {}
+        for position, (skill_id, category_id, category_name) in enumerate(skills):
+            self.positions[skill_id] = position
+            masks[category_id] |= 1 << position
+            category_weights[category_id] = weights.get(category_name, 1.0)
+        self.categories = [(mask, category_weights[category_id]) for category_id, mask in masks.items()]
+        self.total = sum(weight * mask.bit_count() for mask, weight in self.categories)
+
+    @classmethod
+    def for_job(cls, job):
+        return cls(Skill.objects.filter(job_postings=job).order_by('pk').values_list('pk', 'category_id', 'category__name'))
+
+    def bitsets(self, links):
+        """ {user id: bitset} from (user id, skill id) pairs """
+        bits = defaultdict(int)
+        for user_id, skill_id in links:
+            bits[user_id] |= 1 << self.positions[skill_id]
+        return bits
+
+    def score(self, bits):
+        if not self.total:
+            return 0.0
+        return sum(weight * (bits & mask).bit_count() for mask, weight in self.categories) / self.total
+
+
+def experience_score(job, years):
+    required = LEVEL_YEARS.get(job.experience_level, 0)
+    return 1.0 if not required else min(1.0, (years or 0) / required)
+
+
+def rate_score(job, hourly_rate):
+    """ Only hourly budgets compare with hourly rates, anything else scores every talent the same """
+    if job.budget_type != JobPosting.HOURLY or not job.budget:
+        return 1.0
+    if not hourly_rate:
+        return 0.5
+    return 1.0 if hourly_rate <= job.budget else float(job.budget / hourly_rate)
+
+
+def score_candidates(job, limit=None):
+    """
+    Scores the active talents having at least one of the job's required skills and returns the best
+    `limit` (MATCHING_TOP_K) as unsaved JobMatch rows, best first. Three queries whatever the number of
+    candidates: the job's skills, the candidates' matching skills and their profiles.
+    """
+    limit = limit or getattr(settings, 'MATCHING_TOP_K', 50)
+    weights = {**DEFAULT_WEIGHTS, **getattr(settings, 'MATCHING_WEIGHTS', {})}
+    index = SkillIndex.for_job(job)
+    if not index.positions:
+        return []
+
+    links = UserSkill.objects.filter(
+        skill__in=list(index.positions), user__role=User.TALENT, user__is_active=True
+    ).values_list('user', 'skill')
+    bitsets = index.bitsets(links)
+    profiles = {
+        user_id: (years, rate, available)
+        for user_id, years, rate, available in UserProfile.objects.filter(user__in=list(bitsets)).values_list(
+            'user', 'experience_years', 'hourly_rate', 'is_available'
+        )
+    }
+
+    scored = []
+    for user_id, bits in bitsets.items():
+        years, rate, available = profiles.get(user_id, (0, None, False))
+        skill_score = index.score(bits)
+        score = (
+            weights['skills'] * skill_score
+            + weights['experience'] * experience_score(job, years)
+            + weights['rate'] * rate_score(job, rate)
+            + weights['availability'] * (1.0 if available else 0.0)
+        )
+        scored.append((score, user_id, skill_score, bits.bit_count()))
+
+    best = heapq.nlargest(limit, scored)
+    return [
+        JobMatch(job=job, talent_id=user_id, score=score, skill_score=skill_score, matched_skills=matched)
+        for score, user_id, skill_score, matched in best
+    ]
+
+
+def refresh_job_matches(job):
+    """ Replaces the stored candidates of a job, a job that is not published keeps none """
+    with transaction.atomic():
+        JobMatch.objects.filter(job=job).delete()
+        if job.status != JobPosting.PUBLISHED:
+            return []
+        return JobMatch.objects.bulk_create(score_candidates(job))
+
+
+def schedule_job_matches(job_id):
+    """ Recomputes a job's candidates once the current transaction commits, its skills are saved by then """
+    def refresh():
+        job = JobPosting.objects.filter(pk=job_id).first()
+        if job is not None:
+            refresh_job_matches(job)
+    transaction.on_commit(refresh)
+
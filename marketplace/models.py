@@ -5,6 +5,25 @@ from users.models import User
 from skills.models import Skill
 
 # Create your models here.
+def active_job_filter(prefix=''):
+    """ JobPosting.is_active as a Q, published and before the deadline if any. prefix reaches jobs from related models, e.g. 'job__' """
+    deadline = f'{prefix}application_deadline'
+    return models.Q(**{f'{prefix}status': JobPosting.PUBLISHED}) & (
+        models.Q(**{f'{deadline}__isnull': True}) | models.Q(**{f'{deadline}__gt': timezone.now()})
+    )
+
+class JobPostingQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(active_job_filter())
+
+    def expired(self):
+        """ Published jobs past their application deadline, closed by the close_expired_jobs sweep """
+        return self.filter(status=JobPosting.PUBLISHED, application_deadline__lte=timezone.now())
+
+    def with_proposals_count(self):
+        """ Counts proposals in the same query, read back by JobPosting.proposals_count """
+        return self.annotate(proposals_count=models.Count('proposals'))
+
 class JobPosting(models.Model):
     FULL_TIME = 0
     PART_TIME = 1
@@ -82,6 +101,16 @@ class JobPosting(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     published_at = models.DateTimeField(null=True, blank=True)
 
+    objects = JobPostingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # active(): equality on status, range on the deadline
+            models.Index(fields=['status', 'application_deadline', 'published_at'], name='job_status_deadline_idx'),
+            # the feed reads published jobs in this order, the partial index leaves drafts and closed jobs out
+            models.Index(fields=['-is_urgent', '-published_at', '-id'], name='job_feed_idx', condition=models.Q(status=1)),  # PUBLISHED
+        ]
+
     def save(self, *args, **kwargs):
         if self.status==self.__class__.PUBLISHED and not self.published_at:
             self.published_at = timezone.now()
@@ -100,8 +129,15 @@ class JobPosting(models.Model):
     
     @property
     def proposals_count(self):
+        # annotated by JobPostingQuerySet.with_proposals_count(), one query per job otherwise
+        if '_proposals_count' in self.__dict__:
+            return self._proposals_count
         return self.proposals.count()
 
+    @proposals_count.setter
+    def proposals_count(self, value):
+        self._proposals_count = value
+
 class Proposal(models.Model):
     SUBMITTED = 0
     UNDER_REVIEW = 1
@@ -148,18 +184,19 @@ class Proposal(models.Model):
     def is_accepted(self):
         return self.status == self.__class__.ACCEPTED
     
-    def accept(self):
-        self.status = self.__class__.ACCEPTED
-        self.save()
+    def accept(self, milestones=(), **contract_fields):
+        """ Accepts the proposal, fills its job and returns the new contract, see marketplace.services.accept_proposal """
+        from .services import accept_proposal
+        return accept_proposal(self, milestones, **contract_fields)
 
     def reject(self, note=None):
         self.status = self.__class__.REJECTED
         #can set client note here
-        self.save()
+        self.save(update_fields=['status', 'updated_at'])
     
     def withdraw(self):
         self.status = self.__class__.WITHDRAWN
-        self.save()
+        self.save(update_fields=['status', 'updated_at'])
 
 class Contract(models.Model):
     """ Contract between clients and talents for accepted proposal. Remains even when jobposting and proposal is deleted due to its importance"""
@@ -176,6 +213,8 @@ class Contract(models.Model):
         (CANCELLED, 'Cancelled'),
         (DISPUTED, 'Disputed'),
     )
+    # statuses that end a contract, they count towards the talent's success rate
+    CLOSED = (COMPLETED, CANCELLED, DISPUTED)
     job = models.OneToOneField(JobPosting, on_delete=models.SET_NULL, null=True, related_name='contract')
     proposal = models.OneToOneField(Proposal, on_delete=models.SET_NULL, null=True, related_name='contract')
 
@@ -277,4 +316,27 @@ class Milestone(models.Model):
     def mark_paid(self):
         self.status = Milestone.PAID
         self.paid_at = timezone.now()
-        self.save()
\ No newline at end of file
+        self.save()
+
+class JobMatch(models.Model):
+    """ Precomputed candidate of a published job, see marketplace.matching. Serves both the job's candidate list and the talent's recommended jobs """
+    job = models.ForeignKey(JobPosting, on_delete=models.CASCADE, related_name='matches')
+    talent = models.ForeignKey(User, on_delete=models.CASCADE, related_name='job_matches')
+
+    score = models.FloatField(help_text="Overall match, 0 to 1")
+    skill_score = models.FloatField(help_text="Category weighted share of the required skills the talent has")
+    matched_skills = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'talent'], name='jobmatch_job_talent_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['job', '-score', '-id'], name='jobmatch_job_score_idx'),
+            models.Index(fields=['talent', '-score', '-id'], name='jobmatch_talent_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.talent.email} for {self.job.title} ({self.score:.2f})"
@@ -4,14 +4,21 @@
 # serializers.py for marketplace app
 # ModelSerializers for all models in marketplace/models.py
 from rest_framework import serializers
-from .models import JobPosting, Proposal, Contract, Milestone
+from .models import JobPosting, JobMatch, Proposal, Contract, Milestone
 
 # Serializes JobPosting model
 class JobPostingSerializer(serializers.ModelSerializer):
+    client_name = serializers.CharField(source='client.get_full_name', read_only=True)
+    proposals_count = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = JobPosting
-        fields = ['id', 'title', 'description', 'posted_by', 'created_at', 'status']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'title', 'description', 'client', 'client_name', 'job_type', 'experience_level', 'required_skills',
+                  'location', 'is_remote', 'budget_type', 'budget', 'duration_weeks', 'application_deadline', 'status',
+                  'is_urgent', 'proposals_count', 'created_at', 'updated_at', 'published_at']
+        read_only_fields = ['id', 'client', 'status', 'created_at', 'updated_at', 'published_at']
+        # annotated by the views' queryset, see JobPostingQuerySet.with_proposals_count()
+        source_fields = {'proposals_count': []}
 
 # Serializes Proposal model
 class ProposalSerializer(serializers.ModelSerializer):
@@ -23,11 +30,57 @@ class ProposalSerializer(serializers.ModelSerializer):
 class ContractSerializer(serializers.ModelSerializer):
     class Meta:
         model = Contract
-        fields = ['id', 'proposal', 'start_date', 'end_date', 'status']
-        read_only_fields = ['id', 'start_date']
+        fields = ['id', 'job', 'proposal', 'title', 'start_date', 'end_date', 'total_amount', 'status', 'has_milestones']
+        read_only_fields = ['id', 'job', 'start_date', 'total_amount', 'has_milestones']
 
 # Serializes Milestone model
 class MilestoneSerializer(serializers.ModelSerializer):
     class Meta:
         model = Milestone
         fields = '__all__'
+
+# Serializes JobPosting model for feed cards
+class JobSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = JobPosting
+        fields = ['id', 'title', 'job_type', 'experience_level', 'location', 'is_remote', 'budget_type', 'budget',
+                  'is_urgent', 'application_deadline', 'published_at']
+        read_only_fields = fields
+
+# Serializes JobPosting model for the public job feed
+class JobFeedSerializer(JobSummarySerializer):
+    class Meta(JobSummarySerializer.Meta):
+        fields = JobSummarySerializer.Meta.fields + ['required_skills']
+        read_only_fields = fields
+
+# Serializes JobMatch model as a recommended job of the talent
+class RecommendedJobSerializer(serializers.ModelSerializer):
+    job = JobSummarySerializer(read_only=True)
+
+    class Meta:
+        model = JobMatch
+        fields = ['id', 'score', 'skill_score', 'matched_skills', 'job']
+        read_only_fields = fields
+
+# Serializes JobMatch model as a candidate of the job
+class JobCandidateSerializer(serializers.ModelSerializer):
+    first_name = serializers.CharField(source='talent.first_name', read_only=True)
+    last_name = serializers.CharField(source='talent.last_name', read_only=True)
+    location = serializers.CharField(source='talent.location', read_only=True)
+
+    class Meta:
+        model = JobMatch
+        fields = ['id', 'talent', 'first_name', 'last_name', 'location', 'score', 'skill_score', 'matched_skills']
+        read_only_fields = fields
+
+# Input of a proposal acceptance, the milestones of the contract to create
+class MilestoneInputSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Milestone
+        fields = ['title', 'description', 'amount', 'due_date']
+
+class ProposalAcceptSerializer(serializers.Serializer):
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    communication_channel = serializers.URLField(required=False, allow_blank=True)
+    milestones = MilestoneInputSerializer(many=True, required=False)
@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Contract, JobMatch, JobPosting, Milestone, Proposal
+
+OPEN_PROPOSAL_STATUSES = (Proposal.SUBMITTED, Proposal.UNDER_REVIEW)
+
+
+class ProposalAcceptanceError(Exception):
+    """ The proposal cannot be accepted: its job is no longer open or the proposal was withdrawn or decided """
+
+
+def accept_proposal(proposal, milestones=(), **contract_fields):
+    """
+    Accepts a proposal in one transaction: the job row is locked (select_for_update) and moved from
+    PUBLISHED to FILLED with a conditional UPDATE, so of concurrent acceptances for the same job exactly
+    one goes through, also on backends without row locks where the UPDATE itself decides. Then the
+    proposal is accepted, every other open proposal of the job is rejected in one UPDATE, and the
+    contract is created with its milestones, dicts of Milestone fields, if any.
+    contract_fields override the contract defaults (title, dates, communication_channel...).
+    Returns the contract, raises ProposalAcceptanceError when the proposal cannot be accepted.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = JobPosting.objects.select_for_update().filter(pk=proposal.job_id).first()
+        if job is None or job.status != JobPosting.PUBLISHED:
+            raise ProposalAcceptanceError("This job is no longer open.")
+        if not JobPosting.objects.filter(pk=job.pk, status=JobPosting.PUBLISHED).update(status=JobPosting.FILLED, updated_at=now):
+            raise ProposalAcceptanceError("This job is no longer open.")
+
+        accepted = Proposal.objects.filter(pk=proposal.pk, job=job, status__in=OPEN_PROPOSAL_STATUSES).update(status=Proposal.ACCEPTED, updated_at=now)
+        if not accepted:
+            # rolls back the job update
+            raise ProposalAcceptanceError("This proposal is no longer open.")
+        Proposal.objects.filter(job=job, status__in=OPEN_PROPOSAL_STATUSES).exclude(pk=proposal.pk).update(status=Proposal.REJECTED, updated_at=now)
+        # the UPDATE above sends no signals, a filled job keeps no candidates
+        JobMatch.objects.filter(job=job).delete()
+
+        job.status = JobPosting.FILLED
+        proposal.status = Proposal.ACCEPTED
+        proposal.job = job
+        start_date = contract_fields.pop('start_date', None) or now.date()
+        contract = Contract.objects.create(**{
+            'job': job,
+            'proposal': proposal,
+            'title': job.title,
+            'description': job.description,
+            'start_date': start_date,
+            'end_date': start_date + timedelta(days=proposal.estimated_days),
+            'total_amount': proposal.proposed_amount,
+            # payment follows the job's budget type until contracts get their own choices
+            'payment_schedule': job.budget_type,
+            'status': Contract.ACTIVE,
+            'has_milestones': bool(milestones),
+            **contract_fields,
+        })
+        Milestone.objects.bulk_create([
+            Milestone(contract=contract, status=Milestone.PENDING, **milestone) for milestone in milestones
+        ])
+    return contract
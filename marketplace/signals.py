@@ -0,0 +1,81 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from users.reputation import reputation_change
+from .matching import schedule_job_matches
+from .models import Contract, JobPosting, Proposal
+
+@receiver(pre_save, sender=JobPosting)
+def remember_job_status(sender, instance, **kwargs):
+    instance._previous_status = None
+    if instance.pk:
+        instance._previous_status = sender.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+@receiver(post_save, sender=JobPosting)
+def match_published_job(sender, instance, **kwargs):
+    # candidates are computed when a job is published and dropped when it leaves that status
+    previous = getattr(instance, '_previous_status', None)
+    if (instance.status == JobPosting.PUBLISHED) != (previous == JobPosting.PUBLISHED):
+        schedule_job_matches(instance.pk)
+
+@receiver(m2m_changed, sender=JobPosting.required_skills.through)
+def rematch_job_skills(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse and instance.status == JobPosting.PUBLISHED:
+        schedule_job_matches(instance.pk)
+
+# Reputation events, every receiver pair compares what a row contributed to its talent's counters
+# before and after the write and applies the difference (see users.reputation)
+
+def contract_reputation(user_id, status):
+    if user_id is None:
+        return {}
+    return {user_id: {'completed_projects': int(status == Contract.COMPLETED), 'closed_contracts': int(status in Contract.CLOSED)}}
+
+def rating_reputation(user_id, rating):
+    if rating is None:
+        return {}
+    return {user_id: {'rating_count': 1, 'rating_total': rating}}
+
+def contract_applier(contract):
+    """ Id of the talent on the contract, from the loaded proposal or the one pre_save read when possible """
+    if not contract.proposal_id:
+        return None
+    proposal = contract._state.fields_cache.get('proposal')
+    if proposal is not None:
+        return proposal.applier_id
+    previous = getattr(contract, '_previous_applier', None)
+    if previous and previous[0] == contract.proposal_id:
+        return previous[1]
+    return Proposal.objects.filter(pk=contract.proposal_id).order_by().values_list('applier', flat=True).first()
+
+@receiver(pre_save, sender=Contract)
+def remember_contract_reputation(sender, instance, **kwargs):
+    instance._previous_reputation = {}
+    if instance.pk:
+        row = sender.objects.filter(pk=instance.pk).values('status', 'proposal', 'proposal__applier').first()
+        if row:
+            instance._previous_applier = (row['proposal'], row['proposal__applier'])
+            instance._previous_reputation = contract_reputation(row['proposal__applier'], row['status'])
+
+@receiver(post_save, sender=Contract)
+def update_contract_reputation(sender, instance, **kwargs):
+    reputation_change(getattr(instance, '_previous_reputation', {}), contract_reputation(contract_applier(instance), instance.status))
+
+@receiver(post_delete, sender=Contract)
+def remove_contract_reputation(sender, instance, **kwargs):
+    reputation_change(contract_reputation(contract_applier(instance), instance.status), {})
+
+@receiver(pre_save, sender=Proposal)
+def remember_proposal_rating(sender, instance, **kwargs):
+    instance._previous_reputation = {}
+    if instance.pk:
+        row = sender.objects.filter(pk=instance.pk).values('applier', 'rating').first()
+        if row:
+            instance._previous_reputation = rating_reputation(row['applier'], row['rating'])
+
+@receiver(post_save, sender=Proposal)
+def update_proposal_rating(sender, instance, **kwargs):
+    reputation_change(getattr(instance, '_previous_reputation', {}), rating_reputation(instance.applier_id, instance.rating))
+
+@receiver(post_delete, sender=Proposal)
+def remove_proposal_rating(sender, instance, **kwargs):
+    reputation_change(rating_reputation(instance.applier_id, instance.rating), {})
@@ -0,0 +1,12 @@
+from django.utils import timezone
+from core.sweeps import sweep, update_in_batches
+from .models import JobMatch, JobPosting
+
+
+@sweep('close_expired_jobs')
+def close_expired_jobs(batch_size):
+    """ Moves published jobs past their deadline to CLOSED, the UPDATE sends no signals so their stored candidates are dropped here """
+    closed = update_in_batches(JobPosting.objects.expired(), batch_size, status=JobPosting.CLOSED, updated_at=timezone.now())
+    if closed:
+        JobMatch.objects.filter(job__status=JobPosting.CLOSED).delete()
+    return closed
@@ -1,3 +1,265 @@
-from django.test import TestCase
+from datetime import timedelta
+import threading
+
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from skills.models import Skill, SkillCategory
+from users.models import User, UserProfile
+from .matching import refresh_job_matches, score_candidates
+from .models import Contract, JobMatch, JobPosting, Milestone, Proposal
+from .services import ProposalAcceptanceError, accept_proposal
 
 # Create your tests here.
+@override_settings(MATCHING_CATEGORY_WEIGHTS={'Engineering': 3.0})
+class JobMatchingTests(TestCase):
+    def setUp(self):
+        engineering = SkillCategory.objects.create(name='Engineering')
+        design = SkillCategory.objects.create(name='Design')
+        self.python = Skill.objects.create(name='Python', category=engineering)
+        self.django = Skill.objects.create(name='Django', category=engineering)
+        self.figma = Skill.objects.create(name='Figma', category=design)
+        self.client_user = User.objects.create_user('client@example.com', 'password', role=User.CLIENT)
+
+        self.engineer = self.talent('engineer@example.com', [self.python, self.django], experience_years=5, hourly_rate=40, is_available=True)
+        self.designer = self.talent('designer@example.com', [self.figma], experience_years=5, hourly_rate=40, is_available=True)
+        self.pricey = self.talent('pricey@example.com', [self.python, self.django], experience_years=5, hourly_rate=80, is_available=True)
+        self.talent('inactive@example.com', [self.python], is_active=False)
+
+    def talent(self, email, skills, is_active=True, **profile):
+        user = User.objects.create_user(email, 'password', is_active=is_active)
+        user.skills.set(skills)
+        UserProfile.objects.create(user=user, **profile)
+        return user
+
+    def job(self, status=JobPosting.DRAFT):
+        job = JobPosting.objects.create(
+            client=self.client_user, title='Backend', description='API work', status=status,
+            experience_level=JobPosting.SENIOR, budget_type=JobPosting.HOURLY, budget=40,
+        )
+        job.required_skills.set([self.python, self.django, self.figma])
+        return job
+
+    def test_scores_are_weighted_by_category(self):
+        job = self.job()
+        with self.assertNumQueries(3):
+            matches = score_candidates(job)
+        self.assertEqual([match.talent_id for match in matches], [self.engineer.pk, self.pricey.pk, self.designer.pk])
+        self.assertAlmostEqual(matches[0].skill_score, 6 / 7)
+        self.assertAlmostEqual(matches[2].skill_score, 1 / 7)
+        self.assertEqual(matches[0].matched_skills, 2)
+        self.assertEqual(len(score_candidates(job, limit=1)), 1)
+
+    def test_publishing_stores_candidates(self):
+        job = self.job()
+        with self.captureOnCommitCallbacks(execute=True):
+            job.status = JobPosting.PUBLISHED
+            job.save()
+        self.assertEqual(JobMatch.objects.filter(job=job).count(), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job.status = JobPosting.CLOSED
+            job.save()
+        self.assertFalse(JobMatch.objects.filter(job=job).exists())
+
+    def test_recommended_jobs_and_candidates(self):
+        open_job, closed_job = self.job(JobPosting.PUBLISHED), self.job(JobPosting.PUBLISHED)
+        refresh_job_matches(open_job)
+        refresh_job_matches(closed_job)
+        JobPosting.objects.filter(pk=closed_job.pk).update(status=JobPosting.CLOSED)
+
+        self.client.force_login(self.engineer)
+        response = self.client.get(reverse('api_recommended_jobs'))
+        self.assertEqual([row['job']['id'] for row in response.json()['results']], [open_job.pk])
+
+        url = reverse('api_job_candidates', args=[open_job.pk])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.client_user)
+        self.assertEqual([row['talent'] for row in self.client.get(url).json()['results']], [self.engineer.pk, self.pricey.pk, self.designer.pk])
+        self.client.force_login(User.objects.create_user('other@example.com', 'password', role=User.CLIENT))
+        self.assertEqual(self.client.get(url).json()['results'], [])
+
+
+class JobListTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('client@example.com', 'password', role=User.CLIENT, first_name='Ada', last_name='Client')
+        self.applicants = [User.objects.create_user(f'talent{i}@example.com', 'password') for i in range(3)]
+        self.draft = JobPosting.objects.create(client=self.owner, title='Draft', description='Later')
+
+    def publish(self, proposals):
+        job = JobPosting.objects.create(client=self.owner, title='Job', description='Work', status=JobPosting.PUBLISHED)
+        for applier in self.applicants[:proposals]:
+            Proposal.objects.create(job=job, applier=applier, cover_letter='Hire me', proposed_amount=10, estimated_days=1)
+        return job
+
+    def test_counts_and_clients_come_with_the_page(self):
+        jobs = [self.publish(proposals) for proposals in (1, 3)]
+
+        def fetch():
+            with CaptureQueriesContext(connection) as context:
+                rows = self.client.get(reverse('api_job_list')).json()['results']
+            return rows, len(context.captured_queries)
+
+        rows, queries = fetch()
+        self.assertEqual([(row['id'], row['proposals_count'], row['client_name']) for row in rows], [(jobs[1].pk, 3, 'Ada Client'), (jobs[0].pk, 1, 'Ada Client')])
+        self.publish(2)
+        self.assertEqual(fetch()[1], queries)
+
+    def test_drafts_are_visible_to_their_client(self):
+        url = reverse('api_job_detail', args=[self.draft.pk])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(url).json()['proposals_count'], 0)
+
+    def test_property_falls_back_to_a_query(self):
+        job = self.publish(2)
+        with self.assertNumQueries(2):
+            self.assertEqual(JobPosting.objects.get(pk=job.pk).proposals_count, 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(JobPosting.objects.with_proposals_count().get(pk=job.pk).proposals_count, 2)
+
+
+class JobFeedTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('client@example.com', 'password', role=User.CLIENT)
+        category = SkillCategory.objects.create(name='Engineering')
+        self.python, self.go = (Skill.objects.create(name=name, category=category) for name in ('Python', 'Go'))
+
+    def job(self, status=JobPosting.PUBLISHED, skills=(), **fields):
+        job = JobPosting.objects.create(client=self.owner, title='Job', description='Work', status=status, **fields)
+        job.required_skills.set(skills)
+        return job
+
+    def feed(self, **params):
+        response = self.client.get(reverse('api_job_feed'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_active_matches_the_property(self):
+        now = timezone.now()
+        jobs = [
+            self.job(),
+            self.job(application_deadline=now + timedelta(days=1)),
+            self.job(application_deadline=now - timedelta(days=1)),
+            self.job(status=JobPosting.DRAFT),
+            self.job(status=JobPosting.CLOSED),
+        ]
+        self.assertCountEqual(JobPosting.objects.active(), [job for job in jobs if job.is_active])
+
+    def test_feed_order_and_filters(self):
+        old = self.job(skills=[self.python, self.go], budget=500, is_remote=True)
+        urgent = self.job(skills=[self.go], budget=100, is_urgent=True)
+        new = self.job(job_type=JobPosting.CONTRACT, budget=900)
+        self.job(application_deadline=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(self.feed(), [urgent.pk, new.pk, old.pk])
+        self.assertEqual(self.feed(skills=f'{self.python.pk},{self.go.pk}'), [urgent.pk, old.pk])
+        self.assertEqual(self.feed(min_budget=200, max_budget=600), [old.pk])
+        self.assertEqual(self.feed(is_remote='true'), [old.pk])
+        self.assertEqual(self.feed(job_type=JobPosting.CONTRACT), [new.pk])
+        self.assertEqual(self.client.get(reverse('api_job_feed'), {'job_type': 9}).status_code, 400)
+
+    def test_keyset_pages(self):
+        jobs = [self.job(is_urgent=i % 2 == 0) for i in range(5)]
+        expected = [job.pk for job in sorted(jobs, key=lambda job: (job.is_urgent, job.published_at, job.pk), reverse=True)]
+        seen = []
+        response = self.client.get(reverse('api_job_feed'), {'page_size': 2}).json()
+        while True:
+            seen += [row['id'] for row in response['results']]
+            if not response['next']:
+                break
+            response = self.client.get(response['next']).json()
+        self.assertEqual(seen, expected)
+
+
+class ProposalAcceptanceMixin:
+    def create_job(self, proposals=3):
+        self.owner = User.objects.create_user('client@example.com', 'password', role=User.CLIENT)
+        self.job = JobPosting.objects.create(client=self.owner, title='Job', description='Work', status=JobPosting.PUBLISHED)
+        self.proposals = [
+            Proposal.objects.create(
+                job=self.job, applier=User.objects.create_user(f'talent{i}@example.com', 'password'),
+                cover_letter='Hire me', proposed_amount=100 + i, estimated_days=10,
+            )
+            for i in range(proposals)
+        ]
+
+    def assertFilledBy(self, proposal):
+        self.assertEqual(JobPosting.objects.get(pk=self.job.pk).status, JobPosting.FILLED)
+        statuses = dict(Proposal.objects.filter(job=self.job).values_list('pk', 'status'))
+        self.assertEqual(statuses, {p.pk: Proposal.ACCEPTED if p.pk == proposal.pk else Proposal.REJECTED for p in self.proposals})
+        contract = Contract.objects.get()
+        self.assertEqual((contract.proposal_id, contract.total_amount, contract.status), (proposal.pk, proposal.proposed_amount, Contract.ACTIVE))
+
+
+class ProposalAcceptanceTests(ProposalAcceptanceMixin, TestCase):
+    def setUp(self):
+        self.create_job()
+
+    def test_accept_creates_contract_and_rejects_competitors(self):
+        chosen = self.proposals[1]
+        Proposal.objects.filter(pk=self.proposals[2].pk).update(status=Proposal.UNDER_REVIEW)
+        with self.assertNumQueries(9):
+            contract = chosen.accept(milestones=[{'title': 'Design', 'amount': 40}, {'title': 'Build', 'amount': 61}])
+        self.assertFilledBy(chosen)
+        self.assertTrue(contract.has_milestones)
+        self.assertEqual(list(Milestone.objects.filter(contract=contract).values_list('title', 'status')), [('Design', Milestone.PENDING), ('Build', Milestone.PENDING)])
+        self.assertEqual(contract.end_date, contract.start_date + timedelta(days=10))
+
+        with self.assertRaises(ProposalAcceptanceError):
+            accept_proposal(self.proposals[0])
+        self.assertEqual(Contract.objects.count(), 1)
+
+    def test_withdrawn_proposal_rolls_back(self):
+        withdrawn = self.proposals[0]
+        withdrawn.withdraw()
+        with self.assertRaises(ProposalAcceptanceError):
+            accept_proposal(withdrawn)
+        self.assertEqual(JobPosting.objects.get(pk=self.job.pk).status, JobPosting.PUBLISHED)
+        self.assertEqual(Proposal.objects.filter(status=Proposal.REJECTED).count(), 0)
+
+    def test_view(self):
+        url = reverse('api_proposal_accept', args=[self.proposals[0].pk])
+        self.client.force_login(User.objects.create_user('other@example.com', 'password', role=User.CLIENT))
+        self.assertEqual(self.client.post(url).status_code, 404)
+
+        self.client.force_login(self.owner)
+        response = self.client.post(url, {'milestones': [{'title': 'All', 'amount': '100.00'}]}, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(response.json()['has_milestones'])
+        self.assertFilledBy(self.proposals[0])
+        self.assertEqual(self.client.post(reverse('api_proposal_accept', args=[self.proposals[1].pk])).status_code, 409)
+
+
+class ConcurrentProposalAcceptanceTests(ProposalAcceptanceMixin, TransactionTestCase):
+    def test_parallel_accepts_fill_the_job_once(self):
+        self.create_job(proposals=6)
+        barrier = threading.Barrier(len(self.proposals))
+        outcomes = {}
+
+        def accept(proposal):
+            try:
+                barrier.wait()
+                accept_proposal(proposal)
+                outcomes[proposal.pk] = 'accepted'
+            except ProposalAcceptanceError:
+                outcomes[proposal.pk] = 'refused'
+            except OperationalError:
+                # SQLite has no row locks, a writer that finds the database locked fails instead of waiting
+                outcomes[proposal.pk] = 'locked'
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=accept, args=(proposal,)) for proposal in self.proposals]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        winners = [pk for pk, outcome in outcomes.items() if outcome == 'accepted']
+        self.assertEqual(len(outcomes), len(self.proposals))
+        self.assertEqual(len(winners), 1, outcomes)
+        self.assertFilledBy(next(p for p in self.proposals if p.pk == winners[0]))
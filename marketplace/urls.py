@@ -0,0 +1,11 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('api/jobs/', views.JobListView.as_view(), name='api_job_list'),
+    path('api/jobs/feed/', views.JobFeedView.as_view(), name='api_job_feed'),
+    path('api/jobs/<int:pk>/', views.JobDetailView.as_view(), name='api_job_detail'),
+    path('api/jobs/recommended/', views.RecommendedJobsView.as_view(), name='api_recommended_jobs'),
+    path('api/jobs/<int:pk>/candidates/', views.JobCandidatesView.as_view(), name='api_job_candidates'),
+    path('api/proposals/<int:pk>/accept/', views.ProposalAcceptView.as_view(), name='api_proposal_accept'),
+]
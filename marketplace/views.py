@@ -1,3 +1,93 @@
-from django.shortcuts import render
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.pagination import KeysetPagination
+from core.queryplan import QueryPlanMixin
+from users.permissions import ADMIN, STAFF, IsTalent, PermissionQuerysetFilter, has_role, role_permission
+from . import serializers
+from .filters import JobFeedFilter
+from .models import JobMatch, JobPosting, Proposal, active_job_filter
+from .services import ProposalAcceptanceError, accept_proposal
 
 # Create your views here.
+class JobQuerysetMixin:
+    """ Published jobs, plus the client's own jobs in any status, with proposal counts and clients in the same query """
+    queryset = JobPosting.objects.all()
+
+    def get_queryset(self):
+        queryset = super().get_queryset().with_proposals_count()
+        visible = Q(status=JobPosting.PUBLISHED)
+        if self.request.user.is_authenticated:
+            if self.request.user.is_staff:
+                return queryset
+            visible |= Q(client=self.request.user)
+        return queryset.filter(visible)
+
+class JobListView(JobQuerysetMixin, QueryPlanMixin, generics.ListAPIView):
+    serializer_class = serializers.JobPostingSerializer
+    permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+    pagination_ordering = ('-created_at', '-id')
+
+class JobDetailView(JobQuerysetMixin, QueryPlanMixin, generics.RetrieveAPIView):
+    serializer_class = serializers.JobPostingSerializer
+    permission_classes = [AllowAny]
+
+class JobFeedView(QueryPlanMixin, generics.ListAPIView):
+    """ Public feed of open jobs, urgent ones first then the latest published, see JobFeedFilter """
+    queryset = JobPosting.objects.all()
+    serializer_class = serializers.JobFeedSerializer
+    permission_classes = [AllowAny]
+    filter_backends = [JobFeedFilter]
+    pagination_class = KeysetPagination
+    pagination_ordering = ('-is_urgent', '-published_at', '-id')
+
+    def get_queryset(self):
+        # active() reads the clock, so it is applied per request. Active jobs were published,
+        # published_at is set and can take part in the cursor
+        return super().get_queryset().active().filter(published_at__isnull=False)
+
+class RecommendedJobsView(QueryPlanMixin, generics.ListAPIView):
+    """ The talent's precomputed matches on jobs still taking applications, best first """
+    queryset = JobMatch.objects.all()
+    serializer_class = serializers.RecommendedJobSerializer
+    permission_classes = [IsTalent]
+    pagination_class = KeysetPagination
+    pagination_ordering = ('-score', '-id')
+
+    def get_queryset(self):
+        return super().get_queryset().filter(active_job_filter('job__'), talent=self.request.user)
+
+class JobCandidatesView(QueryPlanMixin, generics.ListAPIView):
+    """ Precomputed top candidates of a job, for its client """
+    queryset = JobMatch.objects.all()
+    serializer_class = serializers.JobCandidateSerializer
+    permission_classes = [role_permission('client', 'mentor', 'admin', owner_fields=['job__client'])]
+    filter_backends = [PermissionQuerysetFilter]
+    pagination_class = KeysetPagination
+    pagination_ordering = ('-score', '-id')
+
+    def get_queryset(self):
+        return super().get_queryset().filter(job=self.kwargs['pk'])
+
+class ProposalAcceptView(APIView):
+    """ Accepts a proposal for the job's client: creates the contract, fills the job and rejects the other proposals """
+    permission_classes = [role_permission('client', 'mentor', 'admin')]
+
+    def post(self, request, pk):
+        proposals = Proposal.objects.all()
+        if not has_role(request, ADMIN | STAFF):
+            proposals = proposals.filter(job__client=request.user)
+        proposal = get_object_or_404(proposals, pk=pk)
+
+        serializer = serializers.ProposalAcceptSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            contract = accept_proposal(proposal, **serializer.validated_data)
+        except ProposalAcceptanceError as e:
+            return Response({"details": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(serializers.ContractSerializer(contract).data, status=status.HTTP_201_CREATED)
@@ -2,6 +2,7 @@ from django.db import models
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from users.models import User
+from core.counters import increment_counter
 from skills.models import Skill
 
 # Create your models here.
@@ -89,12 +90,12 @@ class PortfolioItem(models.Model):
         return None
 
     def increment_views(self):
-        self.views_count += 1
-        self.save(update_fields=['views_count'])
+        increment_counter(self, 'views_count')
 
 class PortfolioImage(models.Model):
     portfolio_item = models.ForeignKey(PortfolioItem, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='portfolio_images/')
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     caption = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
     
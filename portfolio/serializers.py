@@ -4,6 +4,7 @@
 # serializers.py for portfolio app
 # ModelSerializers for all models in portfolio/models.py
 from rest_framework import serializers
+from core.serializers import ImageRenditionsField
 from .models import PortfolioItem, PortfolioImage
 
 # Serializes PortfolioItem model
@@ -15,6 +16,8 @@ class PortfolioItemSerializer(serializers.ModelSerializer):
 
 # Serializes PortfolioImage model
 class PortfolioImageSerializer(serializers.ModelSerializer):
+    image_renditions = ImageRenditionsField()
+
     class Meta:
         model = PortfolioImage
         fields = '__all__'
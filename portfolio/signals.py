@@ -0,0 +1,4 @@
+from core.images import track_renditions
+from .models import PortfolioImage
+
+track_renditions(PortfolioImage, 'image')
@@ -1,10 +1,15 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, UserProfile
+from .models import ProvisioningJob, User, UserProfile, UserSkill
 
 # Register your models here.
+class UserSkillInline(admin.TabularInline):
+    model = UserSkill
+    extra = 1
+
 class CustomUserAdmin(UserAdmin):
     model = User
+    inlines = [UserSkillInline]
     list_display = ('email', 'get_full_name', 'role', 'is_verified', 'is_active', 'date_joined')
     list_filter = ('role', 'is_verified', 'is_active', 'date_joined')
     search_fields = ('email', 'first_name', 'last_name')
@@ -13,7 +18,7 @@ class CustomUserAdmin(UserAdmin):
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         ('Personal Info', {'fields': ('first_name', 'last_name', 'profile_picture', 'phone_number', 'location')}),
-        ('Professional Info', {'fields': ('role', 'skills', 'website', 'github', 'linkedin', 'twitter')}),
+        ('Professional Info', {'fields': ('role', 'website', 'github', 'linkedin', 'twitter')}),
         ('Permissions', {'fields': ('is_verified', 'is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions')}),
         ('Important Dates', {'fields': ('last_login', 'date_joined')}),
     )
@@ -25,4 +30,11 @@ class CustomUserAdmin(UserAdmin):
     )
 
 admin.site.register(User, CustomUserAdmin)
-admin.site.register(UserProfile)
\ No newline at end of file
+admin.site.register(UserProfile)
+
+@admin.register(ProvisioningJob)
+class ProvisioningJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status']
+    readonly_fields = ['file', 'report', 'error', 'created_at', 'started_at', 'finished_at']
+    list_select_related = ['created_by']
\ No newline at end of file
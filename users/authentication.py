@@ -0,0 +1,117 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class UserCache:
+    """
+    Short lived cache of authenticated users keyed on their id.
+    Users live in a per process LRU for JWT_USER_CACHE_TTL seconds. When JWT_USER_CACHE_ALIAS names a
+    shared cache, a local miss is looked up there before the database, so processes share the work.
+    Entries are dropped whenever the user is saved or deleted (see signals); other processes can serve
+    their local copy until it expires.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'JWT_USER_CACHE_TTL', 30)
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'JWT_USER_CACHE_SIZE', 1024)
+
+    @property
+    def shared(self):
+        alias = getattr(settings, 'JWT_USER_CACHE_ALIAS', None)
+        return caches[alias] if alias else None
+
+    def key(self, user_id):
+        return f'jwt-user:{user_id}'
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(user_id)
+                    # every request gets its own instance, views may modify request.user
+                    return copy.copy(entry[1])
+                del self._entries[user_id]
+
+        if self.shared is not None:
+            user = self.shared.get(self.key(user_id))
+            if user is not None:
+                self._remember(user_id, user)
+                return copy.copy(user)
+        return None
+
+    def set(self, user_id, user):
+        user_id = str(user_id)
+        self._remember(user_id, copy.copy(user))
+        if self.shared is not None:
+            self.shared.set(self.key(user_id), user, self.ttl)
+
+    def _remember(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)
+        if self.shared is not None:
+            self.shared.delete(self.key(user_id))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user from user_cache instead of loading the row on every
+    request. Tokens carry role, is_staff and is_active claims (see RoleTokenObtainPairSerializer), a token
+    issued to a deactivated account is refused without a lookup.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and validated_token.get('is_active') is False:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
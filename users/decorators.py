@@ -1,15 +1,23 @@
+from functools import wraps
+
 from django.contrib.auth.decorators import user_passes_test
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import redirect
 
+from users.permissions import has_role, roles_mask
+
 def role_required(allowed_roles):
     """
-    Decorator for views that checks the user's role 
+    Decorator for views that checks the user's role
+    allowed_roles holds role names ('mentor') or User role values, superusers are always allowed
     """
+    mask = roles_mask(allowed_roles)
+
     def decorator(view_func):
+        @wraps(view_func)
         def _wrapped_view(request, *args, **kwargs):
             if request.user.is_authenticated:
-                if request.user.role in allowed_roles or request.user.is_superuser:
+                if has_role(request, mask):
                     return view_func(request, *args, **kwargs)
                 else:
                     raise PermissionDenied
@@ -35,8 +43,8 @@ class RoleRequiredMixin:
     def dispatch(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
             return redirect('login') #flag
-        
-        if request.user.role not in self.allowed_roles and not request.user.is_superuser:
+
+        if not has_role(request, roles_mask(self.allowed_roles)):
             raise PermissionDenied
-        
-        return super().dispatch(request, *args, **kwargs) #flag parent class inherits no parent and so i suspect super wont work
\ No newline at end of file
+
+        return super().dispatch(request, *args, **kwargs) #flag parent class inherits no parent and so i suspect super wont work
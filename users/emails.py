@@ -1,24 +1,12 @@
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
-from django.conf import settings
+from core.mail import enqueue_email
 
 class EmailService:
     @staticmethod
     def send_template_email(user, template_context, subject, template_name='email_template'):
         """
-        Send email using template with context
+        Queue an email using template with context, the send_queued_emails worker delivers it
         """
-        html_content = render_to_string(f'emails/{template_name}.html', template_context)
-        
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=html_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[user.email]
-        )
-        
-        email.attach_alternative(html_content, "text/html")
-        email.send()
+        return enqueue_email(user.email, subject, template_name, template_context)
         
     @classmethod
     def send_password_reset_email(cls, info):
@@ -26,4 +14,4 @@ class EmailService:
             'email': info['user'].email,
             'code': info['reset_code'].code
         }
-        cls.send_template_email(info['user'], context, info['subject'], template_name='password_reset')
\ No newline at end of file
+        return cls.send_template_email(info['user'], context, info['subject'], template_name='password_reset')
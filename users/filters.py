@@ -0,0 +1,64 @@
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Lower
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+from .models import UserSkill
+
+
+class TalentSearchParamsSerializer(serializers.Serializer):
+    skills = serializers.CharField(required=False)
+    match = serializers.ChoiceField(choices=['any', 'all'], default='any')
+    min_rate = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_rate = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    min_experience = serializers.IntegerField(min_value=0, required=False)
+    location = serializers.CharField(required=False)
+    available = serializers.BooleanField(required=False, allow_null=True)
+
+    def validate_skills(self, value):
+        try:
+            skill_ids = {int(pk) for pk in value.split(',') if pk.strip()}
+        except ValueError:
+            raise serializers.ValidationError("Give skill ids separated by commas.")
+        if len(skill_ids) > 20:
+            raise serializers.ValidationError("Search for 20 skills at most.")
+        return sorted(skill_ids)
+
+
+class TalentSearchFilter(BaseFilterBackend):
+    """
+    Talent directory filters from the query parameters:
+    ?skills=1,2,3&match=any|all  users with any (or all) of the skills, annotated with skill_matches,
+                                 the number of requested skills they have, which the results rank on
+    ?min_rate= ?max_rate= ?min_experience= ?available=true  profile fields
+    ?location=                   case insensitive exact match
+    Candidates come from the (skill, user) index of the skill links, so only users with a requested
+    skill are ranked.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = TalentSearchParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
+
+        if 'min_rate' in params:
+            queryset = queryset.filter(profile__hourly_rate__gte=params['min_rate'])
+        if 'max_rate' in params:
+            queryset = queryset.filter(profile__hourly_rate__lte=params['max_rate'])
+        if 'min_experience' in params:
+            queryset = queryset.filter(profile__experience_years__gte=params['min_experience'])
+        if params.get('available') is not None:
+            queryset = queryset.filter(profile__is_available=params['available'])
+        if params.get('location'):
+            queryset = queryset.alias(location_lower=Lower('location')).filter(location_lower=params['location'].strip().lower())
+
+        skill_ids = params.get('skills')
+        if not skill_ids:
+            return queryset.annotate(skill_matches=Value(0))
+
+        links = UserSkill.objects.filter(skill__in=skill_ids)
+        matches = links.filter(user=OuterRef('pk')).order_by().values('user').annotate(count=Count('*')).values('count')
+        queryset = queryset.filter(pk__in=links.values('user')).annotate(skill_matches=Subquery(matches))
+        if params['match'] == 'all':
+            queryset = queryset.filter(skill_matches=len(skill_ids))
+        return queryset
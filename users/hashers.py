@@ -0,0 +1,85 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def hasher_param(algorithm, name, default):
+    """ Cost parameter of a hasher from settings.PASSWORD_HASHER_PARAMS, keyed on the algorithm name """
+    return getattr(settings, 'PASSWORD_HASHER_PARAMS', {}).get(algorithm, {}).get(name, default)
+
+
+# Django's hashers with their cost read from settings. They keep Django's algorithm names, so existing
+# hashes still verify, and Django's must_update() compares the stored parameters with the configured
+# ones: a user whose hash was made with other parameters is rehashed on the next successful login.
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return hasher_param(self.algorithm, 'iterations', hashers.PBKDF2PasswordHasher.iterations)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return hasher_param(self.algorithm, 'time_cost', hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return hasher_param(self.algorithm, 'memory_cost', hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return hasher_param(self.algorithm, 'parallelism', hashers.Argon2PasswordHasher.parallelism)
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    @property
+    def rounds(self):
+        return hasher_param(self.algorithm, 'rounds', hashers.BCryptSHA256PasswordHasher.rounds)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def hashing_executor():
+    """
+    Thread pool that runs password hashing for async views, sized by PASSWORD_HASHING_THREADS (one
+    thread per core by default) so a login burst queues instead of starving the event loop. The
+    hashing libraries release the GIL while they work.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, 'PASSWORD_HASHING_THREADS', None) or os.cpu_count() or 1
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+    return _executor
+
+
+async def _run(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(hashing_executor(), func, *args)
+
+
+async def amake_password(password):
+    return await _run(hashers.make_password, password)
+
+
+async def aset_password(user, password):
+    """ set_password() for async views, the caller still saves the user """
+    user.password = await amake_password(password)
+    user._password = password
+
+
+async def acheck_password(user, password):
+    """
+    check_password() for async views, hashing in the bounded pool.
+    An outdated hash is replaced and saved like check_password() does on login.
+    """
+    is_correct, must_update = await _run(hashers.verify_password, password, user.password)
+    if is_correct and must_update:
+        user.password = await amake_password(password)
+        await user.asave(update_fields=['password'])
+    return is_correct
@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Measures password verification cost, i.e. logins/sec per core, for each configured hasher"
+
+    def add_arguments(self, parser):
+        parser.add_argument('algorithms', nargs='*', help="Algorithms to measure, all of PASSWORD_HASHERS by default")
+        parser.add_argument('--duration', type=float, default=2.0, help="Seconds spent measuring each hasher")
+
+    def describe(self, hasher, encoded):
+        summary = hasher.decode(encoded)
+        return {name: value for name, value in summary.items() if name not in ('algorithm', 'hash', 'salt')}
+
+    def handle(self, *args, **options):
+        hashers = get_hashers()
+        if options['algorithms']:
+            hashers = [hasher for hasher in hashers if hasher.algorithm in options['algorithms']]
+            if not hashers:
+                raise CommandError(f"None of {', '.join(options['algorithms'])} is in PASSWORD_HASHERS")
+
+        cores = os.cpu_count() or 1
+        for hasher in hashers:
+            if hasher.library is not None:
+                try:
+                    hasher._load_library()
+                except ValueError as e:
+                    self.stdout.write(self.style.WARNING(f"{hasher.algorithm}: unavailable, {e}"))
+                    continue
+
+            encoded = hasher.encode('benchmark password', hasher.salt())
+            params = self.describe(hasher, encoded)
+            logins = 0
+            started = time.perf_counter()
+            deadline = started + options['duration']
+            while True:
+                hasher.verify('benchmark password', encoded)
+                logins += 1
+                if time.perf_counter() >= deadline:
+                    break
+            elapsed = time.perf_counter() - started
+
+            rate = logins / elapsed
+            settings_used = ', '.join(f'{name}={value}' for name, value in params.items())
+            self.stdout.write(self.style.SUCCESS(
+                f"{hasher.algorithm} ({settings_used}): {1000 / rate:.1f} ms/login, "
+                f"{rate:.1f} logins/sec per core, ~{rate * cores:.0f} logins/sec on {cores} core(s)"
+            ))
@@ -0,0 +1,22 @@
+import csv
+
+from django.core.management.base import BaseCommand
+from users.provisioning import UserProvisioner
+
+
+class Command(BaseCommand):
+    help = "Creates users from a CSV file with email, first_name, last_name, role, password and skills columns"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file, skills are separated by ';'")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Users inserted per transaction")
+        parser.add_argument('--workers', type=int, default=None, help="Processes hashing passwords, PROVISIONING_HASH_WORKERS or one per core by default")
+
+    def handle(self, *args, **options):
+        provisioner = UserProvisioner(chunk_size=options['chunk_size'], workers=options['workers'])
+        with open(options['path'], newline='', encoding='utf-8-sig') as f:
+            report = provisioner.run(csv.DictReader(f))
+
+        for error in report.errors:
+            self.stderr.write(f"Row {error['row']} ({error['email']}): {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(f"Created {report.created} user(s), {len(report.errors)} row(s) failed"))
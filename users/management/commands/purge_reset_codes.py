@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from users.models import PasswordResetCode
+
+
+class Command(BaseCommand):
+    help = "Deletes used and expired password reset codes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per statement")
+
+    def handle(self, *args, **options):
+        deleted = PasswordResetCode.objects.purge(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} reset code(s)"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from users.reputation import recompute_reputation
+
+
+class Command(BaseCommand):
+    help = "Recomputes the reputation counters of user profiles from contracts, ratings, tasks and certificates (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('users', nargs='*', type=int, help="User ids to recompute, all profiles by default")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Profiles written per statement")
+
+    def handle(self, *args, **options):
+        written = recompute_reputation(options['users'] or None, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Updated the reputation of {written} profile(s)"))
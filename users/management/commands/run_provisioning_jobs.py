@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from users.provisioning import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Provisions the users of CSV uploads queued by the provisioning endpoint, polling for new ones unless --once is given"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Users inserted per transaction")
+        parser.add_argument('--workers', type=int, default=None, help="Processes hashing passwords, PROVISIONING_HASH_WORKERS or one per core by default")
+        parser.add_argument('--interval', type=float, default=5, help="Seconds to wait when no upload is queued")
+        parser.add_argument('--once', action='store_true', help="Run the queued uploads once and exit")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            job = claim_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+
+            run_job(job, chunk_size=options['chunk_size'], workers=options['workers'])
+            if job.error:
+                self.stdout.write(self.style.ERROR(f"Job {job.pk}: {job.error}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"Job {job.pk}: created {job.report['created']} user(s), {job.report['failed']} row(s) failed"))
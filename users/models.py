@@ -1,12 +1,15 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser, AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.core.validators import RegexValidator
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.conf import settings
 from datetime import timedelta
-from random import randint
+import secrets
+import uuid
 
 from skills.models import Skill
+from core.mixins import DirtyFieldsMixin
 
 # Create your models here.
 class CustomUserManager(BaseUserManager):
@@ -48,11 +51,12 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     role = models.IntegerField(choices=ROLE_CHOICES, default=TALENT)
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True, default='profile_pictures/default.png')
+    profile_picture_renditions = models.JSONField(default=dict, blank=True, editable=False)
     phone_regex = RegexValidator(regex=r'^\+1?\d{9, 15}$', message="Phone number must be entered in the format: '+999999999'. Up to 15 digits allowed")
     phone_number = models.CharField(validators=[phone_regex], max_length=17, blank=True, null=True)
     location = models.CharField(max_length=100, blank=True, null=True)
 
-    skills = models.ManyToManyField(Skill, related_name='users')
+    skills = models.ManyToManyField(Skill, related_name='users', through='UserSkill')
 
     is_verified = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
@@ -72,6 +76,13 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     objects = CustomUserManager()
 
+    class Meta:
+        indexes = [
+            # talent directory: active users of a role, newest first
+            models.Index(fields=['role', 'is_active', '-id'], name='user_role_active_idx'),
+            models.Index(Lower('location'), name='user_location_lower_idx'),
+        ]
+
     def __str__(self):
         return f"{self.get_full_name()} ({self.email})"
     
@@ -84,6 +95,15 @@ class User(AbstractBaseUser, PermissionsMixin):
         
     def get_full_name(self):
         return f'{self.first_name or ""} {self.last_name or ""}'
+
+    def get_profile(self):
+        """The user's profile, created on first access"""
+        try:
+            return self.profile
+        except UserProfile.DoesNotExist:
+            profile, _ = UserProfile.objects.get_or_create(user=self)
+            self.profile = profile
+            return profile
     
     @property
     def is_talent(self):
@@ -101,7 +121,25 @@ class User(AbstractBaseUser, PermissionsMixin):
     def is_admin_user(self):
         return self.role == User.ADMIN or self.is_staff
     
-class UserProfile(models.Model):
+class UserSkill(models.Model):
+    """ User to skill link, the table of the former implicit many to many """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'users_user_skills'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'skill'], name='users_user_skills_user_skill_uniq'),
+        ]
+        indexes = [
+            # skill to users lookups of the talent search read the index only
+            models.Index(fields=['skill', 'user'], name='userskill_skill_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.skill_id}"
+
+class UserProfile(DirtyFieldsMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
 
     title = models.CharField(max_length=100, blank=True, null=True)
@@ -115,18 +153,72 @@ class UserProfile(models.Model):
 
     notification_preferences = models.JSONField(default=dict, blank=True)
 
+    # reputation, maintained by users.reputation from contract, rating, task and certificate events
     completed_projects = models.PositiveIntegerField(default=0)
-    success_rate = models.FloatField(default=0.0)
+    closed_contracts = models.PositiveIntegerField(default=0, help_text="Contracts completed, cancelled or disputed")
+    success_rate = models.FloatField(default=0.0, help_text="Percentage of closed contracts that were completed")
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0)
+    tasks_assigned = models.PositiveIntegerField(default=0)
+    tasks_completed = models.PositiveIntegerField(default=0)
+    certificates_earned = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_available', 'hourly_rate'], name='profile_available_rate_idx'),
+            models.Index(fields=['is_available', 'experience_years'], name='profile_available_exp_idx'),
+        ]
 
     def __str__(self):
         return f"Profile of {self.user.email}"
 
+    @property
+    def average_rating(self):
+        return self.rating_total / self.rating_count if self.rating_count else None
+
+    @property
+    def task_completion_rate(self):
+        return self.tasks_completed * 100 / self.tasks_assigned if self.tasks_assigned else 0
+
+class PasswordResetCodeQuerySet(models.QuerySet):
+    def usable(self):
+        return self.filter(is_used=False, expires_at__gt=timezone.now())
+
+    def issue(self, user):
+        """ Invalidates the user's outstanding codes and creates a new one """
+        self.filter(user=user, is_used=False).update(is_used=True)
+        return self.create(user=user)
+
+    def find(self, email, code):
+        """ The latest usable code matching email and code, with its user, in one query """
+        return self.usable().select_related('user').filter(
+            user__email=email, code=code
+        ).order_by('-created_at').first()
+
+    def purge(self, batch_size=1000):
+        """ Deletes expired and used codes in batches, returns the number of rows deleted """
+        stale = self.filter(models.Q(is_used=True) | models.Q(expires_at__lte=timezone.now()))
+        deleted = 0
+        while True:
+            batch = list(stale.values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return deleted
+            deleted += self.filter(pk__in=batch).delete()[0]
+
 class PasswordResetCode(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     code = models.CharField(max_length=settings.RESET_CODE_LENGTH)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
     is_used = models.BooleanField(default=False)
+
+    objects = PasswordResetCodeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_used', 'created_at'], name='resetcode_user_used_idx'),
+            models.Index(fields=['expires_at'], name='resetcode_expires_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - Valid: {self.is_valid}"
@@ -139,8 +231,8 @@ class PasswordResetCode(models.Model):
         super().save(*args, **kwargs)
         
     def generate_code(self):
-        """Generate a 4-digit code"""
-        return str(randint(1000, 9999))
+        """Generate a RESET_CODE_LENGTH digit code"""
+        return ''.join(secrets.choice('0123456789') for _ in range(settings.RESET_CODE_LENGTH))
     
     @property
     def is_valid(self):
@@ -148,7 +240,45 @@ class PasswordResetCode(models.Model):
         return ((not self.is_used) and (timezone.now() < self.expires_at))
 
     def mark_used(self):
-        """Mark code as used"""
+        """Mark code as used, returns False when another request consumed it first"""
+        consumed = PasswordResetCode.objects.filter(pk=self.pk, is_used=False).update(is_used=True) == 1
         self.is_used = True
-        self.save()
+        return consumed
+
+
+def provisioning_upload_path(instance, filename):
+    # unguessable, the file holds plaintext passwords until the worker has read it
+    return f'provisioning/{uuid.uuid4().hex}.csv'
+
+class ProvisioningJob(models.Model):
+    """ CSV upload of BulkUserProvisionView, provisioned by the run_provisioning_jobs worker """
+    PENDING = 0
+    RUNNING = 1
+    DONE = 2
+    FAILED = 3
 
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    file = models.FileField(upload_to=provisioning_upload_path, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='provisioning_jobs')
+    status = models.IntegerField(choices=STATUS_CHOICES, default=PENDING)
+    report = models.JSONField(default=dict, blank=True, help_text="ProvisioningReport.as_dict() once done")
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the worker's queue scan
+            models.Index(fields=['status', 'created_at', 'id'], name='provjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Provisioning job {self.pk} ({self.get_status_display()})"
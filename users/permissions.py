@@ -1,19 +1,129 @@
+from django.db.models import Q
 from rest_framework import permissions
+from rest_framework.filters import BaseFilterBackend
 from users.models import User
 
-class IsMentor(permissions.BasePermission):
-    def has_object_permissions(self, request, view, obj):
-        return request.user.is_authenticated and request.user.is_active and request.user.role == User.MENTOR
-    
-class IsTalent(permissions.BasePermission):
-    def has_object_permissions(self, request, view, obj):
-        return request.user.is_authenticated and request.user.is_active and request.user.role == User.TALENT
-
-class IsStaff(permissions.BasePermission):
-    def has_object_permissions(self, request, view, obj):
-        return request.user.is_authenticated and request.user.is_active and request.user.is_staff
-    
+# Role bits, a request's role mask is computed once from its user and every check is a bitwise AND
+TALENT = 1 << User.TALENT
+CLIENT = 1 << User.CLIENT
+MENTOR = 1 << User.MENTOR
+ADMIN = 1 << User.ADMIN
+STAFF = 1 << 4
+SUPERUSER = 1 << 5
+AUTHENTICATED = TALENT | CLIENT | MENTOR | ADMIN
+
+ROLE_NAMES = {
+    'talent': TALENT,
+    'client': CLIENT,
+    'mentor': MENTOR,
+    'admin': ADMIN,
+    'staff': STAFF,
+}
+
+
+def roles_mask(roles):
+    """ Mask of a collection of role names ('mentor') or User role values (User.MENTOR) """
+    mask = 0
+    for role in roles:
+        mask |= ROLE_NAMES[role] if isinstance(role, str) else 1 << role
+    return mask
+
+
+def user_role_mask(user):
+    if not user.is_authenticated or not user.is_active:
+        return 0
+    mask = 1 << user.role
+    if user.is_staff:
+        mask |= STAFF | ADMIN
+    if user.is_superuser:
+        mask |= SUPERUSER
+    return mask
+
+
+def request_role_mask(request):
+    """ Role mask of the request's user, computed on the first check and kept for the rest of the request """
+    http_request = getattr(request, '_request', request)
+    user = request.user
+    cached = getattr(http_request, '_role_mask', None)
+    if cached is None or cached[0] is not user:
+        cached = (user, user_role_mask(user))
+        http_request._role_mask = cached
+    return cached[1]
+
+
+def has_role(request, mask):
+    """ True when the user has one of the roles in mask, superusers have them all """
+    user_mask = request_role_mask(request)
+    return bool(user_mask & mask) or bool(user_mask & SUPERUSER)
+
+
+class RolePermission(permissions.BasePermission):
+    """
+    Grants access to users with one of the roles in `roles` (a mask of the bits above).
+    When `owner_fields` lists lookups to the owning user, e.g. ('student', 'course__mentor'), users other
+    than admins and staff only get the objects they own: has_object_permission() compares the related
+    ids already on the object, and filter_queryset() restricts a whole list in the query instead of
+    checking every object (see PermissionQuerysetFilter).
+    """
+    roles = AUTHENTICATED
+    owner_fields = ()
+    unrestricted_roles = ADMIN | STAFF
+
+    def has_permission(self, request, view):
+        return has_role(request, self.roles)
+
+    def has_object_permission(self, request, view, obj):
+        if not self.owner_fields or has_role(request, self.unrestricted_roles):
+            return True
+        return any(self.owner_id(obj, lookup) == request.user.pk for lookup in self.owner_fields)
+
+    def owner_id(self, obj, lookup):
+        *path, field = lookup.split('__')
+        for name in path:
+            obj = getattr(obj, name, None)
+            if obj is None:
+                return None
+        return getattr(obj, f'{field}_id', None)
+
+    def filter_queryset(self, request, queryset, view):
+        if not self.owner_fields or has_role(request, self.unrestricted_roles):
+            return queryset
+        condition = Q()
+        for lookup in self.owner_fields:
+            condition |= Q(**{lookup: request.user.pk})
+        return queryset.filter(condition)
+
+
+def role_permission(*roles, owner_fields=()):
+    """ RolePermission class for the given role names or values, e.g. role_permission('mentor', 'admin') """
+    return type('RolePermission', (RolePermission,), {
+        'roles': roles_mask(roles),
+        'owner_fields': tuple(owner_fields),
+    })
+
+
+class PermissionQuerysetFilter(BaseFilterBackend):
+    """ Applies filter_queryset() of the view's permissions, so lists only hold objects the user may see """
+
+    def filter_queryset(self, request, queryset, view):
+        for permission in view.get_permissions():
+            if hasattr(permission, 'filter_queryset'):
+                queryset = permission.filter_queryset(request, queryset, view)
+        return queryset
+
+
+class IsMentor(RolePermission):
+    roles = MENTOR
+
+class IsTalent(RolePermission):
+    roles = TALENT
+
+class IsClient(RolePermission):
+    roles = CLIENT
+
+class IsStaff(RolePermission):
+    roles = STAFF
+
 class IsNotAuthenticated(permissions.BasePermission):
-    def has_object_permissions(self, request, view, obj):
+    def has_permission(self, request, view):
         return not request.user.is_authenticated
-    
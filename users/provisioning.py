@@ -0,0 +1,241 @@
+import csv
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from rest_framework import serializers
+
+from skills.models import Skill
+from .models import ProvisioningJob, User, UserProfile
+
+logger = logging.getLogger(__name__)
+
+ROLE_VALUES = {name.lower(): value for value, name in User.ROLE_CHOICES}
+
+
+class ProvisionRowSerializer(serializers.Serializer):
+    """ One CSV row: email, first_name, last_name, role (name or value), password, skills (';' separated names) """
+    email = serializers.EmailField()
+    first_name = serializers.CharField(max_length=40, required=False, allow_blank=True)
+    last_name = serializers.CharField(max_length=40, required=False, allow_blank=True)
+    role = serializers.CharField(required=False, allow_blank=True)
+    password = serializers.CharField(required=False, allow_blank=True, trim_whitespace=False)
+    skills = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_email(self, value):
+        # the way create_user() stores it, duplicates are looked for case-insensitively
+        return User.objects.normalize_email(value.strip())
+
+    def validate_role(self, value):
+        value = value.strip().lower()
+        if not value:
+            return User.TALENT
+        if value.isdigit() and int(value) in dict(User.ROLE_CHOICES):
+            return int(value)
+        if value in ROLE_VALUES:
+            return ROLE_VALUES[value]
+        raise serializers.ValidationError(f"Unknown role '{value}'")
+
+    def validate_skills(self, value):
+        return [name.strip() for name in value.split(';') if name.strip()]
+
+
+def _setup_worker():
+    # spawned workers start without Django, forked ones already have it
+    if not settings.configured or not apps.ready:
+        django.setup()
+
+
+def password_pool(workers):
+    """ Process pool for hash_passwords(), start one per run and share it between chunks """
+    return ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker)
+
+
+def hash_passwords(passwords, pool=None, workers=1):
+    """
+    Hashes passwords in `pool`, a password_pool() of `workers` processes, hashing is CPU bound and holds
+    the GIL in pure Python hashers. Without a pool, or for small inputs where a pool does not pay off,
+    the passwords are hashed in this process.
+    """
+    if pool is None or len(passwords) < 4 * workers:
+        return [make_password(password) for password in passwords]
+    return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+class ProvisioningReport:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, row_number, email, errors):
+        self.errors.append({'row': row_number, 'email': email, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': self.created, 'failed': len(self.errors), 'errors': self.errors}
+
+
+class UserProvisioner:
+    """
+    Creates users from an iterable of dict rows (e.g. csv.DictReader) in chunks. Every chunk is validated,
+    its passwords hashed in a process pool, and its users, profiles and skill rows are inserted with
+    bulk_create inside one transaction. Invalid rows are reported with their row number and skipped, the
+    rest of the batch goes on. Rows without a password get an unusable one and go through password reset.
+    bulk_create sends no post_save signals, profiles are created here instead.
+    Passwords are hashed in this process by default. workers=None starts one process pool for the run,
+    of PROVISIONING_HASH_WORKERS or one process per core.
+    """
+
+    def __init__(self, chunk_size=500, workers=1):
+        self.chunk_size = chunk_size
+        self.workers = workers or getattr(settings, 'PROVISIONING_HASH_WORKERS', None) or os.cpu_count() or 1
+        self.pool = None
+        self.report = ProvisioningReport()
+        self.seen_emails = set()
+        self.skill_ids = {}
+
+    def run(self, rows, first_row_number=2):
+        """ Row numbers default to CSV line numbers, the header being line 1 """
+        rows = iter(rows)
+        row_number = first_row_number
+        with password_pool(self.workers) if self.workers > 1 else nullcontext() as self.pool:
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                self.provision_chunk(list(enumerate(chunk, row_number)))
+                row_number += len(chunk)
+        self.pool = None
+        return self.report
+
+    def validate(self, numbered_rows):
+        valid = []
+        for row_number, row in numbered_rows:
+            row = {key.strip().lower(): (value or '') for key, value in row.items() if key}
+            serializer = ProvisionRowSerializer(data=row)
+            if not serializer.is_valid():
+                self.report.add_error(row_number, row.get('email'), serializer.errors)
+                continue
+            data = serializer.validated_data
+            if data['email'].lower() in self.seen_emails:
+                self.report.add_error(row_number, data['email'], {'email': ['Duplicate email in this import.']})
+                continue
+            self.seen_emails.add(data['email'].lower())
+            valid.append((row_number, data))
+
+        existing = set(
+            User.objects.annotate(lower_email=Lower('email'))
+            .filter(lower_email__in=[data['email'].lower() for _, data in valid])
+            .values_list('lower_email', flat=True)
+        )
+        self.load_skills({name for _, data in valid for name in data.get('skills', [])})
+
+        checked = []
+        for row_number, data in valid:
+            if data['email'].lower() in existing:
+                self.report.add_error(row_number, data['email'], {'email': ['A user with this email already exists.']})
+                continue
+            unknown = [name for name in data.get('skills', []) if name.lower() not in self.skill_ids]
+            if unknown:
+                self.report.add_error(row_number, data['email'], {'skills': [f"Unknown skill '{name}'" for name in unknown]})
+                continue
+            checked.append((row_number, data))
+        return checked
+
+    def load_skills(self, names):
+        missing = {name.lower() for name in names} - set(self.skill_ids)
+        if missing:
+            skills = Skill.objects.annotate(lower_name=Lower('name')).filter(lower_name__in=missing)
+            for pk, name in skills.values_list('pk', 'lower_name'):
+                self.skill_ids[name] = pk
+
+    def build_user(self, data, password):
+        role = data.get('role', User.TALENT)
+        return User(
+            email=data['email'],
+            first_name=data.get('first_name') or None,
+            last_name=data.get('last_name') or None,
+            role=role,
+            is_staff=role == User.ADMIN,
+            password=password,
+        )
+
+    def provision_chunk(self, numbered_rows):
+        rows = self.validate(numbered_rows)
+        if not rows:
+            return
+        with_password = [i for i, (_, data) in enumerate(rows) if data.get('password')]
+        hashes = hash_passwords([rows[i][1]['password'] for i in with_password], self.pool, self.workers)
+        passwords = [make_password(None) for _ in rows]
+        for i, encoded in zip(with_password, hashes):
+            passwords[i] = encoded
+        users = [self.build_user(data, password) for (_, data), password in zip(rows, passwords)]
+
+        try:
+            with transaction.atomic():
+                self.insert(users, rows)
+        except IntegrityError:
+            # someone created one of these users meanwhile, retry row by row to find it
+            for user, row in zip(users, rows):
+                user.pk = None
+                user._state.adding = True
+                try:
+                    with transaction.atomic():
+                        self.insert([user], [row])
+                except IntegrityError as e:
+                    self.report.add_error(row[0], user.email, {'non_field_errors': [str(e)]})
+
+    def insert(self, users, rows):
+        User.objects.bulk_create(users, batch_size=self.chunk_size)
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in users], batch_size=self.chunk_size)
+        UserSkill = User.skills.through
+        UserSkill.objects.bulk_create([
+            UserSkill(user_id=user.pk, skill_id=skill_id)
+            for user, (_, data) in zip(users, rows)
+            for skill_id in {self.skill_ids[name.lower()] for name in data.get('skills', [])}
+        ], batch_size=self.chunk_size)
+        self.report.created += len(users)
+
+
+def claim_job():
+    """ Takes the oldest pending ProvisioningJob and marks it running, concurrent workers never share one """
+    with transaction.atomic():
+        job = (
+            ProvisioningJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ProvisioningJob.PENDING).order_by('created_at', 'id').first()
+        )
+        if job is not None:
+            job.status = ProvisioningJob.RUNNING
+            job.started_at = timezone.now()
+            job.save(update_fields=['status', 'started_at'])
+    return job
+
+
+def run_job(job, chunk_size=500, workers=None):
+    """
+    Provisions the rows of a queued upload and stores the report on the job. The CSV holds plaintext
+    passwords, it is deleted once read whatever the outcome.
+    """
+    try:
+        with job.file.open('rb') as f:
+            rows = csv.DictReader(io.TextIOWrapper(f, encoding='utf-8-sig', newline=''))
+            job.report = UserProvisioner(chunk_size=chunk_size, workers=workers).run(rows).as_dict()
+        job.status = ProvisioningJob.DONE
+    except Exception as e:
+        logger.exception("Provisioning job %s failed", job.pk)
+        job.status = ProvisioningJob.FAILED
+        job.error = f'{type(e).__name__}: {e}'
+    finally:
+        job.file.delete(save=False)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'status', 'report', 'error', 'finished_at'])
+    return job
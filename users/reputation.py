@@ -0,0 +1,119 @@
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Greatest
+
+from .models import UserProfile
+
+# UserProfile counters, success_rate is derived from completed_projects and closed_contracts
+COUNTERS = ('completed_projects', 'closed_contracts', 'rating_count', 'rating_total', 'tasks_assigned', 'tasks_completed', 'certificates_earned')
+
+
+def success_rate(completed, closed):
+    return completed * 100.0 / closed if closed else 0.0
+
+
+def _success_rate_expression(completed_delta, closed_delta):
+    closed = F('closed_contracts') + closed_delta
+    return Case(
+        When(closed_contracts__gt=-closed_delta, then=Cast(F('completed_projects') + completed_delta, FloatField()) * 100.0 / closed),
+        default=Value(0.0),
+    )
+
+
+def add_reputation(deltas):
+    """
+    Applies {user id: {counter: delta}} to the users' profiles, one UPDATE per user.
+    A user without a profile gets one, filled by a full recompute since it has no running totals yet.
+    """
+    for user_id, counters in deltas.items():
+        counters = {name: delta for name, delta in counters.items() if delta}
+        if not counters:
+            continue
+        # success_rate goes first and reads the counters before their own change, backends that
+        # evaluate SET clauses left to right (MySQL) would otherwise see the new values
+        updates = {'success_rate': _success_rate_expression(counters.get('completed_projects', 0), counters.get('closed_contracts', 0))}
+        updates.update({name: Greatest(F(name) + delta, Value(0)) for name, delta in counters.items()})
+        if not UserProfile.objects.filter(user_id=user_id).update(**updates):
+            recompute_reputation([user_id])
+
+
+def reputation_change(before, after):
+    """
+    Applies the difference between two {user id: {counter: value}} contributions of one row, e.g. a
+    contract before and after its status changed. Nothing is written when they are equal.
+    """
+    deltas = defaultdict(Counter)
+    for user_id, counters in after.items():
+        deltas[user_id].update(counters)
+    for user_id, counters in before.items():
+        deltas[user_id].subtract(counters)
+    add_reputation(deltas)
+
+
+def reputation_sources():
+    """ (queryset, path to the user, {counter: aggregate}) for every event source that is installed """
+    Contract = apps.get_model('marketplace', 'Contract')
+    Proposal = apps.get_model('marketplace', 'Proposal')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    sources = [
+        (Contract.objects.all(), 'proposal__applier', {
+            'completed_projects': Count('pk', filter=Q(status=Contract.COMPLETED)),
+            'closed_contracts': Count('pk', filter=Q(status__in=Contract.CLOSED)),
+        }),
+        (Proposal.objects.filter(rating__isnull=False), 'applier', {
+            'rating_count': Count('pk'),
+            'rating_total': Sum('rating'),
+        }),
+        (Enrollment.objects.filter(certificate_issued=True), 'student', {
+            'certificates_earned': Count('pk'),
+        }),
+    ]
+    if apps.is_installed('collaboration'):
+        Task = apps.get_model('collaboration', 'Task')
+        sources.append((Task.objects.exclude(status=Task.CANCELLED), 'assigned_to__user', {
+            'tasks_assigned': Count('pk'),
+            'tasks_completed': Count('pk', filter=Q(status=Task.COMPLETED)),
+        }))
+    return sources
+
+
+def compute_reputation(user_ids=None):
+    """ {user id: {counter: value}} from one grouped aggregate query per source, for all users or user_ids """
+    stats = defaultdict(dict)
+    for queryset, user_path, aggregates in reputation_sources():
+        queryset = queryset.filter(**{f'{user_path}__isnull': False})
+        if user_ids is not None:
+            queryset = queryset.filter(**{f'{user_path}__in': user_ids})
+        for row in queryset.order_by().values(user_path).annotate(**aggregates):
+            stats[row.pop(user_path)].update(row)
+    return stats
+
+
+def recompute_reputation(user_ids=None, batch_size=1000):
+    """
+    Recomputes the counters of every profile (or of user_ids' profiles) from the source tables and
+    writes the profiles that drifted with bulk_update. Users with activity but no profile get one.
+    Returns the number of profiles written.
+    """
+    stats = compute_reputation(user_ids)
+    profiles = UserProfile.objects.all() if user_ids is None else UserProfile.objects.filter(user_id__in=user_ids)
+    existing = set(UserProfile.objects.filter(user_id__in=list(stats)).values_list('user_id', flat=True))
+    UserProfile.objects.bulk_create([UserProfile(user_id=user_id) for user_id in stats if user_id not in existing], ignore_conflicts=True)
+
+    written = 0
+    last_pk = 0
+    while True:
+        batch = list(profiles.filter(pk__gt=last_pk).order_by('pk').only('pk', 'user_id', 'success_rate', *COUNTERS)[:batch_size])
+        if not batch:
+            return written
+        last_pk = batch[-1].pk
+        for profile in batch:
+            counters = stats.get(profile.user_id, {})
+            for name in COUNTERS:
+                setattr(profile, name, counters.get(name) or 0)
+            profile.success_rate = success_rate(profile.completed_projects, profile.closed_contracts)
+        changed = [profile for profile in batch if profile.is_dirty()]
+        UserProfile.objects.bulk_update(changed, ['success_rate', *COUNTERS])
+        written += len(changed)
@@ -5,18 +5,32 @@
 # ModelSerializers for all models in users/models.py
 
 from rest_framework import serializers
-from .models import User, UserProfile, PasswordResetCode
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from core.serializers import ImageRenditionsField
+from .models import User, UserProfile, PasswordResetCode, ProvisioningJob
 from django.conf import settings
 
 # Serializes User model
 class UserSerializer(serializers.ModelSerializer):
     # Example: expose email as read-only
     email = serializers.ReadOnlyField()
+    profile_picture_renditions = ImageRenditionsField()
+
     class Meta:
         model = User
-        fields = ['id', 'email', 'first_name', 'last_name', 'role', 'is_active']
+        fields = ['id', 'email', 'first_name', 'last_name', 'role', 'is_active', 'profile_picture', 'profile_picture_renditions']
         read_only_fields = ['id', 'email', 'is_active']
         
+# Adds the claims permission checks rely on to issued tokens
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['role'] = user.role
+        token['is_staff'] = user.is_staff
+        token['is_active'] = user.is_active
+        return token
+
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(required=True, write_only=True)
     password2 = serializers.CharField(required=True, write_only=True)
@@ -42,12 +56,32 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return user
     
         
+# Compact card of the talent directory, profile fields are empty until the profile exists
+class TalentCardSerializer(serializers.ModelSerializer):
+    title = serializers.CharField(source='profile.title', read_only=True, default=None)
+    hourly_rate = serializers.DecimalField(source='profile.hourly_rate', max_digits=10, decimal_places=2, read_only=True, default=None)
+    experience_years = serializers.IntegerField(source='profile.experience_years', read_only=True, default=None)
+    is_available = serializers.BooleanField(source='profile.is_available', read_only=True, default=None)
+    completed_projects = serializers.IntegerField(source='profile.completed_projects', read_only=True, default=0)
+    success_rate = serializers.FloatField(source='profile.success_rate', read_only=True, default=0.0)
+    average_rating = serializers.FloatField(source='profile.average_rating', read_only=True, default=None)
+    skills = serializers.SlugRelatedField(slug_field='name', many=True, read_only=True)
+    skill_matches = serializers.IntegerField(read_only=True)
+    profile_picture_renditions = ImageRenditionsField()
+
+    class Meta:
+        model = User
+        fields = ['id', 'first_name', 'last_name', 'profile_picture', 'profile_picture_renditions', 'location', 'title', 'hourly_rate', 'experience_years', 'is_available', 'completed_projects', 'success_rate', 'average_rating', 'skills', 'skill_matches']
+
 # Serializes UserProfile model
 class UserProfileSerializer(serializers.ModelSerializer):
+    average_rating = serializers.FloatField(read_only=True)
+    task_completion_rate = serializers.FloatField(read_only=True)
+
     class Meta:
         model = UserProfile
-        fields = ['id', 'user', 'bio', 'is_available']
-        read_only_fields = ['id']
+        fields = ['id', 'user', 'bio', 'is_available', 'completed_projects', 'success_rate', 'average_rating', 'task_completion_rate', 'certificates_earned']
+        read_only_fields = ['id', 'completed_projects', 'success_rate', 'certificates_earned']
 
 class PasswordResetRequestSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -66,34 +100,14 @@ class PasswordResetVerifySerializer(serializers.Serializer):
     code = serializers.CharField(max_length=settings.RESET_CODE_LENGTH, write_only=True)
     
     def validate(self, data):
-        email = data['email']
-        code = data['code']
-        
-        try:
-            user = User.objects.get(email=email)
-            reset_code = PasswordResetCode.objects.filter(
-                user=user,
-                code=code,
-                is_used=False
-            ).latest('created_at')
-            
-            if not reset_code.is_valid:
-                raise serializers.ValidationError({
-                    "details": "Invalid or expired code"
-                })
-
-            data['user'] = user
-            data['reset_code'] = reset_code
-            
-        except User.DoesNotExist:
-            raise serializers.ValidationError({
-                "details": "No user found with this email"
-            })
-        except PasswordResetCode.DoesNotExist:
+        reset_code = PasswordResetCode.objects.find(data['email'], data['code'])
+        if reset_code is None:
             raise serializers.ValidationError({
-                "details": "Invalid verification code"
+                "details": "Invalid or expired code"
             })
-        
+
+        data['user'] = reset_code.user
+        data['reset_code'] = reset_code
         return data
     
     
@@ -103,33 +117,14 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
     password1 = serializers.CharField(write_only=True)
     password2 = serializers.CharField(write_only=True)
     def validate(self, attrs):
-        
-        email = attrs['email']
-        code = attrs['code']
-        
-        try:
-            user = User.objects.get(email=email)
-            reset_code = PasswordResetCode.objects.filter(
-                user=user,
-                code=code,
-                is_used=False
-            ).latest('created_at')
-            
-            if not reset_code.is_valid:
-                raise serializers.ValidationError({
-                    "details": "Invalid or expired code"
-                    })
-            
-            attrs['user'] = user
-            attrs['reset_code'] = reset_code
-        except User.DoesNotExist:
+        reset_code = PasswordResetCode.objects.find(attrs['email'], attrs['code'])
+        if reset_code is None:
             raise serializers.ValidationError({
-                "details": "No user found with this email address."
-                })
-        except PasswordResetCode.DoesNotExist:
-            raise serializers.ValidationError({
-                "details": "Invalid verification code."
+                "details": "Invalid or expired code"
                 })
+
+        attrs['user'] = reset_code.user
+        attrs['reset_code'] = reset_code
         
         if attrs['password1'] != attrs['password2']:
             raise serializers.ValidationError({
@@ -161,7 +156,7 @@ class passwordChangeSerializer(serializers.Serializer):
             })
         
         try:
-            self.validate_old_password(data['password'])
+            self.validate_old_password(data['old_password'])
         except serializers.ValidationError as e:
             raise serializers.ValidationError({
                 "details": "Passwords do not match"
@@ -170,4 +165,11 @@ class passwordChangeSerializer(serializers.Serializer):
         return data
     
     
-    
\ No newline at end of file
+    
+
+
+class ProvisioningJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProvisioningJob
+        fields = ['id', 'status', 'report', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
@@ -1,17 +1,25 @@
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import User, UserProfile, PasswordResetCode
+from core.images import track_renditions
+from .authentication import user_cache
+from .models import User
 
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        UserProfile.objects.create(user=instance)
+track_renditions(User, 'profile_picture')
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
-        
-@receiver(pre_save, sender=PasswordResetCode)
-def mark_old_code(sender, instance, **kwargs):
-    sender.objects.filter(user=instance.user).update(is_used=True)
+    # profiles are created on first access (User.get_profile), a profile loaded with the user
+    # and changed since is saved along with it, its changed columns only
+    profile = instance._state.fields_cache.get('profile')
+    if profile is not None and profile.is_dirty():
+        profile.save()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # again after commit, a request may have cached the old row in between
+    user_cache.invalidate(instance.pk)
+    transaction.on_commit(lambda: user_cache.invalidate(instance.pk))
+
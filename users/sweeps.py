@@ -0,0 +1,7 @@
+from core.sweeps import sweep
+from .models import PasswordResetCode
+
+
+@sweep('purge_reset_codes')
+def purge_reset_codes(batch_size):
+    return PasswordResetCode.objects.purge(batch_size=batch_size)
@@ -1,3 +1,457 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+import os
+import tempfile
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import check_password
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.exceptions import PermissionDenied
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework_simplejwt.tokens import AccessToken
+
+from courses.models import Course, Enrollment, Lesson, LessonCompletion, Module
+from marketplace.models import Contract, JobPosting, Proposal
+from skills.models import Skill, SkillCategory
+from .authentication import user_cache
+from .decorators import role_required
+from .hashers import acheck_password
+from .models import User, UserProfile, PasswordResetCode, ProvisioningJob
+from .permissions import ADMIN, STAFF, TALENT, user_role_mask
+from .provisioning import UserProvisioner, hash_passwords, password_pool
+from .reputation import COUNTERS, recompute_reputation
+from .throttling import IPRateThrottle
 
 # Create your tests here.
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user('mentor@example.com', 'password', role=User.MENTOR)
+        response = self.client.post(reverse('token_obtain_pair'), {'email': 'mentor@example.com', 'password': 'password'})
+        self.access = response.json()['access']
+
+    def get(self, token=None):
+        return self.client.get(reverse('api_module_list'), HTTP_AUTHORIZATION=f'Bearer {token or self.access}')
+
+    def user_lookups(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.get()
+        return response, [q for q in context.captured_queries if '"users_user"' in q['sql']]
+
+    def test_token_carries_role_claims(self):
+        token = AccessToken(self.access)
+        self.assertEqual((token['role'], token['is_staff'], token['is_active']), (User.MENTOR, False, True))
+
+    def test_user_is_loaded_once(self):
+        response, lookups = self.user_lookups()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(lookups), 1)
+        response, lookups = self.user_lookups()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(lookups, [])
+
+    def test_saving_the_user_invalidates_the_cache(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_password_change_keeps_columns_changed_meanwhile(self):
+        self.get()
+        # changed by another process, whose cache this one does not share
+        User.objects.filter(pk=self.user.pk).update(role=User.CLIENT, is_active=False)
+        response = self.client.post(
+            reverse('password_change_view'),
+            {'old_password': 'password', 'password1': 'new password', 'password2': 'new password'},
+            HTTP_AUTHORIZATION=f'Bearer {self.access}',
+        )
+        self.assertEqual(response.json(), {'details': 'Password change successful'})
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.check_password('new password'))
+        self.assertEqual((user.role, user.is_active), (User.CLIENT, False))
+
+    def test_password_change_revokes_tokens(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('another password')
+            self.user.save()
+        self.assertEqual(self.get().status_code, 401)
+
+
+class PasswordResetCodeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('member@example.com', 'password')
+
+    def confirm(self, code, password='new password', **extra):
+        return self.client.post(reverse('password_reset_confirm'), {
+            'email': 'member@example.com', 'code': code, 'password1': password, 'password2': password
+        }, **extra)
+
+    def test_issue_invalidates_previous_codes_once(self):
+        first = PasswordResetCode.objects.issue(self.user)
+        with self.assertNumQueries(2):
+            second = PasswordResetCode.objects.issue(self.user)
+        first.refresh_from_db()
+        self.assertTrue(first.is_used)
+        self.assertEqual(list(PasswordResetCode.objects.usable()), [second])
+
+    def test_verify_is_one_query_and_consume_is_compare_and_set(self):
+        code = PasswordResetCode.objects.issue(self.user)
+        with self.assertNumQueries(1):
+            found = PasswordResetCode.objects.find('member@example.com', code.code)
+            self.assertEqual(found.user.email, 'member@example.com')
+        self.assertIsNone(PasswordResetCode.objects.find('other@example.com', code.code))
+
+        self.assertEqual(self.confirm(code.code).status_code, 200)
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('new password'))
+        # a stale copy of the code cannot be consumed a second time
+        self.assertFalse(found.mark_used())
+        self.assertEqual(self.confirm(code.code, password='third password').status_code, 400)
+
+    def test_attempts_are_throttled_per_email_and_ip(self):
+        PasswordResetCode.objects.issue(self.user)
+        for _ in range(10):
+            self.assertEqual(self.confirm('xxxx').status_code, 400)
+        # a different address does not reset the per email budget
+        self.assertEqual(self.confirm('xxxx', REMOTE_ADDR='10.0.0.2').status_code, 429)
+
+    def test_ip_throttle_ignores_client_forwarded_for(self):
+        throttle = IPRateThrottle()
+        throttle.scope = 'reset_attempt_ip'
+        factory = RequestFactory()
+        keys = {
+            throttle.get_cache_key(Request(factory.post('/', HTTP_X_FORWARDED_FOR=f'10.1.0.{i}')), None)
+            for i in range(3)
+        }
+        self.assertEqual(keys, {throttle.cache_format % {'scope': 'reset_attempt_ip', 'ident': '127.0.0.1'}})
+
+    def test_purge(self):
+        PasswordResetCode.objects.issue(self.user)
+        PasswordResetCode.objects.issue(self.user)
+        PasswordResetCode.objects.create(user=self.user, expires_at=timezone.now() - timedelta(minutes=1))
+        out = StringIO()
+        call_command('purge_reset_codes', '--batch-size', '1', stdout=out)
+        self.assertIn('Purged 2 reset code(s)', out.getvalue())
+        self.assertEqual(PasswordResetCode.objects.count(), 1)
+
+
+@override_settings(PASSWORD_HASHER_PARAMS={'pbkdf2_sha256': {'iterations': 1000}})
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user('member@example.com', 'password')
+
+    def iterations(self):
+        return User.objects.get(pk=self.user.pk).password.split('$')[1]
+
+    def test_login_rehashes_when_parameters_change(self):
+        self.assertEqual(self.iterations(), '1000')
+        with self.settings(PASSWORD_HASHER_PARAMS={'pbkdf2_sha256': {'iterations': 2000}}):
+            response = self.client.post(reverse('token_obtain_pair'), {'email': 'member@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.iterations(), '2000')
+
+    def test_async_check_password(self):
+        with self.settings(PASSWORD_HASHER_PARAMS={'pbkdf2_sha256': {'iterations': 2000}}):
+            self.assertTrue(async_to_sync(acheck_password)(self.user, 'password'))
+            self.assertFalse(async_to_sync(acheck_password)(self.user, 'wrong'))
+        self.assertEqual(self.iterations(), '2000')
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_password_hashers', 'pbkdf2_sha256', '--duration', '0.05', stdout=out)
+        self.assertIn('pbkdf2_sha256 (iterations=1000)', out.getvalue())
+        self.assertIn('logins/sec per core', out.getvalue())
+
+
+class RolePermissionTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.talent = User.objects.create_user('talent@example.com', 'password')
+        self.other = User.objects.create_user('other@example.com', 'password')
+        self.mentor = User.objects.create_user('mentor@example.com', 'password', role=User.MENTOR)
+        self.admin = User.objects.create_user('admin@example.com', 'password', role=User.ADMIN)
+        course = Course.objects.create(title='Course', short_description='Short', mentor=self.mentor)
+        self.enrollments = [Enrollment.objects.create(student=user, course=course) for user in (self.talent, self.other)]
+
+    def test_role_mask(self):
+        self.assertEqual(user_role_mask(self.talent), TALENT)
+        self.assertEqual(user_role_mask(self.admin), ADMIN | STAFF)
+        self.talent.is_active = False
+        self.assertEqual(user_role_mask(self.talent), 0)
+
+    def test_decorator(self):
+        view = role_required(['mentor', User.ADMIN])(lambda request: 'ok')
+        request = RequestFactory().get('/')
+        for user, allowed in ((self.mentor, True), (self.admin, True), (self.talent, False)):
+            request.user = user
+            if allowed:
+                self.assertEqual(view(request), 'ok')
+            else:
+                self.assertRaises(PermissionDenied, view, request)
+
+    def test_view_level_permission_runs_on_create(self):
+        self.client.force_login(self.talent)
+        self.assertEqual(self.client.post(reverse('api_course_list'), {}).status_code, 403)
+        self.client.force_login(self.mentor)
+        self.assertEqual(self.client.post(reverse('api_course_list'), {}).status_code, 400)
+
+    def test_list_is_filtered_in_the_query(self):
+        url = reverse('api_enrollment_list')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        for user, expected in ((self.talent, [self.enrollments[0]]), (self.mentor, self.enrollments), (self.admin, self.enrollments)):
+            self.client.force_login(user)
+            ids = [row['id'] for row in self.client.get(url).json()['results']]
+            self.assertCountEqual(ids, [enrollment.pk for enrollment in expected])
+
+
+@override_settings(PASSWORD_HASHER_PARAMS={'pbkdf2_sha256': {'iterations': 1000}})
+class UserProvisioningTests(TestCase):
+    CSV = (
+        "email,first_name,last_name,role,password,skills\n"
+        "ada@example.com,Ada,Lovelace,talent,secret-1,python;Django\n"
+        "grace@example.com,Grace,Hopper,mentor,secret-2,\n"
+        "ADA@example.com,Ada,Again,talent,secret-3,\n"
+        "not-an-email,Bad,Row,talent,secret-4,\n"
+        "linus@example.com,Linus,T,client,,Cobol\n"
+        "taken@example.com,Already,There,overlord,secret-5,\n"
+        "alan@example.com,Alan,Turing,1,secret-6,Python\n"
+    )
+
+    def setUp(self):
+        user_cache.clear()
+        category = SkillCategory.objects.create(name='Programming')
+        self.python = Skill.objects.create(name='Python', category=category)
+        self.django = Skill.objects.create(name='Django', category=category)
+        self.admin = User.objects.create_user('taken@example.com', 'password', role=User.ADMIN)
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = media.name
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_command_creates_valid_rows_and_reports_the_rest(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(self.CSV)
+        self.addCleanup(os.remove, f.name)
+        out, err = StringIO(), StringIO()
+        call_command('provision_users', f.name, '--chunk-size', '3', stdout=out, stderr=err)
+
+        self.assertIn('Created 3 user(s), 4 row(s) failed', out.getvalue())
+        for line in ('Row 4 ', 'Row 5 ', 'Row 6 ', 'Row 7 '):
+            self.assertIn(line, err.getvalue())
+        ada = User.objects.get(email='ada@example.com')
+        self.assertTrue(ada.check_password('secret-1'))
+        self.assertCountEqual(ada.skills.all(), [self.python, self.django])
+        self.assertEqual(User.objects.get(email='grace@example.com').role, User.MENTOR)
+        self.assertEqual(User.objects.get(email='alan@example.com').role, User.CLIENT)
+        self.assertEqual(UserProfile.objects.filter(user__email__in=['ada@example.com', 'grace@example.com', 'alan@example.com']).count(), 3)
+
+    def test_existing_emails_match_whatever_their_case(self):
+        User.objects.create_user('Jane.Doe@example.com', 'password')
+        report = UserProvisioner().run([
+            {'email': 'jane.doe@example.com', 'password': 'secret'},
+            {'email': 'Mixed.Case@Example.COM', 'password': 'secret'},
+        ])
+        self.assertEqual((report.created, report.errors[0]['row']), (1, 2))
+        self.assertEqual(User.objects.filter(email__iexact='jane.doe@example.com').count(), 1)
+        # stored the way create_user() stores it
+        self.assertTrue(User.objects.filter(email='Mixed.Case@example.com').exists())
+
+    def test_endpoint_is_for_staff(self):
+        upload = lambda: SimpleUploadedFile('cohort.csv', self.CSV.encode('utf-8'), content_type='text/csv')
+        self.client.force_login(User.objects.create_user('talent@example.com', 'password'))
+        self.assertEqual(self.client.post(reverse('user_provision'), {'file': upload()}).status_code, 403)
+
+        self.client.force_login(self.admin)
+        # the request only queues the upload
+        with mock.patch('users.provisioning.UserProvisioner') as provisioner:
+            response = self.client.post(reverse('user_provision'), {'file': upload()})
+        self.assertFalse(provisioner.called)
+        self.assertEqual(response.status_code, 202)
+        job = ProvisioningJob.objects.get(pk=response.json()['id'])
+        self.assertEqual((job.status, job.created_by), (ProvisioningJob.PENDING, self.admin))
+        self.assertFalse(User.objects.filter(email='ada@example.com').exists())
+
+        out = StringIO()
+        call_command('run_provisioning_jobs', '--once', '--workers', '1', stdout=out)
+        self.assertIn(f'Job {job.pk}: created 3 user(s), 4 row(s) failed', out.getvalue())
+        data = self.client.get(reverse('user_provision_job', args=[job.pk])).json()
+        self.assertEqual(data['status'], ProvisioningJob.DONE)
+        self.assertEqual((data['report']['created'], data['report']['failed']), (3, 4))
+        self.assertEqual(data['report']['errors'][0]['row'], 4)
+        # the CSV with its passwords is gone
+        job.refresh_from_db()
+        self.assertFalse(job.file)
+        self.assertFalse(os.listdir(os.path.join(self.media, 'provisioning')))
+
+    def test_failed_jobs_are_reported(self):
+        job = ProvisioningJob.objects.create(file=SimpleUploadedFile('cohort.csv', b'\xff\xfe not utf-8'))
+        with self.assertLogs('users.provisioning', 'ERROR'):
+            call_command('run_provisioning_jobs', '--once', '--workers', '1', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ProvisioningJob.FAILED)
+        self.assertTrue(job.error.startswith('UnicodeDecodeError'))
+        self.assertFalse(job.file)
+
+    def test_passwords_are_hashed_in_a_process_pool(self):
+        with password_pool(2) as pool:
+            hashes = hash_passwords([f'password-{i}' for i in range(8)], pool, workers=2)
+        self.assertTrue(all(check_password(f'password-{i}', encoded) for i, encoded in enumerate(hashes)))
+
+    def test_one_pool_per_run(self):
+        rows = [{'email': f'user{i}@example.com', 'password': 'secret'} for i in range(4)]
+        with mock.patch('users.provisioning.password_pool', wraps=password_pool) as pool:
+            report = UserProvisioner(chunk_size=2, workers=2).run(rows)
+        self.assertEqual((report.created, pool.call_count), (4, 1))
+
+
+class UserProfilePersistenceTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+
+    def test_user_saves_do_not_touch_the_profile(self):
+        with self.assertNumQueries(1):
+            user = User.objects.create_user('member@example.com', 'password')
+        with self.assertNumQueries(1):
+            user.last_login = timezone.now()
+            user.save(update_fields=['last_login'])
+
+    def test_profile_is_created_on_first_access(self):
+        user = User.objects.create_user('member@example.com', 'password')
+        self.assertFalse(UserProfile.objects.filter(user=user).exists())
+        profile = user.get_profile()
+        self.assertEqual(UserProfile.objects.get(user=user), profile)
+        with self.assertNumQueries(0):
+            self.assertIs(user.get_profile(), profile)
+
+    def test_only_dirty_profiles_are_written(self):
+        User.objects.create_user('member@example.com', 'password').get_profile()
+        user = User.objects.select_related('profile').get(email='member@example.com')
+        with self.assertNumQueries(1):
+            user.save()
+
+        user.profile.bio = 'Backend developer'
+        user.profile.notification_preferences['digest'] = 'weekly'
+        self.assertEqual(set(user.profile.get_dirty_fields()), {'bio', 'notification_preferences'})
+        with CaptureQueriesContext(connection) as context:
+            user.save()
+        update = context.captured_queries[-1]['sql']
+        self.assertTrue(update.startswith('UPDATE "users_userprofile"'))
+        self.assertNotIn('hourly_rate', update)
+        self.assertFalse(user.profile.is_dirty())
+        with self.assertNumQueries(0):
+            user.profile.save()
+        self.assertEqual(UserProfile.objects.get(user=user).notification_preferences, {'digest': 'weekly'})
+
+
+class TalentSearchTests(TestCase):
+    def setUp(self):
+        category = SkillCategory.objects.create(name='Engineering')
+        self.python, self.django, self.go = (Skill.objects.create(name=name, category=category) for name in ('Python', 'Django', 'Go'))
+        self.both = self.make_talent('both@example.com', [self.python, self.django], hourly_rate=80, location='Lagos')
+        self.python_only = self.make_talent('python@example.com', [self.python], hourly_rate=30, location='Abuja')
+        self.go_only = self.make_talent('go@example.com', [self.go], hourly_rate=50, location='lagos')
+        self.make_talent('client@example.com', [self.python], role=User.CLIENT)
+        self.client.force_login(User.objects.create_user('searcher@example.com', 'password', role=User.CLIENT))
+
+    def make_talent(self, email, skills, role=User.TALENT, location=None, **profile):
+        user = User.objects.create_user(email, 'password', role=role, location=location)
+        user.skills.set(skills)
+        UserProfile.objects.create(user=user, **profile)
+        return user
+
+    def search(self, **params):
+        response = self.client.get(reverse('talent_search'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(row['id'], row['skill_matches']) for row in response.json()['results']]
+
+    def test_any_ranks_by_matching_skills(self):
+        skills = f'{self.python.pk},{self.django.pk}'
+        self.assertEqual(self.search(skills=skills), [(self.both.pk, 2), (self.python_only.pk, 1)])
+        self.assertEqual(self.search(skills=skills, match='all'), [(self.both.pk, 2)])
+
+    def test_profile_and_location_filters(self):
+        self.assertEqual(self.search(skills=self.python.pk, min_rate=50), [(self.both.pk, 1)])
+        self.assertCountEqual([pk for pk, _ in self.search(location='LAGOS')], [self.both.pk, self.go_only.pk])
+
+    def test_invalid_parameters(self):
+        response = self.client.get(reverse('talent_search'), {'skills': 'python', 'min_rate': 'cheap'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'skills', 'min_rate'})
+
+    def test_queries_do_not_grow_with_results(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                self.search(skills=self.python.pk)
+            return len(context.captured_queries)
+
+        queries = count_queries()
+        for i in range(3):
+            self.make_talent(f'talent{i}@example.com', [self.python, self.django])
+        self.assertEqual(count_queries(), queries)
+
+
+class ReputationTests(TestCase):
+    def setUp(self):
+        self.talent = User.objects.create_user('talent@example.com', 'password')
+        self.client_user = User.objects.create_user('client@example.com', 'password', role=User.CLIENT)
+
+    def contract(self, status=Contract.ACTIVE, rating=None):
+        job = JobPosting.objects.create(client=self.client_user, title='Job', description='Build it')
+        proposal = Proposal.objects.create(job=job, applier=self.talent, cover_letter='Hire me', proposed_amount=100, estimated_days=5, rating=rating)
+        return Contract.objects.create(job=job, proposal=proposal, total_amount=100, payment_schedule=0, status=status)
+
+    def counters(self):
+        profile = UserProfile.objects.get(user=self.talent)
+        return {name: getattr(profile, name) for name in (*COUNTERS, 'success_rate')}
+
+    def test_events_update_counters(self):
+        first = self.contract()
+        first.complete()
+        second = self.contract(rating=4)
+        second.status = Contract.CANCELLED
+        second.save()
+        second.proposal.rating = 2
+        second.proposal.save()
+        with self.assertNumQueries(2):
+            # no status change, nothing to write
+            first.update_progress(50)
+
+        counters = self.counters()
+        self.assertEqual(counters['completed_projects'], 1)
+        self.assertEqual(counters['closed_contracts'], 2)
+        self.assertEqual(counters['success_rate'], 50.0)
+        self.assertEqual((counters['rating_count'], counters['rating_total']), (1, 2))
+
+        first.delete()
+        self.assertEqual(self.counters()['success_rate'], 0.0)
+
+    def test_certificates_are_counted(self):
+        course = Course.objects.create(title='Course', short_description='Short', mentor=self.client_user, is_certified=True)
+        lesson = Lesson.objects.create(module=Module.objects.create(course=course, title='Module'), title='Lesson')
+        enrollment = Enrollment.objects.create(student=self.talent, course=course)
+        LessonCompletion.objects.create(enrollment=enrollment, lesson=lesson)
+        enrollment.update_progress()
+        self.assertEqual(self.counters()['certificates_earned'], 1)
+
+    def test_recompute_matches_incremental_counters(self):
+        self.contract().complete()
+        self.contract(status=Contract.DISPUTED, rating=5)
+        incremental = self.counters()
+
+        UserProfile.objects.filter(user=self.talent).update(completed_projects=7, success_rate=1.0)
+        self.assertEqual(recompute_reputation(), 1)
+        self.assertEqual(self.counters(), incremental)
+        self.assertEqual(recompute_reputation(), 0)
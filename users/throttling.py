@@ -0,0 +1,29 @@
+import hashlib
+
+from rest_framework.throttling import ScopedRateThrottle
+
+
+class EmailRateThrottle(ScopedRateThrottle):
+    """
+    Limits requests per email address given in the request body, whoever sends them.
+    The rate is looked up from the view's `email_throttle_scope` in DEFAULT_THROTTLE_RATES.
+    """
+    scope_attr = 'email_throttle_scope'
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not email:
+            return None
+        ident = hashlib.sha256(str(email).strip().lower().encode('utf-8')).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class IPRateThrottle(ScopedRateThrottle):
+    """
+    Limits requests per client address, authenticated or not, at the view's `ip_throttle_scope` rate.
+    The address comes from get_ident(), which only trusts X-Forwarded-For as far as NUM_PROXIES says.
+    """
+    scope_attr = 'ip_throttle_scope'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
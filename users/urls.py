@@ -6,6 +6,9 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 urlpatterns = [
     path('create/', views.UserCreateView.as_view(), name='user_creation'),
     path('signup/', views.UserCreateView.as_view(), name='user_signup'),
+    path('provision/', views.BulkUserProvisionView.as_view(), name='user_provision'),
+    path('provision/<int:pk>/', views.ProvisioningJobView.as_view(), name='user_provision_job'),
+    path('api/talent/', views.TalentSearchView.as_view(), name='talent_search'),
     
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -13,6 +13,12 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
+from .throttling import EmailRateThrottle, IPRateThrottle
+from .filters import TalentSearchFilter
+from core.pagination import KeysetPagination
+from core.queryplan import QueryPlanMixin
+from rest_framework.parsers import FileUploadParser, MultiPartParser
 
 # Create your views here.
 
@@ -31,8 +37,45 @@ class UserCreateView(generics.CreateAPIView):
         print('contacting email backend')
         serializer.save()
         
+class TalentSearchView(QueryPlanMixin, generics.ListAPIView):
+    """Directory of active talent, ranked by the number of requested skills they have (see TalentSearchFilter)"""
+    queryset = models.User.objects.filter(role=models.User.TALENT, is_active=True)
+    serializer_class = serializers.TalentCardSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [TalentSearchFilter]
+    pagination_class = KeysetPagination
+    pagination_ordering = ('-skill_matches', '-id')
+
+class BulkUserProvisionView(APIView):
+    """Queues an uploaded CSV (multipart field `file`) for provisioning, see users.provisioning for the columns
+
+    Hashing the password of every row takes far longer than a request may: about a second per password
+    with Django's default PBKDF2 cost, minutes for a cohort. So the upload is only stored and answered
+    with 202 and a job, provisioned by the run_provisioning_jobs worker in its process pool. The job's
+    report (GET provision/<id>/) lists the rows that failed with their line number.
+    """
+    permission_classes = [permissions.IsStaff]
+    parser_classes = [MultiPartParser, FileUploadParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"details": "Upload a CSV file in the `file` field."}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = models.ProvisioningJob.objects.create(file=upload, created_by=request.user)
+        return Response(serializers.ProvisioningJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+class ProvisioningJobView(generics.RetrieveAPIView):
+    """Status of a queued CSV upload, with its report once provisioned"""
+    queryset = models.ProvisioningJob.objects.all()
+    serializer_class = serializers.ProvisioningJobSerializer
+    permission_classes = [permissions.IsStaff]
+        
 class PasswordResetRequestView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [EmailRateThrottle, IPRateThrottle]
+    email_throttle_scope = 'reset_request_email'
+    ip_throttle_scope = 'reset_request_ip'
     
     def post(self, request):
         serializer = serializers.PasswordResetRequestSerializer(data=request.data)
@@ -40,9 +83,7 @@ class PasswordResetRequestView(APIView):
             email = serializer.validated_data['email']
             user = models.User.objects.get(email=email)
 
-            models.PasswordResetCode.objects.filter(user=user).update(is_used=True)#already taken care of in signals.py
-            
-            reset_code = models.PasswordResetCode.objects.create(user=user)
+            reset_code = models.PasswordResetCode.objects.issue(user)
 
             subject = "Password Reset Request"
             context = {
@@ -59,6 +100,9 @@ class PasswordResetRequestView(APIView):
 
 class PasswordResetVerifyView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [EmailRateThrottle, IPRateThrottle]
+    email_throttle_scope = 'reset_attempt_email'
+    ip_throttle_scope = 'reset_attempt_ip'
     
     def post(self, request):
         serializer = serializers.PasswordResetVerifySerializer(data=request.data)
@@ -72,11 +116,14 @@ class PasswordResetVerifyView(APIView):
                 "code": reset_code.code
             }, status=status.HTTP_200_OK
             )
-        return Response(serializers.errors, status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.errors, status.HTTP_400_BAD_REQUEST)
     
 
 class PasswordResetConfirmView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [EmailRateThrottle, IPRateThrottle]
+    email_throttle_scope = 'reset_attempt_email'
+    ip_throttle_scope = 'reset_attempt_ip'
     
     def post(self, request):
         serializer = serializers.PasswordResetConfirmSerializer(data=request.data)
@@ -85,15 +132,15 @@ class PasswordResetConfirmView(APIView):
             reset_code = serializer.validated_data['reset_code']
             new_password = serializer.validated_data['password1']
 
-            user.set_password(new_password)
-            user.save()
-            
-            reset_code.mark_used()
-            
-            models.PasswordResetCode.objects.filter(
-                user=user,
-                is_used=False,
-            ).update(is_used=True)
+            with transaction.atomic():
+                # only one request gets to consume the code
+                if not reset_code.mark_used():
+                    return Response(
+                        {"details": "Invalid or expired code"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                user.set_password(new_password)
+                user.save()
             
             return Response(
                 {"detail": "Password has been reset successfully."},
@@ -115,6 +162,8 @@ class passwordChangeView(APIView):
         if serializer.is_valid():
             ##serializer already checks if the password is valid
             request.user.set_password(serializer.validated_data['password1'])
+            # request.user may be a cached copy (see CachedJWTAuthentication), only the password is fresh
+            request.user.save(update_fields=['password'])
             return Response({
                 "details": "Password change successful"
             })